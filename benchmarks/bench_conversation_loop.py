@@ -0,0 +1,95 @@
+"""Benchmark of the conversation loop without the model latency.
+
+A scripted client replays a session in which the model looks up resources by name and changes their amounts,
+so the time measures only the orchestration overhead: history management, tool dispatch and the database layer.
+The relational tools run against the PIX simulation model imported into an in-memory SQLite database.
+
+Usage:
+
+    PYTHONPATH=src python benchmarks/bench_conversation_loop.py [--turns 50] [--repeat 3]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from pathlib import Path
+
+from anthropic.types import TextBlock, Usage
+from anthropic.types.beta.tools import ToolsBetaMessage, ToolUseBlock
+
+from simulation_copilot.anthropic import Conversation, MessageHistory, ScriptedClient
+from simulation_copilot.database import create_tables, session_scope
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.tools.prosimos_relational_tools import change_resource_amount, get_resource_id_by_name
+
+_DATA_DIR = Path(__file__).parent.parent / "tests/test_data/PurchasingExample"
+
+
+def _response(content: list, stop_reason: str) -> ToolsBetaMessage:
+    return ToolsBetaMessage(
+        id="msg",
+        type="message",
+        role="assistant",
+        model="scripted",
+        content=content,
+        stop_reason=stop_reason,
+        usage=Usage(input_tokens=0, output_tokens=0),
+    )
+
+
+def _scripted_session(turns: int) -> list[ToolsBetaMessage]:
+    responses = []
+    for i in range(turns):
+        # the freshly imported model has ID 1 and a resource with ID 1
+        tool_block = (
+            ToolUseBlock(
+                id=f"tool_{i}",
+                name="get_resource_id_by_name",
+                input={"model_id": 1, "name": "Carmen Finacse"},
+                type="tool_use",
+            )
+            if i % 2 == 0
+            else ToolUseBlock(
+                id=f"tool_{i}", name="change_resource_amount", input={"resource_id": 1, "amount": i}, type="tool_use"
+            )
+        )
+        responses.append(_response([TextBlock(type="text", text="Next step."), tool_block], "tool_use"))
+    responses.append(_response([TextBlock(type="text", text="Done.")], "end_turn"))
+    return responses
+
+
+def _time_session(turns: int) -> float:
+    conversation = Conversation(
+        model="scripted",
+        tools=[get_resource_id_by_name, change_resource_amount],
+        max_tools_invocations=turns,
+        client=ScriptedClient(_scripted_session(turns)),
+        history=MessageHistory(token_budget=20_000, keep_tool_results=2),
+    )
+    with contextlib.redirect_stdout(io.StringIO()):  # the conversation prints every message
+        start = time.perf_counter()
+        conversation.run("Change the amount of Carmen Finacse step by step.")
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50, help="Number of tool calls in the session.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of sessions.")
+    args = parser.parse_args()
+
+    create_tables()
+    with (_DATA_DIR / "simulation.json").open("r") as f:
+        model = json.load(f)
+    with session_scope() as session:
+        create_simulation_model_from_pix(session, model, _DATA_DIR / "process.bpmn", bulk=True)
+
+    timings = [_time_session(args.turns) for _ in range(args.repeat)]
+    best = min(timings)
+    print(f"{args.turns} turns: best {best:.3f}s ({best / args.turns * 1000:.2f} ms per turn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark of LLMCompilerPlanParser on long synthetic plans.
+
+Plans are streamed to the parser in small tokens, as they come from the model. Each task references the results
+of earlier tasks, so argument parsing and dependency resolution are exercised too. The time per task should stay
+about the same as plans grow.
+
+Usage:
+
+    PYTHONPATH=src python benchmarks/bench_llm_compiler_parser.py [--tasks 100 1000 10000] [--token-size 4]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from langchain_core.tools import StructuredTool
+
+sys.path.append(str(Path(__file__).parent.parent / "src/cli/sql_approach"))  # the CLI modules aren't a package
+
+from llm_compiler_parser import LLMCompilerPlanParser  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def _tools() -> list[StructuredTool]:
+    def get_resource_id_by_name(name: str) -> int:
+        return len(name)
+
+    def add_resource_to_profile(profile_id: int, name: str, amount: int, calendar_ids: list[int]) -> bool:
+        return bool(profile_id and name and amount and calendar_ids)
+
+    return [
+        StructuredTool.from_function(get_resource_id_by_name, description="Returns the ID of the resource."),
+        StructuredTool.from_function(add_resource_to_profile, description="Adds a resource to the profile."),
+    ]
+
+
+def _plan(tasks: int) -> str:
+    lines = []
+    for i in range(1, tasks + 1):
+        if i % 2:
+            lines.append(f"Thought: I need the ID of resource {i}.")
+            lines.append(f'{i}. get_resource_id_by_name(name="Resource, number {i}")')
+        else:
+            lines.append(
+                f'{i}. add_resource_to_profile(profile_id=${i - 1}, name="Clerk ({i})", amount={i}, '
+                f"calendar_ids=[1, 2, ${{{i - 1}}}])"
+            )
+    lines.append(f"{tasks + 1}. join()")
+    lines.append("<END_OF_PLAN>")
+    return "\n".join(lines)
+
+
+def _time_parse(parser: LLMCompilerPlanParser, plan: str, token_size: int) -> tuple[float, int]:
+    tokens = [plan[i : i + token_size] for i in range(0, len(plan), token_size)]
+    start = time.perf_counter()
+    parsed = sum(1 for _ in parser.transform(iter(tokens)))
+    return time.perf_counter() - start, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[100, 1000, 10000], help="Numbers of tasks in plans.")
+    parser.add_argument("--token-size", type=int, default=4, help="Number of characters in a streamed token.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs per plan.")
+    args = parser.parse_args()
+
+    plan_parser = LLMCompilerPlanParser(tools=_tools())
+    for tasks in args.tasks:
+        plan = _plan(tasks)
+        timings = [_time_parse(plan_parser, plan, args.token_size) for _ in range(args.repeat)]
+        best, parsed = min(timings)
+        assert parsed == tasks + 1, f"Parsed {parsed} tasks, expected {tasks + 1}"
+        print(f"{tasks} tasks: best {best:.3f}s ({best / parsed * 1e6:.1f} us per task)")
+
+
+if __name__ == "__main__":
+    main()
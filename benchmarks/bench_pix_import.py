@@ -0,0 +1,55 @@
+"""Benchmark of importing the PIX simulation model into the relational database.
+
+Compares the regular import path, which commits every record through the service, with the bulk import path,
+which persists the whole model in one transaction. A file-backed SQLite database is used to include the cost
+of committing to disk.
+
+Usage:
+
+    PYTHONPATH=src python benchmarks/bench_pix_import.py [--repeat 3]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from simulation_copilot.prosimos_relational_model import Base
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+
+_DATA_DIR = Path(__file__).parent.parent / "tests/test_data/PurchasingExample"
+
+
+def _time_import(engine: sa.Engine, model: dict, process_path: Path, bulk: bool) -> float:
+    with Session(engine) as session:
+        start = time.perf_counter()
+        create_simulation_model_from_pix(session, model, process_path, bulk=bulk)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Number of imports per path.")
+    args = parser.parse_args()
+
+    with (_DATA_DIR / "simulation.json").open("r") as f:
+        model = json.load(f)
+    process_path = _DATA_DIR / "process.bpmn"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = sa.create_engine(f"sqlite:///{tmp_dir}/benchmark.db")
+        Base.metadata.create_all(engine)
+
+        for name, bulk in (("regular", False), ("bulk", True)):
+            timings = [_time_import(engine, model, process_path, bulk) for _ in range(args.repeat)]
+            print(f"{name:>8}: best {min(timings):.3f}s, mean {sum(timings) / len(timings):.3f}s")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
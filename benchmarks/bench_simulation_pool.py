@@ -0,0 +1,75 @@
+"""Benchmark of repeated small batches of simulations in a fresh process pool vs. the long-lived simulation pool.
+
+Each round simulates a batch of scenarios with few cases, as sweeps and replications do. A fresh pool starts its
+processes and parses the BPMN model in each simulation, while the simulation pool keeps both warm between rounds.
+
+Usage:
+
+    PYTHONPATH=src python benchmarks/bench_simulation_pool.py [--rounds 10] [--batch 8] [--cases 10]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+# pylint: disable=wrong-import-position
+from simulation_copilot.database import Session, create_tables  # noqa: E402
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix  # noqa: E402
+from simulation_copilot.prosimos_utils import _simulate, get_simulation_attributes, simulate_kpis  # noqa: E402
+from simulation_copilot.simulation_pool import SimulationPool  # noqa: E402
+
+_TEST_DATA = Path(__file__).parent.parent / "tests/test_data/PurchasingExample"
+
+
+def _attributes(process_path: Path) -> dict:
+    create_tables()
+    with (_TEST_DATA / "simulation.json").open("r") as f:
+        model = json.load(f)
+    with Session() as session:
+        model_id = create_simulation_model_from_pix(session, model, process_path, bulk=True).id
+    return get_simulation_attributes(model_id, process_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10, help="Number of batches.")
+    parser.add_argument("--batch", type=int, default=8, help="Number of simulations in a batch.")
+    parser.add_argument("--cases", type=int, default=10, help="Number of cases in a simulation.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    process_path = _TEST_DATA / "process.bpmn"
+    attributes = _attributes(process_path)
+    starting_at = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+    batch = (
+        [process_path] * args.batch,
+        [attributes] * args.batch,
+        [args.cases] * args.batch,
+        [starting_at] * args.batch,
+    )
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(_simulate, *batch, range(i, i + args.batch)))
+    fresh = time.perf_counter() - start
+
+    with SimulationPool(max_workers=args.workers) as pool:
+        start = time.perf_counter()
+        for i in range(args.rounds):
+            pool.map(simulate_kpis, *batch, range(i, i + args.batch))
+        warm = time.perf_counter() - start
+
+    simulations = args.rounds * args.batch
+    print(f"fresh process pool: {fresh:.2f}s ({fresh / simulations * 1e3:.1f} ms per simulation)")
+    print(f"simulation pool: {warm:.2f}s ({warm / simulations * 1e3:.1f} ms per simulation, KPIs included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,18 @@ from pathlib import Path
 import anthropic
 from dotenv import load_dotenv
 
-from simulation_copilot.anthropic import Conversation
+from simulation_copilot.anthropic import Conversation, MessageHistory
 from simulation_copilot.anthropic.conversation import Claude3
 from simulation_copilot.database import create_tables, get_session
 from simulation_copilot.prompts import make_simulation_copilot_system_prompt
 from simulation_copilot.prosimos_to_relational_adapter import (
     create_simulation_model_from_pix,
 )
-from simulation_copilot.prosimos_utils import (
-    run_prosimos,
-    get_resource_utilization_and_overall_statistics,
-)
+from simulation_copilot.prosimos_utils import run_prosimos
 from simulation_copilot.tools.prosimos_relational_tools import (
     create_simulation_model,
     get_simulation_model,
+    clone_simulation_model,
     change_resource_amount,
     add_resource_to_profile,
     remove_resource_from_profile_by_id,
@@ -30,6 +28,10 @@ from simulation_copilot.tools.prosimos_relational_tools import (
     get_resource_id_by_name,
     get_baseline_performance_report,
     generate_performance_report,
+    run_scenario_sweep_tool,
+    optimize_resource_allocation_tool,
+    SIMULATION_SEED,
+    SIMULATION_STARTING_AT,
     set_baseline_performance_report,
     set_process_path,
 )
@@ -37,6 +39,7 @@ from simulation_copilot.tools.prosimos_relational_tools import (
 tools = [
     create_simulation_model,
     get_simulation_model,
+    clone_simulation_model,
     change_resource_amount,
     get_resource_id_by_name,
     add_resource_to_profile,
@@ -46,6 +49,8 @@ tools = [
     add_case_arrival,
     get_baseline_performance_report,
     generate_performance_report,
+    run_scenario_sweep_tool,
+    optimize_resource_allocation_tool,
 ]
 
 model_path = Path(__file__).parent.parent.parent.parent / "tests/test_data/PurchasingExample/simulation.json"
@@ -60,7 +65,7 @@ def create_initial_simulation_model() -> int:
     with model_path.open("r") as f:
         model = json.load(f)
     with get_session() as session:
-        relational_model = create_simulation_model_from_pix(session, model, process_path)
+        relational_model = create_simulation_model_from_pix(session, model, process_path, bulk=True)
     return relational_model.id
 
 
@@ -70,9 +75,11 @@ def main():
     create_tables()
     # import initial simulation model
     simulation_model_id = create_initial_simulation_model()
-    baseline_performance = run_prosimos(simulation_model_id, process_path)
+    baseline_performance = run_prosimos(
+        simulation_model_id, process_path, starting_at=SIMULATION_STARTING_AT, seed=SIMULATION_SEED
+    )
     # init the tools module internal variables
-    set_baseline_performance_report(get_resource_utilization_and_overall_statistics(baseline_performance))
+    set_baseline_performance_report(baseline_performance)
     set_process_path(process_path)
 
     try:
@@ -80,6 +87,7 @@ def main():
             model=Claude3.OPUS.value,
             tools=tools,
             system_instructions=make_simulation_copilot_system_prompt(simulation_model_id),
+            history=MessageHistory(token_budget=50_000, keep_tool_results=2),
         )
         conversation.run(
             """What if we increase the amount of resource named 'Carmen Finacse' to 3 and 'Esmeralda Clay' to 3?"""
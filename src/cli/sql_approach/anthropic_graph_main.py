@@ -12,7 +12,7 @@ from langchain.agents.tool_calling_agent.base import create_tool_calling_agent
 from langchain_anthropic import ChatAnthropic
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import BaseMessage, SystemMessage, FunctionMessage
+from langchain_core.messages import BaseMessage, SystemMessage, FunctionMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableBranch
 from langchain_core.tools import BaseTool
@@ -21,14 +21,14 @@ from langgraph.prebuilt import ToolExecutor
 
 from anthropic_advanced_main import create_initial_simulation_model, tools
 from llm_compiler_parser import LLMCompilerPlanParser
+from llm_compiler_scheduler import schedule_tasks
 from simulation_copilot.anthropic import Claude3
 from simulation_copilot.database import create_tables
 from simulation_copilot.prompts import make_simulation_copilot_system_prompt
-from simulation_copilot.prosimos_utils import (
-    run_prosimos,
-    get_resource_utilization_and_overall_statistics,
-)
+from simulation_copilot.prosimos_utils import run_prosimos
 from simulation_copilot.tools.prosimos_relational_tools import (
+    SIMULATION_SEED,
+    SIMULATION_STARTING_AT,
     set_baseline_performance_report,
     set_process_path,
 )
@@ -40,8 +40,10 @@ system_prompt = make_simulation_copilot_system_prompt(simulation_model_id)
 
 # init the tools module internal variables
 process_path = Path(__file__).parent.parent.parent.parent / "tests/test_data/PurchasingExample/process.bpmn"
-baseline_performance = run_prosimos(simulation_model_id, process_path)
-set_baseline_performance_report(get_resource_utilization_and_overall_statistics(baseline_performance))
+baseline_performance = run_prosimos(
+    simulation_model_id, process_path, starting_at=SIMULATION_STARTING_AT, seed=SIMULATION_SEED
+)
+set_baseline_performance_report(baseline_performance)
 set_process_path(process_path)
 
 # creating an agent
@@ -127,9 +129,22 @@ tool_executor = ToolExecutor(tools)
 
 
 def run_planner(data):
-    """Runs planner LLM on input."""
-    agent_outcome = planner.invoke(data)
-    return {"agent_outcome": agent_outcome}
+    """
+    Runs planner LLM on input and executes the planned tasks while the plan is streamed, independent tasks
+    concurrently. The agent gets the results as intermediate steps.
+    """
+    tasks = planner.stream([HumanMessage(content=data["input"])])
+    steps = []
+    for task, result in schedule_tasks(tasks):
+        if isinstance(task["tool"], str):  # join
+            continue
+        action = AgentAction(
+            tool=task["tool"].name,
+            tool_input=task["args"],
+            log=f"Planned task {task['idx']}: {task['tool'].name}({task['args']}) returned {result}",
+        )
+        steps.append((action, str(result)))
+    return {"agent_outcome": None, "intermediate_steps": steps}
 
 
 def run_agent(data):
@@ -165,7 +180,7 @@ workflow.add_node("planner", run_planner)
 workflow.add_node("agent", run_agent)
 workflow.add_node("action", execute_tools)
 workflow.set_entry_point("planner")
-workflow.add_conditional_edges("planner", should_continue, {"continue": "agent", "end": END})
+workflow.add_edge("planner", "agent")
 workflow.add_conditional_edges("agent", should_continue, {"continue": "action", "end": END})
 workflow.add_edge("action", "agent")
 
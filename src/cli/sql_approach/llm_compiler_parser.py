@@ -24,6 +24,14 @@ ACTION_PATTERN = r"\n*(\d+)\. (\w+)\((.*)\)(\s*#\w+\n)?"
 ID_PATTERN = r"\$\{?(\d+)\}?"
 END_OF_PLAN = "<END_OF_PLAN>"
 
+# patterns are compiled once, they are matched against every line of every plan
+_THOUGHT_REGEX = re.compile(THOUGHT_PATTERN)
+_ACTION_REGEX = re.compile(ACTION_PATTERN)
+_ID_REGEX = re.compile(ID_PATTERN)
+# characters which can start or end a nested value or a string, or separate arguments
+_ARGS_DELIMITER_REGEX = re.compile(r"""[,()\[\]{}"'\\]""")
+_KEYWORD_REGEX = re.compile(r"\s*(\w+)\s*=(?!=)")
+
 
 ### Helper functions
 
@@ -31,30 +39,60 @@ END_OF_PLAN = "<END_OF_PLAN>"
 def _ast_parse(arg: str) -> Any:
     try:
         return ast.literal_eval(arg)
-    except:  # noqa
-        return arg
-
-
-def _parse_llm_compiler_action_args(args: str, tool: Union[str, BaseTool]) -> list[Any]:
-    """Parse arguments from a string."""
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return arg  # e.g., a reference to another task's result, $1
+
+
+def _split_args(args: str) -> Iterator[str]:
+    """Splits arguments at top-level commas, commas inside strings, lists, tuples and dictionaries are kept."""
+    depth = 0
+    quote = None
+    escaped_at = -1  # position of the character escaped by a backslash in a string
+    start = 0
+    # only delimiters are visited, the other characters are skipped by the regular expression engine
+    for match in _ARGS_DELIMITER_REGEX.finditer(args):
+        char = match.group()
+        if quote:
+            if match.start() == escaped_at:
+                continue
+            if char == "\\":
+                escaped_at = match.end()
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            yield args[start : match.start()]
+            start = match.end()
+    yield args[start:]
+
+
+def _parse_llm_compiler_action_args(args: str, tool: Union[str, BaseTool]) -> Union[Dict[str, Any], tuple]:
+    """
+    Parses arguments of an action, e.g., `name="Carmen", amount=3`, into a dictionary by the tool's argument names.
+    Positional arguments are assigned to the tool's arguments in order, unknown keyword arguments are dropped.
+    """
     if args == "":
         return ()
     if isinstance(tool, str):
         return ()
+    keys = list(tool.args.keys())
     extracted_args = {}
-    tool_key = None
-    prev_idx = None
-    for key in tool.args.keys():
-        # Split if present
-        if f"{key}=" in args:
-            idx = args.index(f"{key}=")
-            if prev_idx is not None:
-                extracted_args[tool_key] = _ast_parse(args[prev_idx:idx].strip().rstrip(","))
-            args = args.split(f"{key}=", 1)[1]
-            tool_key = key
-            prev_idx = 0
-    if prev_idx is not None:
-        extracted_args[tool_key] = _ast_parse(args[prev_idx:].strip().rstrip(",").rstrip(")"))
+    for position, arg in enumerate(_split_args(args)):
+        if not arg.strip():
+            continue
+        match = _KEYWORD_REGEX.match(arg)
+        if match and match.group(1) in tool.args:
+            key, value = match.group(1), arg[match.end() :]
+        elif not match and position < len(keys):
+            key, value = keys[position], arg
+        else:
+            continue
+        extracted_args[key] = _ast_parse(value.strip())
     return extracted_args
 
 
@@ -64,11 +102,13 @@ def default_dependency_rule(idx, args: str):
     return idx in numbers
 
 
-def _get_dependencies_from_graph(idx: int, tool_name: str, args: Dict[str, Any]) -> dict[str, list[str]]:
+def _get_dependencies_from_graph(idx: int, tool_name: str, args: Dict[str, Any]) -> list[int]:
     """Get dependencies from a graph."""
     if tool_name == "join":
         return list(range(1, idx))
-    return [i for i in range(1, idx) if default_dependency_rule(i, str(args))]
+    # references are collected in one pass instead of searching for each previous task
+    references = {int(match) for match in _ID_REGEX.findall(str(args))}
+    return sorted(i for i in references if 1 <= i < idx)
 
 
 class Task(TypedDict):
@@ -118,7 +158,8 @@ class LLMCompilerPlanParser(BaseTransformOutputParser[dict], extra="allow"):
             # Assume input is str. TODO: support vision/other formats
             text = chunk if isinstance(chunk, str) else str(chunk.content)
             for task, thought in self.ingest_token(text, texts, thought):
-                yield task
+                if task:
+                    yield task
         # Final possible task
         if texts:
             task, _ = self._parse_task("".join(texts), thought)
@@ -139,23 +180,28 @@ class LLMCompilerPlanParser(BaseTransformOutputParser[dict], extra="allow"):
     def ingest_token(
         self, token: str, buffer: List[str], thought: Optional[str]
     ) -> Iterator[Tuple[Optional[Task], str]]:
-        buffer.append(token)
-        if "\n" in token:
-            buffer_ = "".join(buffer).split("\n")
-            suffix = buffer_[-1]
-            for line in buffer_[:-1]:
-                task, thought = self._parse_task(line, thought)
-                if task:
-                    yield task, thought
-            buffer.clear()
-            buffer.append(suffix)
+        """
+        Parses the lines completed by the token. The buffer holds the tokens of the current incomplete line, so each
+        character of the plan is joined and matched only once. Yields the task of each line, or None if the line has
+        no task, with the thought to pass on, so a thought is kept for the next task even if it's in another token.
+        """
+        if "\n" not in token:
+            buffer.append(token)
+            return
+        lines = token.split("\n")
+        lines[0] = "".join(buffer) + lines[0]
+        buffer.clear()
+        buffer.append(lines[-1])
+        for line in lines[:-1]:
+            task, thought = self._parse_task(line, thought)
+            yield task, thought
 
     def _parse_task(self, line: str, thought: Optional[str] = None):
         task = None
-        if match := re.match(THOUGHT_PATTERN, line):
+        if match := _THOUGHT_REGEX.match(line):
             # Optionally, action can be preceded by a thought
             thought = match.group(1)
-        elif match := re.match(ACTION_PATTERN, line):
+        elif match := _ACTION_REGEX.match(line):
             # if action is parsed, return the task, and clear the buffer
             idx, tool_name, args, _ = match.groups()
             idx = int(idx)
@@ -0,0 +1,89 @@
+"""
+Scheduler executing LLMCompiler plans.
+
+Tasks streamed by LLMCompilerPlanParser start as soon as the tasks they depend on have finished, so independent tasks
+run concurrently, and the first tasks run while the planner is still writing the rest of the plan. References
+to results of previous tasks in task arguments, i.e., $N or ${N}, are replaced by the results before the task runs.
+
+Side effects declared by tools, see declare_tool_effects, are respected as in Conversation: a task also waits for
+the previous tasks it isn't independent of, e.g., two changes of the same resource run in the plan order.
+"""
+
+import re
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from llm_compiler_parser import ID_PATTERN, Task
+from simulation_copilot.anthropic.conversation import _are_independent, _declared_effects
+from simulation_copilot.tracing import propagate_context, span
+
+_ID_REGEX = re.compile(ID_PATTERN)
+
+
+def schedule_tasks(
+    tasks: Iterable[Task], observations: Optional[Dict[int, Any]] = None, max_workers: int = 4
+) -> List[Tuple[Task, Any]]:
+    """
+    Executes the tasks in a pool of max_workers threads and returns the tasks with their results in the plan order.
+
+    Each task is submitted as soon as the planner yields it and waits only for its dependencies and the previous
+    tasks whose declared effects conflict with its own. Observations are results of tasks executed before, e.g.,
+    by the previous plan when replanning, they can be referenced too. A failed task results in an error message,
+    so the planner can see it and replan.
+    """
+    observations = dict(observations or {})
+    submitted: List[Tuple[Task, tuple, Future]] = []
+    futures: Dict[int, Future] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for task in tasks:
+            effects = _task_effects(task)
+            # dependencies were submitted earlier, so they are already running in the FIFO pool and can't deadlock
+            dependencies = {idx: futures[idx] for idx in task["dependencies"] if idx in futures}
+            conflicts = [future for _, other, future in submitted if not _are_independent(effects, other)]
+            future = executor.submit(propagate_context(_run_task), task, dependencies, conflicts, observations)
+            futures[task["idx"]] = future
+            submitted.append((task, effects, future))
+    return [(task, future.result()) for task, _, future in submitted]
+
+
+def _task_effects(task: Task) -> tuple:
+    tool = task["tool"]
+    if isinstance(tool, str):
+        return True, frozenset()  # join doesn't run anything
+    args = dict(task["args"])
+    # the state may depend on results of other tasks, then it's known only when the task runs
+    tool_input = None if _ID_REGEX.search(repr(args)) else args
+    try:
+        return _declared_effects(tool, tool_input)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return False, None  # invalid arguments, the task fails when run, so it just runs alone
+
+
+def _run_task(
+    task: Task, dependencies: Dict[int, Future], conflicts: List[Future], observations: Dict[int, Any]
+) -> Any:
+    wait([*dependencies.values(), *conflicts])
+    tool = task["tool"]
+    if isinstance(tool, str):  # join only marks the end of the plan
+        return tool
+    results = {**observations, **{idx: future.result() for idx, future in dependencies.items()}}
+    args = {key: _resolve_arg(value, results) for key, value in dict(task["args"]).items()}
+    with span("tool.call", tool=tool.name, task=task["idx"]):
+        try:
+            return tool.invoke(args)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return f"ERROR(Failed to call {tool.name} with args {args}: {e!r})"
+
+
+def _resolve_arg(arg: Any, results: Dict[int, Any]) -> Any:
+    """Replaces references to results of other tasks, a reference as the whole argument keeps the result type."""
+    if isinstance(arg, str):
+        match = _ID_REGEX.fullmatch(arg.strip())
+        if match and int(match.group(1)) in results:
+            return results[int(match.group(1))]
+        return _ID_REGEX.sub(lambda m: str(results.get(int(m.group(1)), m.group(0))), arg)
+    if isinstance(arg, (list, tuple)):
+        return type(arg)(_resolve_arg(item, results) for item in arg)
+    if isinstance(arg, dict):
+        return {key: _resolve_arg(value, results) for key, value in arg.items()}
+    return arg
@@ -7,4 +7,7 @@ Typical usage example:
 TODO: ...
 """
 
+from .clients import AnthropicClient, LLMClient, RecordReplayClient, ScriptedClient
 from .conversation import *
+from .history import MessageHistory
+from .registry import ToolRegistry, format_tool, format_tools
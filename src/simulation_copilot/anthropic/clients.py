@@ -0,0 +1,157 @@
+"""LLM clients for Conversation.
+
+Conversation talks to the model through a client, so the Anthropic API can be replaced by an offline backend
+in tests and benchmarks:
+
+- AnthropicClient sends requests to the Anthropic API;
+- ScriptedClient returns the given responses in order and records requests;
+- RecordReplayClient stores responses of another client on disk by the hash of the request and replays them.
+
+Streamed requests are supported by all clients. The offline clients emit the stored response as server-sent events.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator, List, Literal, Optional, Protocol, Union
+
+from anthropic import Anthropic
+from anthropic.types.beta.tools import ToolsBetaMessage
+from pydantic import BaseModel
+
+from .history import estimate_tokens
+
+
+class LLMClient(Protocol):
+    """Client of a chat model with tools."""
+
+    def create_message(self, **request) -> Union[ToolsBetaMessage, Iterator]:
+        """
+        Sends the request with the parameters of Anthropic's tools messages API and returns the response message,
+        or an iterable stream of server-sent events if the request has stream=True.
+        """
+
+    def count_tokens(self, text: str) -> int:
+        """Returns the number of tokens in the text."""
+
+
+class AnthropicClient:
+    """Client of the Anthropic API."""
+
+    def __init__(self, client: Optional[Anthropic] = None):
+        self._client = client or Anthropic()
+
+    def create_message(self, **request) -> Union[ToolsBetaMessage, Iterator]:
+        return self._client.beta.tools.messages.create(**request)
+
+    def count_tokens(self, text: str) -> int:
+        return self._client.count_tokens(text)
+
+
+class ScriptedClient:
+    """Deterministic client which returns the given responses in order. Requests are recorded in requests."""
+
+    def __init__(self, responses: List[ToolsBetaMessage]):
+        self.requests: List[dict] = []
+        self._responses = list(responses)
+
+    def create_message(self, **request) -> Union[ToolsBetaMessage, Iterator]:
+        self.requests.append({**request, "messages": list(request.get("messages", []))})  # history is mutable
+        if len(self.requests) > len(self._responses):
+            raise RuntimeError(f"No scripted response left for request #{len(self.requests)}")
+        return _respond(self._responses[len(self.requests) - 1], request)
+
+    def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+
+class RecordReplayClient:
+    """
+    Client which replays responses stored in the directory by the hash of the request.
+
+    In the "replay" mode, a missing response is an error. In the "record" mode, every request is sent to the wrapped
+    client and the response is stored. In the "auto" mode, only missing responses are requested and stored.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        client: Optional[LLMClient] = None,
+        mode: Literal["replay", "record", "auto"] = "auto",
+    ):
+        if mode != "replay" and client is None:
+            raise ValueError(f"Mode {mode} needs a client to record responses")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self._client = client
+
+    def create_message(self, **request) -> Union[ToolsBetaMessage, Iterator]:
+        path = self.directory / f"{request_hash(request)}.json"
+        if self.mode == "record" or (self.mode == "auto" and not path.exists()):
+            # streaming isn't recorded, the response is stored as a whole and replayed as a stream if requested
+            response = self._client.create_message(**{k: v for k, v in request.items() if k != "stream"})
+            path.write_text(response.model_dump_json(), encoding="utf-8")
+        elif not path.exists():
+            raise KeyError(f"No recorded response for the request, expected in {path}")
+        else:
+            response = ToolsBetaMessage.model_validate_json(path.read_text(encoding="utf-8"))
+        return _respond(response, request)
+
+    def count_tokens(self, text: str) -> int:
+        if self._client is not None:
+            return self._client.count_tokens(text)
+        return estimate_tokens(text)
+
+
+def request_hash(request: dict) -> str:
+    """Returns a stable hash of the request, transport options, i.e., streaming and headers, are ignored."""
+    content = {k: v for k, v in request.items() if k not in ("stream", "extra_headers")}
+    serialized = json.dumps(content, sort_keys=True, default=_to_json)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def _to_json(o):
+    if isinstance(o, BaseModel):
+        return o.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _respond(response: ToolsBetaMessage, request: dict) -> Union[ToolsBetaMessage, Iterator]:
+    if request.get("stream"):
+        return _Stream(response)
+    return response
+
+
+class _Stream:
+    """Server-sent events of a complete message, with the same interface as anthropic.Stream."""
+
+    def __init__(self, message: ToolsBetaMessage):
+        self._message = message
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        message = self._message
+        yield SimpleNamespace(
+            type="message_start",
+            message=SimpleNamespace(id=message.id, model=message.model, usage=message.usage),
+        )
+        for index, block in enumerate(message.content):
+            if block.type == "tool_use":
+                start = SimpleNamespace(type="tool_use", id=block.id, name=block.name, input={})
+                delta = SimpleNamespace(type="input_json_delta", partial_json=json.dumps(block.input))
+            else:
+                start = SimpleNamespace(type="text", text="")
+                delta = SimpleNamespace(type="text_delta", text=block.text)
+            yield SimpleNamespace(type="content_block_start", index=index, content_block=start)
+            yield SimpleNamespace(type="content_block_delta", index=index, delta=delta)
+            yield SimpleNamespace(type="content_block_stop", index=index)
+        yield SimpleNamespace(
+            type="message_delta",
+            delta=SimpleNamespace(stop_reason=message.stop_reason, stop_sequence=message.stop_sequence),
+            usage=SimpleNamespace(output_tokens=message.usage.output_tokens),
+        )
+        yield SimpleNamespace(type="message_stop")
+
+    def close(self):
+        pass
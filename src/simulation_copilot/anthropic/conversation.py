@@ -5,18 +5,25 @@ Typical usage example:
 TODO: ...
 """
 
+import json
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from enum import Enum
 from functools import partial
-from typing import List, Optional, Dict, Union, Literal
+from typing import Callable, Iterable, List, Optional, Dict, Union, Literal
 
-from anthropic import Anthropic
-from anthropic.types import TextBlock
+from anthropic.types import TextBlock, Usage
 from anthropic.types.beta.tools import ToolsBetaMessage, ToolUseBlock
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel
 from termcolor import colored
 
+from simulation_copilot.tracing import propagate_context, span
+
+from .clients import AnthropicClient, LLMClient
+from .history import MessageHistory
+from .registry import ToolRegistry
+
 
 class Role(str, Enum):
     USER = "user"
@@ -108,40 +115,239 @@ def _print_role(s: str, role: str):
     print(colored(s, role_to_color[role]))
 
 
-def find_tool(name: str, tools: List[StructuredTool]):
-    for t in tools:
-        if t.name == name:
-            return t
-    return None
+# Anthropic beta features used in requests, the tools beta is required by the SDK's tools endpoint
+_BETA_HEADERS = {"anthropic-beta": "tools-2024-04-04,prompt-caching-2024-07-31"}
+_CACHE_CONTROL = {"type": "ephemeral"}
 
 
-def format_tool(tool: StructuredTool):
-    return {
-        "name": tool.name,
-        "description": tool.description.strip(),
-        "input_schema": tool.args_schema.schema(),
-    }
+def _cacheable_system(system_instructions: str) -> Union[str, List[dict]]:
+    """Marks the system prompt as a cacheable prefix of requests."""
+    if not system_instructions:
+        return system_instructions
+    return [{"type": "text", "text": system_instructions, "cache_control": _CACHE_CONTROL}]
 
 
-def format_tools(tools: list[StructuredTool]):
-    return [format_tool(tool) for tool in tools]
+def _cacheable_tools(tools: List[dict]) -> List[dict]:
+    """Marks tool definitions as a cacheable prefix of requests, the cache breakpoint at the last tool covers all."""
+    if not tools:
+        return tools
+    return tools[:-1] + [{**tools[-1], "cache_control": _CACHE_CONTROL}]
 
 
 class _ToolResult(BaseModel):
     tool_block: ToolUseBlock
     output: object
+    is_error: bool = False
 
 
-def _run_tool_block(block: ToolUseBlock, tools: List[StructuredTool]) -> Optional[_ToolResult]:
+def _run_tool_block(block: ToolUseBlock, tools: ToolRegistry) -> Optional[_ToolResult]:
     if block is None:
         print("Calling run_tool_block with empty block: %s" % block)
         return None
-    tool = find_tool(block.name, tools)
+    error = tools.validate(block.name, block.input)
+    if error is not None:
+        print(f"* [rejected {block}: {error}]")
+        return _ToolResult(tool_block=block, output=error, is_error=True)
+    tool = tools.get(block.name)
     print(f"* [running {tool} on {block}]")
-    output = str(tool.func(**block.input))  # only str or a list of content blocks are allowed
+    with span("tool.call", tool=block.name, tool_use_id=block.id):
+        output = str(tool.func(**block.input))  # only str or a list of content blocks are allowed
     return _ToolResult(tool_block=block, output=output)
 
 
+# Keys of StructuredTool.metadata declaring side effects of a tool, see declare_tool_effects
+_READ_ONLY = "read_only"
+_STATE = "state"
+
+
+def declare_tool_effects(
+    tool: StructuredTool,
+    read_only: bool = False,
+    state: Union[Iterable[str], Callable[[dict], Iterable[str]], None] = None,
+) -> StructuredTool:
+    """
+    Declares side effects of the tool, so the conversation can run independent tool calls concurrently.
+
+    A read-only tool doesn't change any state. State is the list of names of the state the tool reads or writes,
+    e.g., "resource:1", or a function returning the list given the tool input. An empty list means the tool
+    doesn't touch any shared state, e.g., it only creates new records. Two tool calls are independent
+    if both are read-only, or if both declare state and the states don't overlap. Tools without declarations
+    are never run concurrently with tools that change state.
+    """
+    tool.metadata = {**(tool.metadata or {}), _READ_ONLY: read_only, _STATE: state}
+    return tool
+
+
+def _tool_effects(block: ToolUseBlock, tools: ToolRegistry) -> tuple[bool, Optional[frozenset]]:
+    if tools.validate(block.name, block.input) is not None:
+        return False, None  # the call is rejected when run, its state can't be computed from the invalid input
+    return _declared_effects(tools.get(block.name), block.input)
+
+
+def _declared_effects(tool: StructuredTool, tool_input: Optional[dict]) -> tuple[bool, Optional[frozenset]]:
+    """Returns effects of a call of the tool, see declare_tool_effects. None input means it isn't known yet."""
+    metadata = tool.metadata or {}
+    state = metadata.get(_STATE)
+    if callable(state):
+        state = state(tool_input) if tool_input is not None else None
+    return metadata.get(_READ_ONLY, False), frozenset(state) if state is not None else None
+
+
+def _are_independent(a: tuple[bool, Optional[frozenset]], b: tuple[bool, Optional[frozenset]]) -> bool:
+    (a_read_only, a_state), (b_read_only, b_state) = a, b
+    if a_read_only and b_read_only:
+        return True
+    if a_state is None or b_state is None:
+        return False
+    return a_state.isdisjoint(b_state)
+
+
+def _schedule_tool_blocks(blocks: List[ToolUseBlock], tools: ToolRegistry) -> List[List[ToolUseBlock]]:
+    """
+    Splits tool blocks into batches of independent blocks keeping the order of blocks, so a block which depends on
+    a previous one runs only after the previous one has finished.
+    """
+    batches: List[List[tuple[ToolUseBlock, tuple]]] = []
+    for block in blocks:
+        effects = _tool_effects(block, tools)
+        if batches and all(_are_independent(effects, other) for _, other in batches[-1]):
+            batches[-1].append((block, effects))
+        else:
+            batches.append([(block, effects)])
+    return [[block for block, _ in batch] for batch in batches]
+
+
+def _run_tool_blocks_concurrently(
+    blocks: List[ToolUseBlock], tools: ToolRegistry, executor: ThreadPoolExecutor
+) -> List[_ToolResult]:
+    results = []
+    for batch in _schedule_tool_blocks(blocks, tools):
+        futures = [executor.submit(propagate_context(_run_tool_block), block, tools) for block in batch]
+        results.extend(future.result() for future in futures)
+    return results
+
+
+class _IncrementalToolRunner:
+    """
+    Starts tool blocks as soon as they are known, e.g., while the response is still streamed. A block waits only for
+    the previously submitted blocks it depends on, see declare_tool_effects. At most max_blocks blocks are run.
+
+    Only read-only blocks start right away: the response may still end with another stop reason than tool_use,
+    e.g., max_tokens, and then its tool calls must not change anything. Other blocks, and all blocks after them
+    to keep the order of calls, are deferred until finish is called with the stop reason of the response.
+    """
+
+    def __init__(self, tools: ToolRegistry, executor: ThreadPoolExecutor, max_blocks: Optional[int] = None):
+        self._tools = tools
+        self._executor = executor
+        self._max_blocks = max_blocks
+        self._submitted: List[tuple[tuple, Future]] = []
+        self._deferred: List[tuple[ToolUseBlock, tuple]] = []
+
+    def submit(self, block: ToolUseBlock):
+        if self._max_blocks is not None and len(self._submitted) + len(self._deferred) >= self._max_blocks:
+            return
+        effects = _tool_effects(block, self._tools)
+        read_only, _ = effects
+        if self._deferred or not read_only:
+            self._deferred.append((block, effects))
+        else:
+            self._start(block, effects)
+
+    def finish(self, stop_reason: Optional[str]):
+        """Starts the deferred blocks if the response asks for tools, otherwise drops them."""
+        deferred, self._deferred = self._deferred, []
+        if stop_reason == "tool_use":
+            for block, effects in deferred:
+                self._start(block, effects)
+
+    def results(self) -> List[_ToolResult]:
+        return [future.result() for _, future in self._submitted]
+
+    def _start(self, block: ToolUseBlock, effects: tuple):
+        dependencies = [future for other, future in self._submitted if not _are_independent(effects, other)]
+        # dependencies were submitted earlier, so they are already running in the FIFO pool and can't deadlock
+        self._submitted.append((effects, self._executor.submit(propagate_context(self._run), block, dependencies)))
+
+    def _run(self, block: ToolUseBlock, dependencies: List[Future]) -> _ToolResult:
+        wait(dependencies)
+        return _run_tool_block(block, self._tools)
+
+
+def _field(obj, name: str, default=None):
+    # the SDK parses payloads of events it doesn't know, e.g., tool use blocks and input JSON deltas, as dicts
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _message_from_stream(
+    events: Iterable,
+    on_text: Callable[[str], None],
+    on_tool_use: Callable[[ToolUseBlock], None],
+) -> ToolsBetaMessage:
+    """
+    Assembles the message from server-sent events of a streamed response. Text deltas are passed to on_text
+    as they arrive, and each tool use block is passed to on_tool_use as soon as its input is complete.
+    """
+    # pylint: disable=too-many-branches
+    message, stop_reason, stop_sequence, output_tokens = None, None, None, 0
+    blocks: Dict[int, dict] = {}
+    for event in events:
+        if event.type == "message_start":
+            message = event.message
+        elif event.type == "content_block_start":
+            block = event.content_block
+            if _field(block, "type") == "tool_use":
+                blocks[event.index] = {
+                    "type": "tool_use",
+                    "id": _field(block, "id"),
+                    "name": _field(block, "name"),
+                    "json": "",
+                }
+            else:
+                blocks[event.index] = {"type": "text", "text": _field(block, "text", "")}
+        elif event.type == "content_block_delta":
+            if _field(event.delta, "type") == "input_json_delta":
+                blocks[event.index]["json"] += _field(event.delta, "partial_json")
+            else:
+                text = _field(event.delta, "text")
+                blocks[event.index]["text"] += text
+                on_text(text)
+        elif event.type == "content_block_stop":
+            block = blocks[event.index]
+            if block["type"] == "tool_use":
+                block["block"] = ToolUseBlock(
+                    type="tool_use", id=block["id"], name=block["name"], input=json.loads(block["json"] or "{}")
+                )
+                on_tool_use(block["block"])
+        elif event.type == "message_delta":
+            stop_reason, stop_sequence = _field(event.delta, "stop_reason"), _field(event.delta, "stop_sequence")
+            output_tokens = _field(event.usage, "output_tokens")
+
+    content = [
+        block["block"] if block["type"] == "tool_use" else TextBlock(type="text", text=block["text"])
+        for _, block in sorted(blocks.items())
+        if block["type"] == "text" or "block" in block  # tool use blocks cut by max_tokens are incomplete
+    ]
+    return ToolsBetaMessage(
+        id=message.id,
+        type="message",
+        role="assistant",
+        model=message.model,
+        content=content,
+        stop_reason=stop_reason,
+        stop_sequence=stop_sequence,
+        usage=Usage(input_tokens=message.usage.input_tokens, output_tokens=output_tokens),
+    )
+
+
+def _usage_attributes(usage: Usage) -> dict:
+    # cache token counts are reported only with prompt caching
+    fields = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+    return {name: getattr(usage, name) for name in fields if getattr(usage, name, None) is not None}
+
+
 def _tool_blocks_from_response(response: ToolsBetaMessage) -> List[ToolUseBlock]:
     if response.stop_reason != "tool_use":
         return []
@@ -167,8 +373,8 @@ class ContentBlock(BaseModel):  # ToolResultBlockParam from Anthropic
     is_error: Optional[bool] = None
 
     @staticmethod
-    def from_str(message: str, tool_use_id: str) -> "ContentBlock":
-        return ContentBlock(tool_use_id=tool_use_id, content=[TextBlock(type="text", text=message)])
+    def from_str(message: str, tool_use_id: str, is_error: Optional[bool] = None) -> "ContentBlock":
+        return ContentBlock(tool_use_id=tool_use_id, content=[TextBlock(type="text", text=message)], is_error=is_error)
 
 
 class RequestMessage(BaseModel):
@@ -184,36 +390,91 @@ def _compose_message_from_tools_output(
 ) -> RequestMessage:
     return RequestMessage(
         content=[
-            ContentBlock.from_str(message=str(result.output), tool_use_id=result.tool_block.id)
+            ContentBlock.from_str(
+                message=str(result.output), tool_use_id=result.tool_block.id, is_error=result.is_error or None
+            )
             for result in tools_output
         ]
     )
 
 
 class Conversation:
+    """
+    Conversation with an Anthropic LLM which can call the given tools.
+
+    By default, only the first tool call of each response is executed. With parallel_tool_calls, all tool calls
+    of a response are executed, independent ones concurrently in a pool of max_workers threads,
+    see declare_tool_effects, and all results are sent back in one message.
+
+    Calls of unknown tools and tool inputs not matching the tool's args_schema aren't run, the model gets an error
+    result instead, see ToolRegistry.
+
+    Requests are sent by the given client, the Anthropic API by default, see simulation_copilot.anthropic.clients
+    for offline clients.
+
+    With prompt_caching, the tool definitions and the system prompt, which are the same in every request, are marked
+    as cacheable prefixes, so they are processed once and then read from Anthropic's prompt cache.
+
+    The message history is kept within a token budget by the given MessageHistory, by default, it's unbounded.
+
+    With streaming, the response text is printed as it arrives, and tool calls start as soon as their input
+    is complete, while the model is still producing the rest of the response.
+
+    NOTE: tools changing the database concurrently need a database with a connection per session,
+    an in-memory SQLite database shares one connection between all sessions.
+    """
+
     def __init__(
         self,
         model: str,
-        tools: List[StructuredTool],
+        tools: Union[List[StructuredTool], ToolRegistry],
         max_tokens: int = 4096,
         max_tools_invocations: int = 10,
         system_instructions: str = "",
+        parallel_tool_calls: bool = False,
+        max_workers: int = 4,
+        streaming: bool = False,
+        history: Optional[MessageHistory] = None,
+        prompt_caching: bool = True,
+        client: Optional[LLMClient] = None,
     ):
+        # pylint: disable=too-many-arguments
         assert max_tokens <= 4096, "Maximum output is 4096 tokens"
-        self.tools = tools
-        self.messages = []
-        self._client = Anthropic()
+        self.tools = tools if isinstance(tools, ToolRegistry) else ToolRegistry(tools)
+        self._client = client or AnthropicClient()
+        self.history = history or MessageHistory(count_tokens=self._client.count_tokens)
+        formatted_tools = self.tools.schemas
+        cache_options = {}
+        if prompt_caching:
+            formatted_tools = _cacheable_tools(formatted_tools)
+            system_instructions = _cacheable_system(system_instructions)
+            cache_options["extra_headers"] = _BETA_HEADERS
         self._call = partial(
-            self._client.beta.tools.messages.create,
+            self._client.create_message,
             model=model,
-            tools=format_tools(tools),
+            tools=formatted_tools,
             max_tokens=max_tokens,
             system=system_instructions,
             temperature=0.1,
+            **cache_options,
         )  # partial function with most of the parameters pre-filled
         self._max_tools_invocations = max_tools_invocations
+        self._parallel_tool_calls = parallel_tool_calls
+        self._streaming = streaming
+        self._executor = None
+        if parallel_tool_calls or streaming:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers if parallel_tool_calls else 1)
+        self._tool_runner: Optional[_IncrementalToolRunner] = None  # tools started while streaming
+
+    @property
+    def messages(self) -> List[dict]:
+        return self.history.messages
 
     def run(self, user_prompt: str):
+        with span("conversation.run"):
+            self._run(user_prompt)
+
+    def _run(self, user_prompt: str):
         # first request
         message = {"role": Role.USER.value, "content": user_prompt}
         response = self._request_and_append_messages(message=message)
@@ -231,14 +492,19 @@ class Conversation:
                 print("No tools blocks found")
                 return
 
-            # Avoid running many tools:
-            # often, Claude3 OPUS wants to execute several tools at once instead of running them sequentially,
-            # we pick only the first tool call here and execute it instead of all tool blocks,
-            # so that LLM can adjust input parameters for the next tools
-            if len(tool_blocks) > 1:
-                tool_blocks = tool_blocks[:1]
-
-            tools_output = [_run_tool_block(block, self.tools) for block in tool_blocks]
+            if self._tool_runner is not None:
+                tools_output = self._tool_runner.results()
+            elif self._parallel_tool_calls:
+                tools_output = _run_tool_blocks_concurrently(tool_blocks, self.tools, self._executor)
+            else:
+                # Avoid running many tools:
+                # often, Claude3 OPUS wants to execute several tools at once instead of running them sequentially,
+                # we pick only the first tool call here and execute it instead of all tool blocks,
+                # so that LLM can adjust input parameters for the next tools
+                if len(tool_blocks) > 1:
+                    tool_blocks = tool_blocks[:1]
+
+                tools_output = [_run_tool_block(block, self.tools) for block in tool_blocks]
             if len(tools_output) == 0:  # no tools output, nothing to send to LLM, exit
                 print("No tools results produced")
                 return
@@ -250,9 +516,33 @@ class Conversation:
         assert (
             message["role"] == Role.USER.value
         ), f"The last message before sending a request must be from user, got {message}"
-        self.messages.append(message)
+        self.history.append(message)
         pretty_print(message)
-        response = self._call(messages=self.messages)
-        self.messages.append(_simplify_tool_beta_message(response))
-        pretty_print(response)
+        with span("llm.call", streaming=self._streaming, history_tokens=self.history.token_count()) as call_span:
+            if self._streaming:
+                response = self._stream_response()
+            else:
+                response = self._call(messages=self.messages)
+                pretty_print(response)
+            call_span.set(stop_reason=response.stop_reason, **_usage_attributes(response.usage))
+        self.history.append(_simplify_tool_beta_message(response))
+        return response
+
+    def _stream_response(self) -> ToolsBetaMessage:
+        # only the first tool runs unless parallel tool calls are enabled, see run
+        self._tool_runner = _IncrementalToolRunner(
+            self.tools, self._executor, max_blocks=None if self._parallel_tool_calls else 1
+        )
+        _print_role(f"\n{Role.ASSISTANT.value.upper()}:", Role.ASSISTANT.value)
+        stream = self._call(messages=self.messages, stream=True)
+        try:
+            response = _message_from_stream(
+                stream,
+                on_text=lambda text: print(colored(text, "blue"), end="", flush=True),
+                on_tool_use=self._tool_runner.submit,
+            )
+        finally:
+            stream.close()
+        self._tool_runner.finish(response.stop_reason)
+        _print_role(f"\n  [stop_reason={response.stop_reason}]", Role.ASSISTANT.value)
         return response
@@ -0,0 +1,100 @@
+"""Message history of a conversation with a token budget.
+
+Every request to the model resends the whole history, so long sessions with large tool results, e.g., simulation
+model dumps and performance reports, quickly grow the input cost of each call. MessageHistory keeps the history
+within a token budget: stale tool results are elided first, then the oldest exchanges are dropped.
+"""
+
+import json
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel
+
+_ELIDED_SUFFIX = " characters of the stale tool result elided]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough estimate of the number of tokens in the text, about 4 characters per token."""
+    return len(text) // 4 + 1
+
+
+class MessageHistory:
+    """
+    Messages of a conversation with token counts.
+
+    Tool results of all but the last keep_tool_results tool result messages are elided to their first
+    elided_result_chars characters, so IDs and the header of a result are kept, but not full dumps. Short results
+    are never elided. If token_budget is set and the history is still over the budget, the oldest assistant and
+    user message pairs after the first user message are dropped, while the last pair is always kept.
+    The first user message stays because it usually states the task.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        keep_tool_results: Optional[int] = None,
+        elided_result_chars: int = 200,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.keep_tool_results = keep_tool_results
+        self.elided_result_chars = elided_result_chars
+        self.messages: List[dict] = []
+        self._count_tokens = count_tokens
+        self._tokens: List[int] = []  # token count of each message
+
+    def append(self, message: dict):
+        """Appends the message and compacts the history if needed."""
+        self.messages.append(message)
+        self._tokens.append(self._count_tokens(_message_text(message)))
+        self.compact()
+
+    def token_count(self) -> int:
+        """Returns the total number of tokens in the history."""
+        return sum(self._tokens)
+
+    def compact(self):
+        """Elides stale tool results and drops the oldest messages while the history is over the token budget."""
+        if self.keep_tool_results is not None:
+            self._elide_stale_tool_results()
+        if self.token_budget is None:
+            return
+        while self.token_count() > self.token_budget and len(self.messages) > 3:
+            del self.messages[1:3]
+            del self._tokens[1:3]
+
+    def _elide_stale_tool_results(self):
+        tool_result_indices = [i for i, message in enumerate(self.messages) if _is_tool_result_message(message)]
+        stale = tool_result_indices[: max(len(tool_result_indices) - self.keep_tool_results, 0)]
+        for i in stale:
+            message = self.messages[i]
+            content = [_elide_tool_result(block, self.elided_result_chars) for block in message["content"]]
+            if content != message["content"]:
+                self.messages[i] = {**message, "content": content}
+                self._tokens[i] = self._count_tokens(_message_text(self.messages[i]))
+
+
+def _is_tool_result_message(message: dict) -> bool:
+    content = message.get("content")
+    return (
+        message.get("role") == "user"
+        and isinstance(content, list)
+        and any(isinstance(block, dict) and block.get("type") == "tool_result" for block in content)
+    )
+
+
+def _elide_tool_result(block, max_chars: int):
+    if not isinstance(block, dict) or block.get("type") != "tool_result":
+        return block
+    text = "".join(part.get("text", "") for part in block.get("content", []))
+    if len(text) <= max_chars or text.endswith(_ELIDED_SUFFIX):
+        return block
+    elided = f"{text[:max_chars]}... [{len(text) - max_chars}{_ELIDED_SUFFIX}"
+    return {**block, "content": [{"type": "text", "text": elided}]}
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, default=lambda o: o.model_dump() if isinstance(o, BaseModel) else str(o))
@@ -0,0 +1,74 @@
+"""Registry of the tools available in a conversation.
+
+The registry indexes tools by name and formats their definitions for the Anthropic API once, so neither lookups
+nor request construction depend on the number of tools. Tool inputs produced by the model are validated against
+the tool's args_schema before the tool runs, and problems are returned as error messages for the model instead of
+exceptions, so a malformed tool call doesn't end the conversation.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional
+
+from langchain_core.pydantic_v1 import ValidationError as ValidationErrorV1
+from langchain_core.tools import StructuredTool
+from pydantic import ValidationError
+
+
+def format_tool(tool: StructuredTool):
+    return _format_tool(tool.name, tool.description, tool.args_schema)
+
+
+@lru_cache(maxsize=None)
+def _format_tool(name: str, description: str, args_schema: type) -> dict:
+    # the JSON schema is generated once per tool, callers must not modify the returned dictionary
+    return {
+        "name": name,
+        "description": description.strip(),
+        "input_schema": args_schema.schema(),
+    }
+
+
+def format_tools(tools: list[StructuredTool]):
+    return [format_tool(tool) for tool in tools]
+
+
+class ToolRegistry:
+    """Tools indexed by name with their definitions formatted for the Anthropic API."""
+
+    def __init__(self, tools: Iterable[StructuredTool]):
+        self.tools: List[StructuredTool] = list(tools)
+        self._by_name = {}
+        for tool in self.tools:
+            if tool.name in self._by_name:
+                raise ValueError(f"Duplicate tool name {tool.name}")
+            self._by_name[tool.name] = tool
+        self.schemas: List[dict] = format_tools(self.tools)
+
+    def __iter__(self) -> Iterator[StructuredTool]:
+        return iter(self.tools)
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def get(self, name: str) -> Optional[StructuredTool]:
+        """Returns the tool with the given name or None if there is no such tool."""
+        return self._by_name.get(name)
+
+    def validate(self, name: str, tool_input: dict) -> Optional[str]:
+        """
+        Validates the input of a call of the tool with the given name. Returns the error message for the model
+        if the tool doesn't exist or the input doesn't match the tool's args_schema, otherwise None.
+        """
+        tool = self._by_name.get(name)
+        if tool is None:
+            return f"Unknown tool {name}, available tools are: {', '.join(self._by_name)}"
+        if tool.args_schema is None:
+            return None
+        try:
+            tool.args_schema.parse_obj(tool_input)
+        except (ValidationError, ValidationErrorV1) as e:
+            return f"Invalid input of tool {name}: {e}"
+        return None
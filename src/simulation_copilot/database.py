@@ -1,19 +1,62 @@
-"""Database access API."""
+"""Database access API.
 
+The engine and its connection pool are configured from environment variables:
+
+- DATABASE_URL: SQLAlchemy database URL, a temporary SQLite database file removed at exit is used by default;
+- DATABASE_POOL_SIZE: number of connections kept in the pool, SQLAlchemy's default if not set;
+- DATABASE_MAX_OVERFLOW: number of connections allowed above the pool size, SQLAlchemy's default if not set.
+
+Sessions are not shared between threads. Use get_session() to get the session of the current thread,
+or session_scope() to run a unit of work in a short-lived session of its own. Each thread gets a connection
+of its own, so several conversations can run concurrently against one database. The only exception is
+an in-memory SQLite database, e.g., in the testing mode, which has a single connection shared by all threads,
+see is_connection_shared.
+
+For asyncio applications, get_async_sessionmaker() provides sessions bound to an async engine for the same
+DATABASE_URL, with the driver replaced by aiosqlite for SQLite and asyncpg for PostgreSQL. NOTE: in-memory SQLite
+databases of the sync and async engines are two different databases.
+"""
+
+import atexit
+import functools
 import os
+import tempfile
+import threading
+import uuid
+import warnings
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
 import sqlalchemy as sa
 from dotenv import load_dotenv
-from sqlalchemy.orm import sessionmaker, Session as SASession
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine as sa_create_async_engine
+from sqlalchemy.orm import sessionmaker, scoped_session, Session as SASession
+from sqlalchemy.pool import StaticPool
 
 from simulation_copilot.prosimos_relational_model import Base
+from simulation_copilot.tracing import span
 
 load_dotenv()
 
 
+def _temporary_database_url() -> str:
+    """Returns the URL of a new SQLite database file which is removed when the process exits."""
+    path = os.path.join(tempfile.gettempdir(), f"simulation_copilot_{uuid.uuid4().hex}.db")
+    atexit.register(_remove_database_files, path, os.getpid())
+    return f"sqlite:///{path}"
+
+
+def _remove_database_files(path: str, pid: int):
+    if os.getpid() != pid:
+        return  # a forked process inherits the exit handlers, but the database belongs to its parent
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
 _DB_URL = "sqlite://"
 if not os.environ.get("TESTING"):
-    _DB_URL = os.environ.get("DATABASE_URL") or "sqlite://"
+    _DB_URL = os.environ.get("DATABASE_URL") or _temporary_database_url()
 else:
     print("Testing mode")
 
@@ -21,10 +64,112 @@ _IN_MEMORY = False
 if _DB_URL in ("sqlite://", "sqlite:///:memory:"):
     _IN_MEMORY = True
 
-_engine = sa.create_engine(_DB_URL)
+
+def create_engine(
+    url: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_pre_ping: bool = True,
+    sqlite_wal: bool = True,
+) -> sa.Engine:
+    """Creates an engine with the connection pool configured for the database backend.
+
+    In-memory SQLite uses a single connection shared by all threads, otherwise, each thread would see its own empty
+    database. A commit or rollback of one thread then ends the transaction of all threads, so the engine warns
+    when transactions of several threads are in progress at the same time. File-backed SQLite allows using connections
+    from any thread and, if sqlite_wal is True, switches the database to the WAL journal mode, so readers don't
+    block the writer. Other databases use a queue pool of pool_size connections plus max_overflow, connections
+    are tested before use if pool_pre_ping is True.
+    """
+    # pylint: disable=too-many-arguments
+    db_url = sa.make_url(url)
+    options = _engine_options(db_url, pool_size, max_overflow, pool_pre_ping)
+    if db_url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    engine = sa.create_engine(db_url, **options)
+    if sqlite_wal and _is_sqlite_file(db_url):
+        sa.event.listen(engine, "connect", _enable_sqlite_wal)
+    if isinstance(engine.pool, StaticPool):
+        _ConcurrentUseWarning(engine)
+    return engine
+
+
+class _ConcurrentUseWarning:
+    """Warns when a thread begins a transaction on the shared connection while a transaction of another thread
+    is in progress. Transactions are tracked instead of checkouts, since the static pool hands out one connection
+    record to all checkouts."""
+
+    def __init__(self, engine: sa.Engine):
+        self._transactions: dict[int, int] = {}  # transactions in progress by thread ID
+        self._lock = threading.Lock()
+        sa.event.listen(engine, "begin", self._on_begin)
+        sa.event.listen(engine, "commit", self._on_end)
+        sa.event.listen(engine, "rollback", self._on_end)
+
+    def _on_begin(self, _):
+        thread_id = threading.get_ident()
+        with self._lock:
+            concurrent = any(other != thread_id for other in self._transactions)
+            self._transactions[thread_id] = self._transactions.get(thread_id, 0) + 1
+        if concurrent:
+            warnings.warn(
+                "The in-memory SQLite database has a single connection shared by all threads, so concurrent "
+                "transactions commit and roll back each other's changes. Use a database file or server instead.",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+
+    def _on_end(self, _):
+        thread_id = threading.get_ident()
+        with self._lock:
+            if self._transactions.get(thread_id, 0) > 1:
+                self._transactions[thread_id] -= 1
+            else:
+                self._transactions.pop(thread_id, None)
+
+
+def _engine_options(db_url: sa.URL, pool_size: Optional[int], max_overflow: Optional[int], pool_pre_ping: bool) -> dict:
+    """Returns the pool options of the sync and async engines, see create_engine."""
+    if db_url.get_backend_name() == "sqlite" and not _is_sqlite_file(db_url):
+        return {"poolclass": StaticPool}
+    options = {"pool_pre_ping": pool_pre_ping}
+    if db_url.get_backend_name() != "sqlite":  # the pool size is configured for database servers only
+        if pool_size is not None:
+            options["pool_size"] = pool_size
+        if max_overflow is not None:
+            options["max_overflow"] = max_overflow
+    return options
+
+
+def _is_sqlite_file(db_url: sa.URL) -> bool:
+    return db_url.get_backend_name() == "sqlite" and db_url.database not in (None, "", ":memory:")
+
+
+def _enable_sqlite_wal(dbapi_connection, _):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, fsync only on checkpoints
+    cursor.close()
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+_engine = create_engine(
+    _DB_URL,
+    pool_size=_env_int("DATABASE_POOL_SIZE"),
+    max_overflow=_env_int("DATABASE_MAX_OVERFLOW"),
+)
 
 Session = sessionmaker(bind=_engine)
-_session = Session()
+_scoped_session = scoped_session(Session)  # one session per thread
+
+
+def is_connection_shared() -> bool:
+    """Returns True if all threads share a single database connection, i.e., the database is in-memory SQLite."""
+    return isinstance(_engine.pool, StaticPool)
 
 
 def create_tables():
@@ -34,15 +179,104 @@ def create_tables():
 
 
 def get_session() -> SASession:
-    """Returns the module-scoped database session.
+    """Returns the database session of the current thread.
+
+    The session is created on the first call in a thread and reused by subsequent calls in the same thread.
+    Threads that finish their work should call remove_session() to release the session.
+    """
+    return _scoped_session()
+
+
+def remove_session():
+    """Closes and discards the database session of the current thread."""
+    _scoped_session.remove()
+
+
+@contextmanager
+def session_scope() -> Iterator[SASession]:
+    """Provides a new session for a unit of work, e.g., a request or a tool call.
+
+    The session is committed if the block succeeds, rolled back if it raises, and closed in any case.
+    """
+    session = Session()
+    try:
+        with span("db.transaction"):
+            yield session
+            session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def create_async_engine(
+    url: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_pre_ping: bool = True,
+    sqlite_wal: bool = True,
+) -> AsyncEngine:
+    """Creates an async engine for the database URL, replacing the driver with an async one if needed.
 
-    If using not in-memory database, it's safe to use Session().
+    The pool is configured as in create_engine.
     """
-    return _session
+    # pylint: disable=too-many-arguments
+    db_url = sa.make_url(url)
+    backend = db_url.get_backend_name()
+    if backend in _ASYNC_DRIVERS and db_url.get_driver_name() != _ASYNC_DRIVERS[backend]:
+        db_url = db_url.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}")
 
+    engine = sa_create_async_engine(db_url, **_engine_options(db_url, pool_size, max_overflow, pool_pre_ping))
+    if sqlite_wal and _is_sqlite_file(db_url):
+        sa.event.listen(engine.sync_engine, "connect", _enable_sqlite_wal)
+    return engine
 
+
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """Returns the factory of async sessions, the async engine is created on the first call.
+
+    Objects aren't expired on commit, because expired attributes can't be loaded lazily outside the event loop.
+    """
+    global _async_engine, _async_sessionmaker  # pylint: disable=global-statement
+    if _async_sessionmaker is None:
+        _async_engine = create_async_engine(
+            _DB_URL,
+            pool_size=_env_int("DATABASE_POOL_SIZE"),
+            max_overflow=_env_int("DATABASE_MAX_OVERFLOW"),
+        )
+        _async_sessionmaker = async_sessionmaker(bind=_async_engine, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def create_tables_async():
+    """Creates tables associated with Base from simulation_copilot.prosimos_relational_model using the async engine."""
+    get_async_sessionmaker()  # makes sure the async engine exists
+    async with _async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def dispose_async_engine():
+    """Closes the connections of the async engine, should be awaited before the event loop is closed."""
+    global _async_engine, _async_sessionmaker  # pylint: disable=global-statement
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine, _async_sessionmaker = None, None
+
+
+@functools.cache
 def tables_schema():
-    """Returns tables schema associated with Base from simulation_copilot.prosimos_relational_model as a string."""
+    """Returns tables schema associated with Base from simulation_copilot.prosimos_relational_model as a string.
+
+    The schema doesn't change at runtime, so it's compiled once.
+    """
     output = ""
     for table in Base.metadata.tables.keys():
         output += sa.schema.CreateTable(Base.metadata.tables[table]).compile(_engine).string
@@ -0,0 +1,100 @@
+"""Typed Prosimos performance report.
+
+The report generated by Prosimos is a text file of 4 CSV tables separated by `""`: start and end times
+of the simulation, resource utilization, individual task statistics and overall scenario statistics.
+PerformanceReport parses the tables into pandas data frames, so reports can be compared column-wise, and the LLM
+gets only the changes instead of two full reports.
+"""
+
+import io
+from dataclasses import dataclass
+
+import pandas as pd
+
+from simulation_copilot.tracing import traced
+
+_SECTION_SEPARATOR = '""'
+
+# KPIs of the overall scenario statistics table which are compared between reports
+_OVERALL_KPIS = ("cycle_time", "processing_time", "waiting_time", "idle_time")
+
+
+@dataclass
+class PerformanceReport:
+    """Prosimos performance report.
+
+    Tables are indexed by the resource name, task name and KPI name respectively, columns are the same as in the report.
+    """
+
+    started_at: str
+    completed_at: str
+    resource_utilization: pd.DataFrame
+    task_statistics: pd.DataFrame
+    overall_statistics: pd.DataFrame
+
+    @staticmethod
+    @traced("report.parse")
+    def from_prosimos(report: str) -> "PerformanceReport":
+        """Parses the report generated by Prosimos."""
+        times, utilization, tasks, overall = [section.strip() for section in report.split(_SECTION_SEPARATOR)][:4]
+        times = dict(line.split(",", 1) for line in times.splitlines())
+        return PerformanceReport(
+            started_at=times["started_at"],
+            completed_at=times["completed_at"],
+            resource_utilization=_read_table(utilization, "Resource name"),
+            task_statistics=_read_table(tasks, "Name"),
+            overall_statistics=_read_table(overall, "KPI"),
+        )
+
+    def kpis(self) -> pd.Series:
+        """
+        Returns the main KPIs: average cycle, processing, waiting and idle times per case, average resource utilization
+        and total cost.
+        """
+        kpis = self.overall_statistics.loc[list(_OVERALL_KPIS), "Average"].astype(float)
+        kpis["resource_utilization"] = self.resource_utilization["Utilization Ratio"].mean()
+        kpis["cost"] = self.task_statistics["Total Cost"].sum()
+        return kpis
+
+    def resource_utilization_and_overall_statistics(self) -> str:
+        """Returns the resource utilization and overall scenario statistics tables as CSV."""
+        return f"{self.resource_utilization.to_csv().strip()}\n{self.overall_statistics.to_csv().strip()}"
+
+    def compare(self, baseline: "PerformanceReport") -> pd.DataFrame:
+        """
+        Compares main KPIs and the utilization of each resource with the baseline report. Returns a table indexed
+        by the metric name with the baseline value, the new value, the absolute change and the change relative
+        to the baseline value. Resources present only in one of the reports have missing values.
+        """
+        utilization = pd.concat(
+            [
+                baseline.resource_utilization["Utilization Ratio"],
+                self.resource_utilization["Utilization Ratio"],
+            ],
+            axis=1,
+            keys=["Baseline", "New"],
+        )
+        utilization.index = "utilization of " + utilization.index
+        comparison = pd.concat(
+            [pd.concat([baseline.kpis(), self.kpis()], axis=1, keys=["Baseline", "New"]), utilization]
+        )
+        comparison["Change"] = comparison["New"] - comparison["Baseline"]
+        comparison["Relative Change"] = comparison["Change"] / comparison["Baseline"].abs().replace(0, float("nan"))
+        comparison.index.name = "Metric"
+        return comparison
+
+    def changes_from(self, baseline: "PerformanceReport", min_relative_change: float = 0.01) -> str:
+        """
+        Returns the metrics that changed compared to the baseline by at least min_relative_change as CSV,
+        see compare. Metrics which can't be compared relatively, e.g., new resources, are always included.
+        """
+        comparison = self.compare(baseline)
+        changed = comparison["Relative Change"].abs() >= min_relative_change
+        unknown = comparison["Relative Change"].isna() & (comparison["Change"] != 0)
+        return comparison[changed | unknown].to_csv(float_format="%.4g")
+
+
+def _read_table(section: str, index: str) -> pd.DataFrame:
+    # the first line of a section is its title followed by the CSV table
+    table = section.split("\n", 1)[1]
+    return pd.read_csv(io.StringIO(table), index_col=index)
@@ -4,13 +4,26 @@ Prompts module provides prompt composition utilities.
 from simulation_copilot.database import tables_schema
 
 
-def make_simulation_copilot_system_prompt(simulation_model_id: int) -> str:
+def make_simulation_copilot_system_prompt(simulation_model_id: int, parallel_tool_calls: bool = False) -> str:
     """
     Returns a system prompt for LLM to play a role of the simulation copilot.
 
     Because this chat model works with the relational simulation model, we require an initial simulation model ID
     from the database to provide it to the model, so it doesn't have to ask the user.
+
+    If parallel_tool_calls is True, the model is asked to request independent tool calls together,
+    see Conversation in simulation_copilot.anthropic.
     """
+    if parallel_tool_calls:
+        tool_calls_note = (
+            "Note: Request independent tool calls together in one response, they are executed concurrently.\n"
+            "Wait for the results only if the input of the next tool depends on them."
+        )
+    else:
+        tool_calls_note = (
+            "Note: Use one tool at a time, then, wait for a new request to adjust input parameters "
+            "for the next tool call if needed."
+        )
     context = f"""You are an assistant who helps with preparing of a business process simulation model.
 The model is represented by a set of tables in a SQL database. Reuse calendars whenever possible.
 
@@ -24,7 +37,7 @@ Below is the SQL schema for simulation model tables;
 {tables_schema()}
 
 You don't need to query the database directly, but you can use the provided tools to interact with the database.
-Note: Use one tool at a time, then, wait for a new request to adjust input parameters for the next tool call if needed.
+{tool_calls_note}
 
 The initial simulation model ID is {simulation_model_id}. All further user requests will be based on this model.
 
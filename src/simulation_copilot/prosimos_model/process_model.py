@@ -0,0 +1,113 @@
+"""
+BPMN process model structure shared by the simulation model conversions.
+
+Several steps of converting a simulation model from and to the Prosimos format need activities of the BPMN model,
+so the parsed model is cached by the path, modification time and size of the file, see get_process_model, instead
+of parsing the file in each step. A changed file is parsed again. Cached models are shared, so they are read-only.
+"""
+
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, Union
+
+_NAMESPACE = {"xmlns": "http://www.omg.org/spec/BPMN/20100524/MODEL"}
+_GATEWAY_TAGS = ("exclusiveGateway", "inclusiveGateway", "parallelGateway", "eventBasedGateway", "complexGateway")
+
+
+@dataclass(frozen=True)
+class SequenceFlow:
+    """BPMN sequence flow from the source node to the target node."""
+
+    id: str
+    source_id: str
+    target_id: str
+
+
+@dataclass(frozen=True)
+class Gateway:
+    """BPMN gateway with IDs of its incoming and outgoing sequence flows."""
+
+    id: str
+    name: str
+    type: str  # the BPMN tag, e.g., exclusiveGateway
+    incoming: tuple[str, ...]
+    outgoing: tuple[str, ...]
+
+    def is_split(self) -> bool:
+        return len(self.outgoing) > 1
+
+
+@dataclass(frozen=True)
+class ProcessModel:
+    """
+    Activities, gateways and sequence flows of a BPMN process model. Activities are BPMN tasks, as in the PIX
+    framework's get_activities_ids_by_name_from_bpmn.
+    """
+
+    path: Path
+    activity_ids_by_name: Mapping[str, str]
+    activity_names_by_id: Mapping[str, str]
+    gateways: Mapping[str, Gateway]
+    sequence_flows: Mapping[str, SequenceFlow]
+    incoming_flows: Mapping[str, tuple[str, ...]]  # IDs of sequence flows by the ID of their target node
+    outgoing_flows: Mapping[str, tuple[str, ...]]  # IDs of sequence flows by the ID of their source node
+
+    @staticmethod
+    def from_bpmn(path: Union[Path, str]) -> "ProcessModel":
+        """Parses the BPMN file, use get_process_model to reuse the parsed model."""
+        root = ET.parse(path).getroot()
+        activity_ids_by_name, gateways, sequence_flows = {}, {}, {}
+        for process in root.findall("xmlns:process", _NAMESPACE):
+            for task in process.findall("xmlns:task", _NAMESPACE):
+                activity_ids_by_name[task.get("name")] = task.get("id")
+            for flow in process.findall("xmlns:sequenceFlow", _NAMESPACE):
+                sequence_flows[flow.get("id")] = SequenceFlow(
+                    flow.get("id"), flow.get("sourceRef"), flow.get("targetRef")
+                )
+            for tag in _GATEWAY_TAGS:
+                for gateway in process.findall(f"xmlns:{tag}", _NAMESPACE):
+                    gateways[gateway.get("id")] = (gateway.get("name", ""), tag)
+
+        incoming, outgoing = {}, {}
+        for flow in sequence_flows.values():
+            outgoing[flow.source_id] = outgoing.get(flow.source_id, ()) + (flow.id,)
+            incoming[flow.target_id] = incoming.get(flow.target_id, ()) + (flow.id,)
+        return ProcessModel(
+            path=Path(path),
+            activity_ids_by_name=MappingProxyType(activity_ids_by_name),
+            activity_names_by_id=MappingProxyType({v: k for k, v in activity_ids_by_name.items()}),
+            gateways=MappingProxyType(
+                {
+                    gateway_id: Gateway(
+                        gateway_id, name, tag, incoming.get(gateway_id, ()), outgoing.get(gateway_id, ())
+                    )
+                    for gateway_id, (name, tag) in gateways.items()
+                }
+            ),
+            sequence_flows=MappingProxyType(sequence_flows),
+            incoming_flows=MappingProxyType(incoming),
+            outgoing_flows=MappingProxyType(outgoing),
+        )
+
+    def successors(self, node_id: str) -> list[str]:
+        """Returns IDs of nodes the outgoing sequence flows of the node lead to."""
+        return [self.sequence_flows[flow_id].target_id for flow_id in self.outgoing_flows.get(node_id, ())]
+
+    def predecessors(self, node_id: str) -> list[str]:
+        """Returns IDs of nodes the incoming sequence flows of the node come from."""
+        return [self.sequence_flows[flow_id].source_id for flow_id in self.incoming_flows.get(node_id, ())]
+
+
+def get_process_model(path: Union[Path, str]) -> ProcessModel:
+    """Returns the parsed process model, the file is parsed again only if its modification time or size changed."""
+    stat = os.stat(path)
+    return _parse_cached(str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=32)
+def _parse_cached(path: str, mtime_ns: int, size: int) -> ProcessModel:  # pylint: disable=unused-argument
+    return ProcessModel.from_bpmn(path)
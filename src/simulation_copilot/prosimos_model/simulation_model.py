@@ -15,12 +15,12 @@ from pix_framework.discovery.case_arrival import CaseArrivalModel
 from pix_framework.discovery.gateway_probabilities import GatewayProbabilities
 from pix_framework.discovery.resource_calendar_and_performance.fuzzy.resource_calendar import FuzzyResourceCalendar
 from pix_framework.discovery.resource_model import ResourceModel
-from pix_framework.io.bpmn import get_activities_ids_by_name_from_bpmn
 
 from simulation_copilot.prosimos_model.batching import BatchingRule
 from simulation_copilot.prosimos_model.case_attribute import CaseAttribute
 from simulation_copilot.prosimos_model.extraneous import ExtraneousDelay
 from simulation_copilot.prosimos_model.prioritization import PrioritizationRule
+from simulation_copilot.prosimos_model.process_model import get_process_model
 
 # Keys for serialization
 PROCESS_MODEL_KEY = "process_model"
@@ -89,8 +89,7 @@ class BPSModel:
             PrioritizationRule.from_prosimos(priority_rule)
             for priority_rule in attributes.get(PRIORITIZATION_RULES_KEY, [])
         ]
-        activities_ids_by_name = get_activities_ids_by_name_from_bpmn(process_model)
-        activities_names_by_id = {v: k for k, v in activities_ids_by_name.items()}
+        activities_names_by_id = get_process_model(process_model).activity_names_by_id
         batching_rules = [
             BatchingRule.from_prosimos(batching_rule, activities_names_by_id)
             for batching_rule in attributes.get(BATCHING_RULES_KEY, [])
@@ -117,7 +116,7 @@ class BPSModel:
             self.process_model = process_model
 
         # Get map activity label -> node ID
-        activity_label_to_id = get_activities_ids_by_name_from_bpmn(self.process_model)
+        activity_label_to_id = get_process_model(self.process_model).activity_ids_by_name
 
         attributes = {}
         if self.process_model is not None:
@@ -163,7 +162,7 @@ class BPSModel:
         In BPSModel, the activities are referenced by their name, Prosimos uses IDs instead from the BPMN model.
         """
         # Get map activity label -> node ID
-        activity_label_to_id = get_activities_ids_by_name_from_bpmn(self.process_model)
+        activity_label_to_id = get_process_model(self.process_model).activity_ids_by_name
         # Update activity labels in resource profiles
         if self.resource_model.resource_profiles is not None:
             for resource_profile in self.resource_model.resource_profiles:
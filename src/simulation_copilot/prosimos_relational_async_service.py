@@ -0,0 +1,162 @@
+"""
+Asynchronous version of the Prosimos relational service for async agent drivers.
+
+Every method mirrors the method of ProsimosRelationalService with the same name and arguments. The synchronous
+service runs inside AsyncSession.run_sync, so the database I/O doesn't block the event loop and the business logic
+is not duplicated.
+
+NOTE: Attributes of the returned objects can't be loaded lazily outside the service, so the session should not
+expire objects on commit, see database.get_async_sessionmaker. Use get_simulation_model_with_relationships
+to traverse the whole simulation model.
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from simulation_copilot.prosimos_relational_model import (
+    Calendar,
+    Gateway,
+    SimulationModel,
+    Distribution,
+    CaseArrival,
+    Activity,
+    Resource,
+    ActivityResourceDistribution,
+    ResourceProfile,
+)
+from simulation_copilot.prosimos_relational_repository import ProsimosRelationalRepository
+from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
+
+_T = TypeVar("_T")
+
+
+class AsyncProsimosRelationalService:
+    """Asynchronous service for the Prosimos relational database."""
+
+    # pylint: disable=missing-function-docstring
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _run(self, operation: Callable[[ProsimosRelationalService], _T]) -> _T:
+        return await self.session.run_sync(lambda session: operation(ProsimosRelationalService(session)))
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator["AsyncProsimosRelationalService"]:
+        """Runs all operations inside the block in a single transaction which is rolled back on errors.
+        See ProsimosRelationalRepository.unit_of_work for details."""
+        unit_of_work = ProsimosRelationalRepository(self.session.sync_session).unit_of_work()
+        unit_of_work.__enter__()  # pylint: disable=unnecessary-dunder-call
+        try:
+            yield self
+        except BaseException as e:
+            # the rollback is done on exit of the synchronous unit of work, which re-raises the exception
+            await self.session.run_sync(lambda _: unit_of_work.__exit__(type(e), e, e.__traceback__))
+            raise
+        await self.session.run_sync(lambda _: unit_of_work.__exit__(None, None, None))
+
+    async def create_simulation_model(self) -> SimulationModel:
+        return await self._run(lambda service: service.create_simulation_model())
+
+    async def get_simulation_model(self, model_id: int) -> SimulationModel:
+        return await self._run(lambda service: service.get_simulation_model(model_id))
+
+    async def get_simulation_model_with_relationships(self, model_id: int) -> SimulationModel:
+        return await self._run(lambda service: service.get_simulation_model_with_relationships(model_id))
+
+    async def get_all_simulation_models(self) -> list[SimulationModel]:
+        return await self._run(lambda service: service.get_all_simulation_models())
+
+    async def delete_simulation_model(self, model_id: int):
+        await self._run(lambda service: service.delete_simulation_model(model_id))
+
+    async def create_gateway_with_sequence_flows(
+        self, model_id: int, gateway_bpmn_id: str, flows: list[dict]
+    ) -> Gateway:
+        return await self._run(
+            lambda service: service.create_gateway_with_sequence_flows(model_id, gateway_bpmn_id, flows)
+        )
+
+    async def create_distribution_with_parameters(self, name: str, parameters: list[dict]) -> Distribution:
+        return await self._run(lambda service: service.create_distribution_with_parameters(name, parameters))
+
+    async def get_distribution(self, distribution_id: int) -> Distribution:
+        return await self._run(lambda service: service.get_distribution(distribution_id))
+
+    async def delete_distribution(self, distribution_id: int):
+        await self._run(lambda service: service.delete_distribution(distribution_id))
+
+    async def create_calendar_with_intervals(self, intervals: list[dict]) -> Calendar:
+        return await self._run(lambda service: service.create_calendar_with_intervals(intervals))
+
+    async def get_calendar(self, calendar_id: int) -> Calendar:
+        return await self._run(lambda service: service.get_calendar(calendar_id))
+
+    async def delete_calendar(self, calendar_id: int):
+        await self._run(lambda service: service.delete_calendar(calendar_id))
+
+    async def create_case_arrival(self, model_id: int, calendar_id: int, distribution_id: int) -> CaseArrival:
+        return await self._run(lambda service: service.create_case_arrival(model_id, calendar_id, distribution_id))
+
+    async def delete_case_arrival(self, case_arrival_id: int):
+        await self._run(lambda service: service.delete_case_arrival(case_arrival_id))
+
+    async def create_activity(self, name: str, bpmn_id: str, resource_id: int) -> Activity:
+        return await self._run(lambda service: service.create_activity(name, bpmn_id, resource_id))
+
+    async def get_activity(self, activity_id: int) -> Activity:
+        return await self._run(lambda service: service.get_activity(activity_id))
+
+    async def delete_activity(self, activity_id: int):
+        await self._run(lambda service: service.delete_activity(activity_id))
+
+    async def create_resource(
+        self,
+        bpmn_id: str,
+        name: str,
+        amount: int,
+        cost_per_hour: float,
+        calendar_id: int,
+    ) -> Resource:
+        # pylint: disable=too-many-arguments
+        return await self._run(
+            lambda service: service.create_resource(bpmn_id, name, amount, cost_per_hour, calendar_id)
+        )
+
+    async def create_resource_with_activity_distributions(
+        self,
+        bpmn_id: str,
+        name: str,
+        amount: int,
+        cost_per_hour: float,
+        calendar_id: int,
+        activity_distributions: list[dict],
+    ) -> Resource:
+        # pylint: disable=too-many-arguments
+        return await self._run(
+            lambda service: service.create_resource_with_activity_distributions(
+                bpmn_id, name, amount, cost_per_hour, calendar_id, activity_distributions
+            )
+        )
+
+    async def delete_resource(self, resource_id: int):
+        await self._run(lambda service: service.delete_resource(resource_id))
+
+    async def create_activity_resource_distribution(
+        self, activity_id: int, resource_id: int, distribution_id: int
+    ) -> ActivityResourceDistribution:
+        return await self._run(
+            lambda service: service.create_activity_resource_distribution(activity_id, resource_id, distribution_id)
+        )
+
+    async def delete_activity_resource_distribution(self, activity_distribution_id: int):
+        await self._run(lambda service: service.delete_activity_resource_distribution(activity_distribution_id))
+
+    async def create_resource_profile_with_resources(
+        self, model_id: int, name: str, resources: list[dict]
+    ) -> ResourceProfile:
+        return await self._run(
+            lambda service: service.create_resource_profile_with_resources(model_id, name, resources)
+        )
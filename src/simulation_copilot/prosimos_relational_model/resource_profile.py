@@ -31,6 +31,11 @@ class ActivityResourceDistribution(_Base):
     distribution_id = sa.Column(sa.Integer, sa.ForeignKey("distribution.id"), nullable=False)
     """The distribution of the duration of the activity."""
 
+    activity = sa.orm.relationship(Activity)
+    """The activity to which this distribution belongs."""
+    distribution = sa.orm.relationship("Distribution")
+    """The distribution of the duration of the activity."""
+
 
 class Resource(_Base):
     """Resource is a person, machine, or other entity that performs activities."""
@@ -49,6 +54,8 @@ class Resource(_Base):
     """The calendar of availability for this resource."""
     profile_id = sa.Column(sa.Integer, sa.ForeignKey("resource_profile.id"), nullable=True)
     """The profile this resource belongs to. If None, the resource is not part of a profile."""
+    calendar = sa.orm.relationship("Calendar")
+    """The calendar of availability for this resource."""
     assigned_activities = sa.orm.relationship(
         ActivityResourceDistribution, backref="resource", cascade="all, delete-orphan"
     )
@@ -2,7 +2,11 @@
 Provides the database access for the Prosimos relational simulation model.
 """
 # pylint: disable=missing-function-docstring,redefined-builtin,invalid-name
-from sqlalchemy.orm import Session
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from simulation_copilot.prosimos_relational_model import (
     SimulationModel,
@@ -18,6 +22,27 @@ from simulation_copilot.prosimos_relational_model import (
     Resource,
     Base,
 )
+from simulation_copilot.tracing import span
+
+# Key in Session.info which holds the depth of nested units of work. It's kept in the session rather than
+# in a repository, so all repositories sharing the session defer their commits.
+_UNIT_OF_WORK_DEPTH = "unit_of_work_depth"
+
+
+def bulk_insert(session: Session, entity: type, rows: list[dict], return_ids: bool = True) -> list[int]:
+    """
+    Inserts all rows with one statement and returns their IDs in the order of the rows.
+
+    Rows are batched into multi-row INSERTs where the backend guarantees the order of the returned IDs,
+    e.g., on PostgreSQL; otherwise, e.g., on SQLite, they are inserted one by one within the same transaction.
+    """
+    if not rows:
+        return []
+    if not return_ids:
+        session.execute(sa.insert(entity), rows)
+        return []
+    statement = sa.insert(entity).returning(entity.id, sort_by_parameter_order=True)
+    return list(session.scalars(statement, rows))
 
 
 class BaseRepository:
@@ -27,10 +52,17 @@ class BaseRepository:
     def __init__(self, session: Session):
         self.session = session
 
+    def _commit(self):
+        """Commits the session, or only flushes it if a unit of work is in progress."""
+        if self.session.info.get(_UNIT_OF_WORK_DEPTH, 0) > 0:
+            self.session.flush()  # makes generated IDs available without ending the transaction
+        else:
+            self.session.commit()
+
     def delete_all(self):
         for table in reversed(Base.metadata.sorted_tables):
             self.session.execute(table.delete())
-            self.session.commit()
+            self._commit()
 
 
 class SimulationModelRepository(BaseRepository):
@@ -39,20 +71,145 @@ class SimulationModelRepository(BaseRepository):
     def create(self):
         model = SimulationModel()
         self.session.add(model)
-        self.session.commit()
+        self._commit()
         return model
 
     def get(self, id: int):
         return self.session.query(SimulationModel).filter(SimulationModel.id == id).first()
 
+    def get_with_relationships(self, id: int):
+        """Returns the simulation model with the whole graph of its components loaded eagerly.
+
+        The number of emitted SQL statements doesn't depend on the size of the model, one statement is issued
+        per relationship level, so the result can be traversed without triggering lazy loads.
+        """
+        calendar_intervals = selectinload(Calendar.intervals)
+        distribution_parameters = selectinload(Distribution.parameters)
+        return (
+            self.session.query(SimulationModel)
+            .options(
+                selectinload(SimulationModel.gateways).selectinload(Gateway.outgoing_sequence_flows),
+                joinedload(SimulationModel.case_arrival).options(
+                    joinedload(CaseArrival.calendar).options(calendar_intervals),
+                    joinedload(CaseArrival.inter_arrival_distribution).options(distribution_parameters),
+                ),
+                selectinload(SimulationModel.resource_profiles)
+                .selectinload(ResourceProfile.resources)
+                .options(
+                    selectinload(Resource.calendar).options(calendar_intervals),
+                    selectinload(Resource.assigned_activities).options(
+                        selectinload(ActivityResourceDistribution.activity),
+                        selectinload(ActivityResourceDistribution.distribution).options(distribution_parameters),
+                    ),
+                ),
+            )
+            .filter(SimulationModel.id == id)
+            .first()
+        )
+
     def get_all(self):
         return self.session.query(SimulationModel).all()
 
+    def clone(self, id: int) -> int:
+        """
+        Copies the rows owned by the simulation model and returns the ID of the new model. Calendars, distributions
+        and activities are referenced by the copied rows instead of being copied. Each table is read and written
+        with one statement regardless of the size of the model.
+        """
+        new_id = bulk_insert(self.session, SimulationModel, [{}])[0]
+
+        gateways = (
+            self.session.execute(
+                sa.select(Gateway.id, Gateway.bpmn_id).where(Gateway.simulation_model_id == id).order_by(Gateway.id)
+            )
+            .mappings()
+            .all()
+        )
+        gateway_ids = _copy_rows(self.session, Gateway, gateways, simulation_model_id=new_id)
+        flows = self.session.execute(
+            sa.select(SequenceFlow.source_gateway_id, SequenceFlow.bpmn_id, SequenceFlow.probability).where(
+                SequenceFlow.source_gateway_id.in_(list(gateway_ids))
+            )
+        ).all()
+        bulk_insert(
+            self.session,
+            SequenceFlow,
+            [{**flow._asdict(), "source_gateway_id": gateway_ids[flow.source_gateway_id]} for flow in flows],
+            return_ids=False,
+        )
+
+        case_arrivals = self.session.execute(
+            sa.select(CaseArrival.calendar_id, CaseArrival.inter_arrival_distribution_id).where(
+                CaseArrival.simulation_model_id == id
+            )
+        ).all()
+        bulk_insert(
+            self.session,
+            CaseArrival,
+            [{**case_arrival._asdict(), "simulation_model_id": new_id} for case_arrival in case_arrivals],
+            return_ids=False,
+        )
+
+        profiles = (
+            self.session.execute(
+                sa.select(ResourceProfile.id, ResourceProfile.name)
+                .where(ResourceProfile.simulation_model_id == id)
+                .order_by(ResourceProfile.id)
+            )
+            .mappings()
+            .all()
+        )
+        profile_ids = _copy_rows(self.session, ResourceProfile, profiles, simulation_model_id=new_id)
+        resources = self.session.execute(
+            sa.select(
+                Resource.id,
+                Resource.bpmn_id,
+                Resource.name,
+                Resource.amount,
+                Resource.cost_per_hour,
+                Resource.calendar_id,
+                Resource.profile_id,
+            )
+            .where(Resource.profile_id.in_(list(profile_ids)))
+            .order_by(Resource.id)
+        ).all()
+        resource_ids = _copy_rows(
+            self.session,
+            Resource,
+            [{**resource._asdict(), "profile_id": profile_ids[resource.profile_id]} for resource in resources],
+        )
+        assigned_activities = self.session.execute(
+            sa.select(
+                ActivityResourceDistribution.resource_id,
+                ActivityResourceDistribution.activity_id,
+                ActivityResourceDistribution.distribution_id,
+            ).where(ActivityResourceDistribution.resource_id.in_(list(resource_ids)))
+        ).all()
+        bulk_insert(
+            self.session,
+            ActivityResourceDistribution,
+            [
+                {**assigned._asdict(), "resource_id": resource_ids[assigned.resource_id]}
+                for assigned in assigned_activities
+            ],
+            return_ids=False,
+        )
+
+        self._commit()
+        return new_id
+
     def delete(self, id: int):
         model = self.get(id)
         if model:
             self.session.delete(model)
-            self.session.commit()
+            self._commit()
+
+
+def _copy_rows(session: Session, entity: type, rows: list[dict], **values) -> dict[int, int]:
+    """Inserts copies of the rows with the given values replaced, returns new IDs by the IDs of the copied rows."""
+    copies = [{key: value for key, value in row.items() if key != "id"} | values for row in rows]
+    new_ids = bulk_insert(session, entity, copies)
+    return {row["id"]: new_id for row, new_id in zip(rows, new_ids)}
 
 
 class GatewayRepository(BaseRepository):
@@ -64,7 +221,7 @@ class GatewayRepository(BaseRepository):
             raise ValueError(f"Model with ID {model_id} not found.")
         gateway = Gateway(simulation_model_id=model_id, bpmn_id=bpmn_id)
         model.gateways.append(gateway)
-        self.session.commit()
+        self._commit()
         return gateway
 
     def get(self, id: int):
@@ -79,7 +236,7 @@ class GatewayRepository(BaseRepository):
             raise ValueError(f"Gateway with ID {gateway_id} not found.")
         flow = SequenceFlow(source_gateway_id=gateway_id, bpmn_id=bpmn_id, probability=probability)
         gateway.outgoing_sequence_flows.append(flow)
-        self.session.commit()
+        self._commit()
         return flow
 
     def add_sequence_flows(self, gateway_id: int, flows: list):
@@ -90,7 +247,7 @@ class GatewayRepository(BaseRepository):
             gateway.outgoing_sequence_flows.append(
                 SequenceFlow(bpmn_id=flow["bpmn_id"], probability=flow["probability"])
             )
-        self.session.commit()
+        self._commit()
 
 
 class DistributionRepository(BaseRepository):
@@ -99,7 +256,7 @@ class DistributionRepository(BaseRepository):
     def create(self, name: str):
         distribution = Distribution(name=name)
         self.session.add(distribution)
-        self.session.commit()
+        self._commit()
         return distribution
 
     def get(self, id: int):
@@ -111,7 +268,7 @@ class DistributionRepository(BaseRepository):
             raise ValueError(f"Distribution with ID {distribution_id} not found.")
         parameter = DistributionParameter(name=name, value=value)
         distribution.parameters.append(parameter)
-        self.session.commit()
+        self._commit()
         return parameter
 
     def add_parameters(self, distribution_id: int, parameters: list):
@@ -120,13 +277,20 @@ class DistributionRepository(BaseRepository):
             raise ValueError(f"Distribution with ID {distribution_id} not found.")
         for parameter in parameters:
             distribution.parameters.append(DistributionParameter(name=parameter["name"], value=parameter["value"]))
-        self.session.commit()
+        self._commit()
+
+    def is_referenced(self, id: int) -> bool:
+        """Returns True if an activity or a case arrival of any simulation model uses the distribution."""
+        return self.session.query(
+            sa.exists().where(ActivityResourceDistribution.distribution_id == id)
+            | sa.exists().where(CaseArrival.inter_arrival_distribution_id == id)
+        ).scalar()
 
     def delete(self, id: int):
         distribution = self.get(id)
         if distribution:
             self.session.delete(distribution)
-            self.session.commit()
+            self._commit()
 
 
 class CalendarRepository(BaseRepository):
@@ -135,17 +299,23 @@ class CalendarRepository(BaseRepository):
     def create(self):
         calendar = Calendar()
         self.session.add(calendar)
-        self.session.commit()
+        self._commit()
         return calendar
 
     def get(self, id: int):
         return self.session.query(Calendar).filter(Calendar.id == id).first()
 
+    def is_referenced(self, id: int) -> bool:
+        """Returns True if a resource or a case arrival of any simulation model uses the calendar."""
+        return self.session.query(
+            sa.exists().where(Resource.calendar_id == id) | sa.exists().where(CaseArrival.calendar_id == id)
+        ).scalar()
+
     def delete(self, id: int):
         calendar = self.get(id)
         if calendar:
             self.session.delete(calendar)
-            self.session.commit()
+            self._commit()
 
 
 class CaseArrivalRepository(BaseRepository):
@@ -158,7 +328,7 @@ class CaseArrivalRepository(BaseRepository):
             simulation_model_id=model_id,
         )
         self.session.add(arrival)
-        self.session.commit()
+        self._commit()
         return arrival
 
     def get(self, id: int):
@@ -168,7 +338,7 @@ class CaseArrivalRepository(BaseRepository):
         arrival = self.get(id)
         if arrival:
             self.session.delete(arrival)
-            self.session.commit()
+            self._commit()
 
 
 class ActivityRepository(BaseRepository):
@@ -177,17 +347,21 @@ class ActivityRepository(BaseRepository):
     def create(self, bpmn_id: str, resource_id: int, name: str):
         activity = Activity(bpmn_id=bpmn_id, resource_id=resource_id, name=name)
         self.session.add(activity)
-        self.session.commit()
+        self._commit()
         return activity
 
     def get(self, id: int):
         return self.session.query(Activity).filter(Activity.id == id).first()
 
+    def is_referenced(self, id: int) -> bool:
+        """Returns True if a resource of any simulation model is assigned to the activity."""
+        return self.session.query(sa.exists().where(ActivityResourceDistribution.activity_id == id)).scalar()
+
     def delete(self, id: int):
         activity = self.get(id)
         if activity:
             self.session.delete(activity)
-            self.session.commit()
+            self._commit()
 
 
 class ActivityResourceDistributionRepository(BaseRepository):
@@ -200,7 +374,7 @@ class ActivityResourceDistributionRepository(BaseRepository):
             distribution_id=distribution_id,
         )
         self.session.add(activity_resource_distribution)
-        self.session.commit()
+        self._commit()
         return activity_resource_distribution
 
     def get(self, id: int):
@@ -210,7 +384,7 @@ class ActivityResourceDistributionRepository(BaseRepository):
         distribution = self.get(id)
         if distribution:
             self.session.delete(distribution)
-            self.session.commit()
+            self._commit()
 
 
 class ResourceRepository(BaseRepository):
@@ -226,20 +400,24 @@ class ResourceRepository(BaseRepository):
             calendar_id=calendar_id,
         )
         self.session.add(resource)
-        self.session.commit()
+        self._commit()
         return resource
 
     def get(self, id: int) -> Resource:
         return self.session.query(Resource).filter(Resource.id == id).first()
 
-    def get_by_name(self, name: str) -> Resource:
-        return self.session.query(Resource).filter(Resource.name == name).first()
+    def get_by_name(self, name: str, model_id: Optional[int] = None) -> Resource:
+        """Returns the resource with the given name, only among the resources of the model if model_id is given."""
+        query = self.session.query(Resource).filter(Resource.name == name)
+        if model_id is not None:
+            query = query.join(ResourceProfile).filter(ResourceProfile.simulation_model_id == model_id)
+        return query.first()
 
     def delete(self, id: int):
         resource = self.get(id)
         if resource:
             self.session.delete(resource)
-            self.session.commit()
+            self._commit()
 
 
 class ResourceProfileRepository(BaseRepository):
@@ -248,7 +426,7 @@ class ResourceProfileRepository(BaseRepository):
     def create(self, name: str, model_id: int):
         profile = ResourceProfile(name=name, simulation_model_id=model_id)
         self.session.add(profile)
-        self.session.commit()
+        self._commit()
         return profile
 
     def get(self, id: int):
@@ -270,7 +448,7 @@ class ResourceProfileRepository(BaseRepository):
 
         profile.resources.append(resource)
 
-        self.session.commit()
+        self._commit()
         return profile
 
     def add_resources(self, profile_id: int, resources: list):
@@ -287,7 +465,7 @@ class ResourceProfileRepository(BaseRepository):
                     calendar_id=resource["calendar_id"],
                 )
             )
-        self.session.commit()
+        self._commit()
 
 
 class ProsimosRelationalRepository:
@@ -306,3 +484,29 @@ class ProsimosRelationalRepository:
         self.activity_resource_distribution = ActivityResourceDistributionRepository(session)
         self.resource = ResourceRepository(session)
         self.resource_profile = ResourceProfileRepository(session)
+
+    def in_unit_of_work(self) -> bool:
+        return self.session.info.get(_UNIT_OF_WORK_DEPTH, 0) > 0
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[Session]:
+        """
+        Defers commits of all repositories until the end of the block, so it runs in a single transaction.
+
+        Inside the block, repositories only flush the session. The transaction is committed when the outermost block
+        exits successfully, and rolled back if it raises. Nested blocks join the outer one.
+        """
+        depth = self.session.info.get(_UNIT_OF_WORK_DEPTH, 0)
+        self.session.info[_UNIT_OF_WORK_DEPTH] = depth + 1
+        # only the outermost block is a transaction
+        with span("db.unit_of_work") if depth == 0 else nullcontext():
+            try:
+                yield self.session
+            except BaseException:
+                self.session.info[_UNIT_OF_WORK_DEPTH] = depth
+                if depth == 0:
+                    self.session.rollback()
+                raise
+            self.session.info[_UNIT_OF_WORK_DEPTH] = depth
+            if depth == 0:
+                self.session.commit()
@@ -1,3 +1,5 @@
+from contextlib import AbstractContextManager
+
 from sqlalchemy.orm import Session
 
 from simulation_copilot.prosimos_relational_model import (
@@ -24,6 +26,11 @@ class ProsimosRelationalService:
     def __init__(self, session: Session):
         self.repository = ProsimosRelationalRepository(session)
 
+    def unit_of_work(self) -> AbstractContextManager[Session]:
+        """Runs all operations inside the block in a single transaction which is rolled back on errors.
+        See ProsimosRelationalRepository.unit_of_work for details."""
+        return self.repository.unit_of_work()
+
     def create_simulation_model(self) -> SimulationModel:
         """Create a simulation model."""
         return self.repository.simulation_model.create()
@@ -32,6 +39,10 @@ class ProsimosRelationalService:
         """Get a simulation model."""
         return self.repository.simulation_model.get(model_id)
 
+    def get_simulation_model_with_relationships(self, model_id: int) -> SimulationModel:
+        """Get a simulation model with all its components loaded in a bounded number of queries."""
+        return self.repository.simulation_model.get_with_relationships(model_id)
+
     def get_all_simulation_models(self) -> list[SimulationModel]:
         """Get all simulation models."""
         return self.repository.simulation_model.get_all()
@@ -40,6 +51,21 @@ class ProsimosRelationalService:
         """Delete a simulation model."""
         self.repository.simulation_model.delete(model_id)
 
+    def clone_simulation_model(self, model_id: int) -> SimulationModel:
+        """Create a scenario branch of a simulation model which can be changed without affecting the original.
+
+        Only resource profiles, resources, their assigned activities, gateways with sequence flows and the case
+        arrival are copied. Calendars, distributions and activities are shared with the original model by reference.
+        Shared rows are never changed in place, change_activity_distribution and change_resource_calendar write
+        a new row for the changed model only (copy-on-write), and delete_calendar, delete_distribution
+        and delete_activity refuse to delete rows that are still used.
+        """
+        if not self.repository.simulation_model.get(model_id):
+            raise ValueError(f"Model with ID {model_id} not found.")
+        with self.repository.unit_of_work():
+            clone_id = self.repository.simulation_model.clone(model_id)
+        return self.repository.simulation_model.get(clone_id)
+
     def create_gateway_with_sequence_flows(self, model_id: int, gateway_bpmn_id: str, flows: list[dict]) -> Gateway:
         """Create a gateway with a list of sequence flows.
         Flows must be a list of dictionaries with keys 'bpmn_id' and 'probability'."""
@@ -47,10 +73,7 @@ class ProsimosRelationalService:
         if not model:
             raise ValueError(f"Model with ID {model_id} not found.")
 
-        if self.repository.session.in_transaction():  # commit the current transaction if there is one
-            self.repository.session.commit()
-
-        with self.repository.session.begin():
+        with self.repository.unit_of_work():
             gateway = Gateway(simulation_model_id=model_id, bpmn_id=gateway_bpmn_id)
             model.gateways.append(gateway)
             for flow in flows:
@@ -80,8 +103,9 @@ class ProsimosRelationalService:
         - gamma: 'mean', 'var', 'min', 'max'
         - fixed: 'mean'
         """
-        distribution = self.repository.distribution.create(name)
-        self.repository.distribution.add_parameters(distribution_id=distribution.id, parameters=parameters)
+        with self.repository.unit_of_work():
+            distribution = self.repository.distribution.create(name)
+            self.repository.distribution.add_parameters(distribution_id=distribution.id, parameters=parameters)
         return distribution
 
     def get_distribution(self, distribution_id: int) -> Distribution:
@@ -89,7 +113,9 @@ class ProsimosRelationalService:
         return self.repository.distribution.get(distribution_id)
 
     def delete_distribution(self, distribution_id: int):
-        """Delete a distribution."""
+        """Delete a distribution. Raises ValueError if the distribution is still used, e.g., by a cloned model."""
+        if self.repository.distribution.is_referenced(distribution_id):
+            raise ValueError(f"Distribution with ID {distribution_id} is still used and can't be deleted.")
         self.repository.distribution.delete(distribution_id)
 
     def create_calendar_with_intervals(self, intervals: list[dict]) -> Calendar:
@@ -97,10 +123,7 @@ class ProsimosRelationalService:
         Intervals must be a list of dictionaries with keys: 'start_day', 'end_day', 'start_hour', 'end_hour',
         'start_minute', 'end_minute'.
         """
-        if self.repository.session.in_transaction():  # commit the current transaction if there is one
-            self.repository.session.commit()
-
-        with self.repository.session.begin():
+        with self.repository.unit_of_work():
             calendar = Calendar()
             for interval in intervals:
                 calendar.intervals.append(
@@ -121,7 +144,9 @@ class ProsimosRelationalService:
         return self.repository.calendar.get(calendar_id)
 
     def delete_calendar(self, calendar_id: int):
-        """Delete a calendar."""
+        """Delete a calendar. Raises ValueError if the calendar is still used, e.g., by a cloned model."""
+        if self.repository.calendar.is_referenced(calendar_id):
+            raise ValueError(f"Calendar with ID {calendar_id} is still used and can't be deleted.")
         self.repository.calendar.delete(calendar_id)
 
     def create_case_arrival(self, model_id: int, calendar_id: int, distribution_id: int) -> CaseArrival:
@@ -151,7 +176,9 @@ class ProsimosRelationalService:
         return self.repository.activity.get(activity_id)
 
     def delete_activity(self, activity_id: int):
-        """Delete an activity."""
+        """Delete an activity. Raises ValueError if the activity is still used, e.g., by a cloned model."""
+        if self.repository.activity.is_referenced(activity_id):
+            raise ValueError(f"Activity with ID {activity_id} is still used and can't be deleted.")
         self.repository.activity.delete(activity_id)
 
     def create_resource(
@@ -194,34 +221,51 @@ class ProsimosRelationalService:
         calendar = self.repository.calendar.get(calendar_id)
         if not calendar:
             raise ValueError(f"Calendar with ID {calendar_id} not found.")
-        resource = self.repository.resource.create(
-            bpmn_id=bpmn_id,
-            name=name,
-            amount=amount,
-            cost_per_hour=cost_per_hour,
-            calendar_id=calendar_id,
-        )
-        for activity_distribution in activity_distributions:
-            activity = self.create_activity(
-                name=activity_distribution["activity_name"],
-                bpmn_id=activity_distribution["activity_bpmn_id"],
-                resource_id=resource.id,
-            )
-            distribution = self.create_distribution_with_parameters(
-                name=activity_distribution["distribution"]["name"],
-                parameters=activity_distribution["distribution"]["parameters"],
-            )
-            self.create_activity_resource_distribution(
-                activity_id=activity.id,
-                resource_id=resource.id,
-                distribution_id=distribution.id,
+        with self.repository.unit_of_work():
+            resource = self.repository.resource.create(
+                bpmn_id=bpmn_id,
+                name=name,
+                amount=amount,
+                cost_per_hour=cost_per_hour,
+                calendar_id=calendar_id,
             )
+            for activity_distribution in activity_distributions:
+                activity = self.create_activity(
+                    name=activity_distribution["activity_name"],
+                    bpmn_id=activity_distribution["activity_bpmn_id"],
+                    resource_id=resource.id,
+                )
+                distribution = self.create_distribution_with_parameters(
+                    name=activity_distribution["distribution"]["name"],
+                    parameters=activity_distribution["distribution"]["parameters"],
+                )
+                self.create_activity_resource_distribution(
+                    activity_id=activity.id,
+                    resource_id=resource.id,
+                    distribution_id=distribution.id,
+                )
         return resource
 
     def delete_resource(self, resource_id: int):
         """Delete a resource."""
         self.repository.resource.delete(resource_id)
 
+    def change_resource_calendar(self, resource_id: int, intervals: list[dict]) -> Calendar:
+        """Replace the availability calendar of a resource with a new calendar.
+        The previous calendar is deleted unless another resource or a cloned model still uses it.
+        See create_calendar_with_intervals for the intervals."""
+        resource = self.repository.resource.get(resource_id)
+        if not resource:
+            raise ValueError(f"Resource with ID {resource_id} not found.")
+        with self.repository.unit_of_work():
+            previous_id = resource.calendar_id
+            calendar = self.create_calendar_with_intervals(intervals)
+            resource.calendar = calendar
+            self.repository.session.flush()
+            if not self.repository.calendar.is_referenced(previous_id):
+                self.repository.calendar.delete(previous_id)
+        return calendar
+
     def create_activity_resource_distribution(
         self, activity_id: int, resource_id: int, distribution_id: int
     ) -> ActivityResourceDistribution:
@@ -241,6 +285,24 @@ class ProsimosRelationalService:
             distribution_id=distribution_id,
         )
 
+    def change_activity_distribution(
+        self, activity_distribution_id: int, name: str, parameters: list[dict]
+    ) -> Distribution:
+        """Replace the duration distribution of an activity resource distribution with a new distribution.
+        The previous distribution is deleted unless another activity or a cloned model still uses it.
+        See create_distribution_with_parameters for the parameters."""
+        activity_distribution = self.repository.activity_resource_distribution.get(activity_distribution_id)
+        if not activity_distribution:
+            raise ValueError(f"Activity resource distribution with ID {activity_distribution_id} not found.")
+        with self.repository.unit_of_work():
+            previous_id = activity_distribution.distribution_id
+            distribution = self.create_distribution_with_parameters(name=name, parameters=parameters)
+            activity_distribution.distribution = distribution
+            self.repository.session.flush()
+            if not self.repository.distribution.is_referenced(previous_id):
+                self.repository.distribution.delete(previous_id)
+        return distribution
+
     def delete_activity_resource_distribution(self, activity_distribution_id: int):
         """Delete an activity resource distribution."""
         self.repository.activity_resource_distribution.delete(activity_distribution_id)
@@ -260,16 +322,17 @@ class ProsimosRelationalService:
         Distribution parameters must be a list of dictionaries with keys: 'name', 'value'.
         See create_distribution_with_parameters for details.
         """
-        profile = self.repository.resource_profile.create(name=name, model_id=model_id)
-        for resource_data in resources:
-            resource = self.create_resource_with_activity_distributions(
-                bpmn_id=resource_data["bpmn_id"],
-                name=resource_data["name"],
-                amount=resource_data.get("amount") or 0,
-                cost_per_hour=resource_data.get("cost_per_hour") or 0,
-                calendar_id=resource_data["calendar_id"],
-                activity_distributions=resource_data["activity_distributions"],
-            )
-            resource.profile_id = profile.id
-            self.repository.session.add(resource)
+        with self.repository.unit_of_work():
+            profile = self.repository.resource_profile.create(name=name, model_id=model_id)
+            for resource_data in resources:
+                resource = self.create_resource_with_activity_distributions(
+                    bpmn_id=resource_data["bpmn_id"],
+                    name=resource_data["name"],
+                    amount=resource_data.get("amount") or 0,
+                    cost_per_hour=resource_data.get("cost_per_hour") or 0,
+                    calendar_id=resource_data["calendar_id"],
+                    activity_distributions=resource_data["activity_distributions"],
+                )
+                resource.profile_id = profile.id
+                self.repository.session.add(resource)
         return profile
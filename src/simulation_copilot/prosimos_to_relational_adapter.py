@@ -11,29 +11,51 @@ from pix_framework.discovery.resource_calendar_and_performance.crisp.resource_ca
     RCalendar,
 )
 from pix_framework.discovery.resource_model import ResourceModel
-from pix_framework.io.bpmn import get_activities_ids_by_name_from_bpmn
 from pix_framework.statistics.distribution import DurationDistribution
 from sqlalchemy.orm import Session
 
+from simulation_copilot.prosimos_model.process_model import get_process_model
 from simulation_copilot.prosimos_model.simulation_model import BPSModel
-from simulation_copilot.prosimos_relational_model import SimulationModel
+from simulation_copilot.prosimos_relational_model import (
+    SimulationModel,
+    Gateway,
+    SequenceFlow,
+    Calendar,
+    CalendarInterval,
+    Distribution,
+    DistributionParameter,
+    CaseArrival,
+    ResourceProfile,
+    Resource,
+    Activity,
+    ActivityResourceDistribution,
+)
+from simulation_copilot.prosimos_relational_repository import bulk_insert
 from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
 
 
 def create_simulation_model_from_pix(
-    session: Session, model: dict, process_model_path: Optional[Path]
+    session: Session, model: dict, process_model_path: Optional[Path], bulk: bool = False
 ) -> SimulationModel:
     """
     Converts the PIX simulation model represented as JSON (Python dict) to the relational simulation model.
+
+    If bulk is True, the relational records are persisted in a single unit of work with one INSERT statement
+    per table and level instead of committing every record separately through the service. Inside the caller's
+    unit of work, the records are committed or rolled back together with the rest of it.
     """
     service = ProsimosRelationalService(session)
 
     pix_model = BPSModel.from_prosimos_format(attributes=model, process_model=process_model_path)
 
-    relational_model = service.create_simulation_model()
+    activities_names_by_id = get_process_model(process_model_path).activity_names_by_id
 
-    activities_ids_by_name = get_activities_ids_by_name_from_bpmn(process_model_path)
-    activities_names_by_id = {v: k for k, v in activities_ids_by_name.items()}
+    if bulk:
+        with service.unit_of_work():  # joins the caller's unit of work if there is one
+            model_id = _bulk_create_simulation_model(session, pix_model, activities_names_by_id)
+        return service.get_simulation_model(model_id)
+
+    relational_model = service.create_simulation_model()
 
     if pix_model.gateway_probabilities:
         _create_gateways(service, relational_model.id, pix_model.gateway_probabilities)
@@ -93,7 +115,25 @@ def _create_resource_profiles(
         relational_calendar = service.create_calendar_with_intervals(intervals)
         calendars[calendar.calendar_id] = relational_calendar.id
 
-    # collect resources
+    resources = _collect_resources(resource_model, calendars, activities_names_by_id)
+
+    # create resource profiles
+    for resource_profile in resource_model.resource_profiles:
+        profile_resources = [resources[resource.id] for resource in resource_profile.resources]
+        service.create_resource_profile_with_resources(
+            model_id=model_id,
+            name=resource_profile.name,
+            resources=profile_resources,
+        )
+
+
+def _collect_resources(
+    resource_model: ResourceModel, calendars: dict[str, int], activities_names_by_id: dict[str, str]
+) -> dict[str, dict]:
+    """
+    Collects resources and their activity distributions by the resource BPMN ID.
+    Calendars map the PIX calendar ID to the relational calendar ID.
+    """
     resources = {}
     for resource_profile in resource_model.resource_profiles:
         for resource in resource_profile.resources:
@@ -125,14 +165,184 @@ def _create_resource_profiles(
             }
             resources[resource_distribution.resource_id]["activity_distributions"].append(activity_distribution)
 
-    # create resource profiles
-    for resource_profile in resource_model.resource_profiles:
-        profile_resources = [resources[resource.id] for resource in resource_profile.resources]
-        service.create_resource_profile_with_resources(
-            model_id=model_id,
-            name=resource_profile.name,
-            resources=profile_resources,
-        )
+    return resources
+
+
+def _bulk_create_simulation_model(session: Session, pix_model: BPSModel, activities_names_by_id: dict[str, str]) -> int:
+    """
+    Inserts the records of the PIX model and returns the ID of the new relational model. The records aren't
+    committed, so it must run in a unit of work.
+
+    Records are inserted level by level, so the IDs of parent records are known before their children are inserted.
+    """
+    model_id = bulk_insert(session, SimulationModel, [{}])[0]
+
+    if pix_model.gateway_probabilities:
+        _bulk_create_gateways(session, model_id, pix_model.gateway_probabilities)
+
+    if pix_model.case_arrival_model:
+        _bulk_create_case_arrival(session, model_id, pix_model.case_arrival_model)
+
+    if pix_model.resource_model:
+        _bulk_create_resource_profiles(session, model_id, pix_model.resource_model, activities_names_by_id)
+
+    return model_id
+
+
+def _bulk_create_gateways(session: Session, model_id: int, gateway_probabilities: list[GatewayProbabilities]):
+    gateway_ids = bulk_insert(
+        session,
+        Gateway,
+        [{"simulation_model_id": model_id, "bpmn_id": gateway.gateway_id} for gateway in gateway_probabilities],
+    )
+    bulk_insert(
+        session,
+        SequenceFlow,
+        [
+            {"source_gateway_id": gateway_id, "bpmn_id": flow.path_id, "probability": flow.probability}
+            for gateway_id, gateway in zip(gateway_ids, gateway_probabilities)
+            for flow in gateway.outgoing_paths
+        ],
+        return_ids=False,
+    )
+
+
+def _bulk_create_case_arrival(session: Session, model_id: int, case_arrival_model: CaseArrivalModel):
+    calendar_id = _bulk_create_calendars(session, [case_arrival_model.case_arrival_calendar])[0]
+    distribution_id = _bulk_create_distributions(
+        session,
+        [
+            {
+                "name": case_arrival_model.inter_arrival_times["distribution_name"],
+                "parameters": _pix_distribution_to_relational_distribution_parameters(
+                    DurationDistribution.from_dict(case_arrival_model.inter_arrival_times)
+                ),
+            }
+        ],
+    )[0]
+    bulk_insert(
+        session,
+        CaseArrival,
+        [
+            {
+                "calendar_id": calendar_id,
+                "inter_arrival_distribution_id": distribution_id,
+                "simulation_model_id": model_id,
+            }
+        ],
+        return_ids=False,
+    )
+
+
+def _bulk_create_resource_profiles(
+    session: Session,
+    model_id: int,
+    resource_model: ResourceModel,
+    activities_names_by_id: dict[str, str],
+):
+    # create resource calendars and map them to relational calendars
+    for calendar in resource_model.resource_calendars:  # we expect RCalendar, not FuzzyResourceCalendar
+        if not isinstance(calendar, RCalendar):
+            raise ValueError("Only RCalendar from the PIX framework is supported")
+    calendar_ids = _bulk_create_calendars(session, resource_model.resource_calendars)
+    calendars = {  # calendar_id -> relational_calendar_id
+        calendar.calendar_id: calendar_id
+        for calendar, calendar_id in zip(resource_model.resource_calendars, calendar_ids)
+    }
+
+    resources = _collect_resources(resource_model, calendars, activities_names_by_id)
+
+    # create resource profiles, resources are created for each profile they belong to
+    profile_ids = bulk_insert(
+        session,
+        ResourceProfile,
+        [{"name": profile.name, "simulation_model_id": model_id} for profile in resource_model.resource_profiles],
+    )
+    profile_resources = [
+        (profile_id, resources[resource.id])
+        for profile_id, profile in zip(profile_ids, resource_model.resource_profiles)
+        for resource in profile.resources
+    ]
+    resource_ids = bulk_insert(
+        session,
+        Resource,
+        [
+            {
+                "bpmn_id": resource["bpmn_id"],
+                "name": resource["name"],
+                "amount": resource.get("amount") or 0,
+                "cost_per_hour": resource.get("cost_per_hour") or 0,
+                "calendar_id": resource["calendar_id"],
+                "profile_id": profile_id,
+            }
+            for profile_id, resource in profile_resources
+        ],
+    )
+
+    # create activities, their distributions, and link them to the resources
+    resource_activity_distributions = [
+        (resource_id, activity_distribution)
+        for resource_id, (_, resource) in zip(resource_ids, profile_resources)
+        for activity_distribution in resource["activity_distributions"]
+    ]
+    activity_ids = bulk_insert(
+        session,
+        Activity,
+        [
+            {
+                "bpmn_id": activity_distribution["activity_bpmn_id"],
+                "name": activity_distribution["activity_name"],
+                "resource_id": resource_id,
+            }
+            for resource_id, activity_distribution in resource_activity_distributions
+        ],
+    )
+    distribution_ids = _bulk_create_distributions(
+        session, [activity_distribution["distribution"] for _, activity_distribution in resource_activity_distributions]
+    )
+    bulk_insert(
+        session,
+        ActivityResourceDistribution,
+        [
+            {"activity_id": activity_id, "resource_id": resource_id, "distribution_id": distribution_id}
+            for activity_id, (resource_id, _), distribution_id in zip(
+                activity_ids, resource_activity_distributions, distribution_ids
+            )
+        ],
+        return_ids=False,
+    )
+
+
+def _bulk_create_calendars(session: Session, calendars: list[RCalendar]) -> list[int]:
+    calendar_ids = bulk_insert(session, Calendar, [{} for _ in calendars])
+    bulk_insert(
+        session,
+        CalendarInterval,
+        [
+            {"calendar_id": calendar_id} | interval
+            for calendar_id, calendar in zip(calendar_ids, calendars)
+            for interval in _pix_calendar_to_intervals(calendar)
+        ],
+        return_ids=False,
+    )
+    return calendar_ids
+
+
+def _bulk_create_distributions(session: Session, distributions: list[dict]) -> list[int]:
+    distribution_ids = bulk_insert(
+        session, Distribution, [{"name": distribution["name"]} for distribution in distributions]
+    )
+    bulk_insert(
+        session,
+        DistributionParameter,
+        [
+            {"distribution_id": distribution_id, "name": parameter["name"], "value": parameter["value"]}
+            for distribution_id, distribution in zip(distribution_ids, distributions)
+            for parameter in distribution["parameters"]
+        ],
+        return_ids=False,
+    )
+    return distribution_ids
 
 
 def _prosimos_calendar_start_time_to_dict(time: str) -> dict:
@@ -1,55 +1,316 @@
 """Prosimos simulator utilities, e.g., for running simulations, handling the performance report."""
+import csv
+import io
 import json
+import os
+import random
+import statistics
 import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable, Iterator, Optional
 
-from prosimos.simulation_engine import run_simulation as run_prosimos_simulation
+import numpy as np
+from prosimos.simulation_engine import run_simpy_simulation
+from prosimos.simulation_setup import SimDiffSetup
+from prosimos.warning_logger import warning_logger
+from scipy import stats
 
-from simulation_copilot.database import get_session
+from simulation_copilot.database import session_scope
+from simulation_copilot.performance_report import PerformanceReport
 from simulation_copilot.relational_to_prosimos_adapter import create_simulation_model_from_relational_data
+from simulation_copilot.simulation_cache import fingerprint, get_default_cache
+from simulation_copilot.simulation_pool import SimulationPool, simulation_pool
+from simulation_copilot.tracing import span
 
 
 def get_resource_utilization_and_overall_statistics(report: str) -> str:
     """
     Extracts only the resource utilization and overall simulation statistics sections.
     """
-    utilization, statistics = split_prosimos_report(report)
-    return f"{utilization.strip()}\n{statistics.strip()}"
+    return PerformanceReport.from_prosimos(report).resource_utilization_and_overall_statistics()
 
 
-def split_prosimos_report(report: str) -> tuple[str, str]:
+def run_prosimos(
+    model_id: int,
+    process_path: Path,
+    total_cases: int = 100,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+    use_cache: bool = True,
+) -> str:
     """
-    Splits the performance report into separate documents because the initial report is composed of 3 CSV tables
-    in one text file separated by `""`.
+    Runs the simulation with the given model ID. Returns the simulation performance report.
+
+    The simulation starts at starting_at, which defaults to the current time. Runs with the same seed and starting_at
+    produce the same report.
+
+    If use_cache is True, the report of the same scenario with the same seed and starting_at is reused,
+    see simulation_cache. Runs without a seed or starting_at aren't cached, so each of them returns a new sample
+    starting at the current time.
     """
-    # report has 4 sections: start and end times; resource utilization, task statistics, simulation statistics
-    sections = report.split('""')
-    resource_utilization = sections[1]
-    overall_statistics = sections[3]
-    return resource_utilization, overall_statistics
+    # pylint: disable=too-many-arguments
+    simulation_attributes = get_simulation_attributes(model_id, process_path)
+    return _cached(
+        fingerprint(simulation_attributes, process_path, total_cases=total_cases, starting_at=starting_at, seed=seed),
+        use_cache,
+        seed,
+        starting_at,
+        lambda: _simulate(process_path, simulation_attributes, total_cases, as_utc(starting_at), seed),
+    )
 
 
-def run_prosimos(model_id: int, process_path: Path) -> str:
+def run_prosimos_replications(
+    model_id: int,
+    process_path: Path,
+    replications: int = 10,
+    total_cases: int = 100,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    confidence: float = 0.95,
+    use_cache: bool = True,
+) -> str:
     """
-    Runs the simulation with the given model ID. Returns the simulation performance report.
+    Runs independent replications of the simulation with the given model ID in parallel processes and returns
+    the summary of KPIs across replications with confidence intervals, see summarize_replications.
+
+    Each replication gets its own seed derived from the given one, so the summary is reproducible if the seed
+    and starting_at are set. max_workers defaults to the number of CPUs. See run_prosimos for use_cache.
+    Raises ValueError if replications is less than one.
     """
-    with get_session() as session:
+    # pylint: disable=too-many-arguments
+    if replications < 1:
+        raise ValueError(f"At least one replication is required, got {replications}.")
+    simulation_attributes = get_simulation_attributes(model_id, process_path)
+
+    def simulate() -> str:
+        start = as_utc(starting_at or datetime.now(timezone.utc))  # same start for all replications
+        seeds = _spawn_seeds(np.random.SeedSequence(seed), replications)
+        with simulation_pool(max_workers) as pool:
+            reports = _simulate_batch(pool, process_path, simulation_attributes, total_cases, start, seeds)
+        return summarize_replications(reports, confidence)
+
+    key = fingerprint(
+        simulation_attributes,
+        process_path,
+        total_cases=total_cases,
+        starting_at=starting_at,
+        seed=seed,
+        replications=replications,
+        confidence=confidence,
+    )
+    return _cached(key, use_cache, seed, starting_at, simulate)
+
+
+def run_prosimos_until_converged(
+    model_id: int,
+    process_path: Path,
+    kpis: tuple[str, ...] = ("cycle_time",),
+    relative_half_width: float = 0.05,
+    batch_size: int = 4,
+    max_replications: int = 40,
+    total_cases: int = 100,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    confidence: float = 0.95,
+    use_cache: bool = True,
+) -> str:
+    """
+    Runs batches of parallel replications of the simulation with the given model ID until the confidence interval
+    half-width of each of the given KPIs is within relative_half_width of its mean, or max_replications is reached.
+    Returns the summary of KPIs across all replications, see summarize_replications and get_report_kpis for KPI names.
+
+    Stable models stop after the first batch, while volatile ones get more replications. See run_prosimos
+    for use_cache.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    if batch_size < 2:
+        raise ValueError("Batch size must be at least 2 to estimate the confidence interval.")
+
+    simulation_attributes = get_simulation_attributes(model_id, process_path)
+
+    def simulate() -> str:
+        start = as_utc(starting_at or datetime.now(timezone.utc))
+        seed_sequence = np.random.SeedSequence(seed)
+        reports, samples = [], []
+        with simulation_pool(max_workers) as pool:
+            while len(reports) < max_replications:
+                seeds = _spawn_seeds(seed_sequence, min(batch_size, max_replications - len(reports)))
+                batch = _simulate_batch(pool, process_path, simulation_attributes, total_cases, start, seeds)
+                reports.extend(batch)
+                samples.extend(get_report_kpis(report) for report in batch)
+                if all(_is_converged([s[kpi] for s in samples], confidence, relative_half_width) for kpi in kpis):
+                    break
+        return summarize_replications(reports, confidence)
+
+    key = fingerprint(
+        simulation_attributes,
+        process_path,
+        total_cases=total_cases,
+        starting_at=starting_at,
+        seed=seed,
+        kpis=kpis,
+        relative_half_width=relative_half_width,
+        batch_size=batch_size,
+        max_replications=max_replications,
+        confidence=confidence,
+    )
+    return _cached(key, use_cache, seed, starting_at, simulate)
+
+
+def _cached(
+    key: str, use_cache: bool, seed: Optional[int], starting_at: Optional[datetime], simulate: Callable[[], str]
+) -> str:
+    if not use_cache or seed is None or starting_at is None:  # new samples, or the start is the current time
+        return simulate()
+    cache = get_default_cache()
+    with span("simulation.cache_lookup") as lookup_span:
+        report = cache.get(key)
+        lookup_span.set(cache_hit=report is not None)
+    if report is None:
+        report = simulate()
+        cache.put(key, report)
+    return report
+
+
+def _is_converged(values: list[float], confidence: float, relative_half_width: float) -> bool:
+    mean, half_width = _mean_and_half_width(values, confidence)
+    return half_width <= relative_half_width * abs(mean)
+
+
+def get_simulation_attributes(model_id: int, process_path: Path) -> dict:
+    """Returns Prosimos simulation parameters of the model with the given ID."""
+    with session_scope() as session:
         bps_model = create_simulation_model_from_relational_data(session, model_id)
-        simulation_attributes = bps_model.to_prosimos_format(process_model=process_path)
+        with span("model.to_prosimos_format"):
+            return bps_model.to_prosimos_format(process_model=process_path)
+
+
+def as_utc(starting_at: Optional[datetime]) -> Optional[datetime]:
+    """Returns the datetime, assuming UTC if it has no timezone."""
+    if starting_at is not None and starting_at.tzinfo is None:
+        return starting_at.replace(tzinfo=timezone.utc)  # Prosimos compares it with timezone-aware datetimes
+    return starting_at
+
 
+def _spawn_seeds(seed_sequence: np.random.SeedSequence, count: int) -> list[int]:
+    return [int(s.generate_state(1)[0]) for s in seed_sequence.spawn(count)]
+
+
+def _simulate_batch(
+    pool: SimulationPool,
+    process_path: Path,
+    simulation_attributes: dict,
+    total_cases: int,
+    starting_at: Optional[datetime],
+    seeds: list[int],
+) -> list[str]:
+    # pylint: disable=too-many-arguments
+    count = len(seeds)
+    return pool.map(
+        _simulate,
+        [process_path] * count,
+        [simulation_attributes] * count,
+        [total_cases] * count,
+        [starting_at] * count,
+        seeds,
+    )
+
+
+def _simulate(
+    process_path: Path,
+    simulation_attributes: dict,
+    total_cases: int,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+) -> str:
+    """Runs one Prosimos simulation and returns the performance report.
+
+    Unlike prosimos.simulation_engine.run_simulation, the report is collected in memory and no report or warning
+    files are written.
+    """
+    if seed is not None:
+        # Prosimos samples from the global generators of both modules
+        random.seed(seed)
+        np.random.seed(seed)
+
+    with _parameters_file(simulation_attributes) as json_path:
+        simulation_setup = SimDiffSetup(process_path, json_path, is_event_added_to_log=False, total_cases=total_cases)
+    # always set, as in the replications, so the start is moved into the arrival calendar
+    simulation_setup.set_starting_datetime(as_utc(starting_at or datetime.now(timezone.utc)))
+
+    report = io.StringIO()
+    try:
+        with span("simulation.run", total_cases=total_cases, seed=seed):
+            run_simpy_simulation(simulation_setup, csv.writer(report), None)
+    finally:
+        warning_logger.clear_warnings()  # the logger is global and Prosimos never clears it
+    return report.getvalue()
+
+
+def simulate_kpis(
+    process_path: Path,
+    simulation_attributes: dict,
+    total_cases: int,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+) -> tuple[str, dict[str, float]]:
+    """Runs _simulate and returns the report with its KPIs, so workers of a pool parse reports in parallel."""
+    report = _simulate(process_path, simulation_attributes, total_cases, starting_at, seed)
+    return report, get_report_kpis(report)
+
+
+@contextmanager
+def _parameters_file(simulation_attributes: dict) -> Iterator[str]:
+    """
+    Yields the path to a file with the simulation parameters because Prosimos reads them only from a file.
+    On Linux, the file lives in memory, elsewhere, it's a temporary file. The file is removed on exit.
+    """
+    content = json.dumps(simulation_attributes)  # several times faster than json.dump, which isn't in C
+    if hasattr(os, "memfd_create"):
+        with open(os.memfd_create("prosimos_parameters.json"), "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            yield f"/proc/self/fd/{f.fileno()}"
+    else:
         with tempfile.NamedTemporaryFile(mode="w", suffix=".json") as f:
-            # save the simulation model to a temporary file
-            json.dump(simulation_attributes, f)
+            f.write(content)
             f.flush()  # otherwise, the file content is truncated
-            simulation_report_path = Path(f.name).with_suffix(".csv")
-
-            # run simulation
-            run_prosimos_simulation(
-                bpmn_path=process_path,
-                json_path=f.name,
-                total_cases=100,
-                stat_out_path=simulation_report_path,
-            )
-            with open(simulation_report_path, "r", encoding="utf-8") as report_file:
-                report = report_file.read()
-    return report
+            yield f.name
+
+
+def get_report_kpis(report: str) -> dict[str, float]:
+    """
+    Extracts the main KPIs from the performance report, see PerformanceReport.kpis.
+    """
+    return PerformanceReport.from_prosimos(report).kpis().to_dict()
+
+
+def summarize_replications(reports: list[str], confidence: float = 0.95) -> str:
+    """
+    Aggregates KPIs of replication reports into a CSV table with the mean, standard deviation
+    and the Student's t confidence interval of the mean of each KPI. Raises ValueError if there are no reports.
+    """
+    if not reports:
+        raise ValueError("At least one replication report is required.")
+    samples = [get_report_kpis(report) for report in reports]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["KPI", "Mean", "Standard Deviation", "CI Lower", "CI Upper", "Replications"])
+    for kpi in samples[0]:
+        values = [sample[kpi] for sample in samples]
+        mean, half_width = _mean_and_half_width(values, confidence)
+        std = statistics.stdev(values) if len(values) > 1 else 0.0
+        writer.writerow([kpi, mean, std, mean - half_width, mean + half_width, len(values)])
+    return f"Replications Summary ({confidence:.0%} confidence intervals)\n{output.getvalue()}"
+
+
+def _mean_and_half_width(values: list[float], confidence: float) -> tuple[float, float]:
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, float("inf")
+    standard_error = statistics.stdev(values) / len(values) ** 0.5
+    return mean, stats.t.ppf((1 + confidence) / 2, len(values) - 1) * standard_error
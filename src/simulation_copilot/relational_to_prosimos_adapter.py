@@ -34,15 +34,18 @@ from simulation_copilot.prosimos_relational_model import (
     ResourceProfile,
 )
 from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
+from simulation_copilot.tracing import traced
 
 
+@traced("model.export")
 def create_simulation_model_from_relational_data(session: Session, model_id: int) -> BPSModel:
     """
     Query the simulation model and its relationships with the given ID from the database and compose a BPS model.
     """
     service = ProsimosRelationalService(session)
 
-    sql_model = service.get_simulation_model(model_id)
+    # the whole model graph is loaded eagerly, so traversing it below doesn't hit the database
+    sql_model = service.get_simulation_model_with_relationships(model_id)
     if not sql_model:
         raise ValueError(f"Model with ID {model_id} not found.")
 
@@ -55,20 +58,20 @@ def create_simulation_model_from_relational_data(session: Session, model_id: int
 
     # case arrival
     if sql_model.case_arrival:
-        arrival_calendar = service.get_calendar(sql_model.case_arrival.calendar_id)
-        arrival_distribution = service.get_distribution(sql_model.case_arrival.inter_arrival_distribution_id)
+        arrival_calendar = sql_model.case_arrival.calendar
+        arrival_distribution = sql_model.case_arrival.inter_arrival_distribution
         pix_case_arrival = _case_arrival_to_pix(arrival_calendar, arrival_distribution)
         model.case_arrival_model = pix_case_arrival
 
     # resource model
     if sql_model.resource_profiles:
-        pix_resource_model = _resource_model_to_pix(sql_model.resource_profiles, service)
+        pix_resource_model = _resource_model_to_pix(sql_model.resource_profiles)
         model.resource_model = pix_resource_model
 
     return model
 
 
-def _resource_model_to_pix(resource_profiles: list[ResourceProfile], service: ProsimosRelationalService):
+def _resource_model_to_pix(resource_profiles: list[ResourceProfile]):
     # processing resource profiles, resource calendars, and activity resource distributions in one loop
     # to avoid multiple loops over the same data
     pix_resource_profiles = []
@@ -83,13 +86,11 @@ def _resource_model_to_pix(resource_profiles: list[ResourceProfile], service: Pr
             resources.append(_resource_to_pix(resource))
             # prepare resource calendars map for processing after this loop
             # NOTE: we assume each resource has a single calendar
-            resource_calendars_map[resource.calendar_id] = True
+            resource_calendars_map[resource.calendar_id] = resource.calendar
             # prepare activity resource distributions map for processing after this loop
             for activity_resource_distribution in resource.assigned_activities:
-                resource_distribution = _resource_distribution_to_pix(
-                    activity_resource_distribution, resource.id, service
-                )
-                activity = service.get_activity(activity_resource_distribution.activity_id)
+                resource_distribution = _resource_distribution_to_pix(activity_resource_distribution, resource.id)
+                activity = activity_resource_distribution.activity
                 if activity.bpmn_id not in activity_resource_distributions_map:  # Prosimos simulator relies on BPMN ID
                     activity_resource_distributions_map[activity.bpmn_id] = [resource_distribution]
                 else:
@@ -103,9 +104,7 @@ def _resource_model_to_pix(resource_profiles: list[ResourceProfile], service: Pr
             )
         )
     # finish processing resource calendars
-    pix_resource_calendars = [
-        _calendar_to_pix(service.get_calendar(calendar_id)) for calendar_id in resource_calendars_map
-    ]
+    pix_resource_calendars = [_calendar_to_pix(calendar) for calendar in resource_calendars_map.values()]
     # finish processing activity resource distributions
     pix_activity_resource_distributions = [
         PIXActivityResourceDistribution(
@@ -195,10 +194,8 @@ def _resource_to_pix(resource: Resource) -> PIXResource:
 def _resource_distribution_to_pix(
     activity_resource_distribution: ActivityResourceDistribution,
     resource_id: int,
-    service: ProsimosRelationalService,
 ) -> PIXResourceDistribution:
-    distribution = service.get_distribution(activity_resource_distribution.distribution_id)
     return PIXResourceDistribution(
         resource_id=str(resource_id),
-        distribution=_distribution_to_pix(distribution).to_prosimos_distribution(),
+        distribution=_distribution_to_pix(activity_resource_distribution.distribution).to_prosimos_distribution(),
     )
@@ -0,0 +1,172 @@
+"""Multi-objective search for resource allocations trading the staffing cost off against the cycle time.
+
+The staffing cost of an allocation is the sum of amount * cost_per_hour over all resources, i.e., what the staff
+costs per hour. It is known without simulation, while the average cycle time comes from simulating the allocation.
+The search is a Pareto local search: starting from the amounts of the base model and the largest allowed amounts,
+it simulates neighbours of allocations on the current Pareto front, i.e., allocations with one more or one fewer
+copy of one resource, until no front allocation has unexplored neighbours or the evaluation budget is spent.
+Neighbours are simulated in batches in parallel processes, and each allocation is simulated only once,
+see scenario_sweep.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from simulation_copilot.prosimos_utils import get_simulation_attributes
+from simulation_copilot.scenario_sweep import ScenarioChanges, VariantSimulator
+from simulation_copilot.tracing import span
+
+MAX_EVALUATIONS = 200
+
+Allocation = tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class AmountBounds:
+    """The range of amounts of a resource the search may assign, both ends included."""
+
+    min_amount: int = 1
+    max_amount: int = 5
+
+    def __post_init__(self):
+        if not 0 <= self.min_amount <= self.max_amount:
+            raise ValueError(f"Invalid amount bounds [{self.min_amount}, {self.max_amount}].")
+
+    def clip(self, amount: int) -> int:
+        """Returns the amount limited to the bounds."""
+        return min(max(amount, self.min_amount), self.max_amount)
+
+
+def optimize_resource_allocation(
+    model_id: int,
+    process_path: Path,
+    bounds: dict[str, AmountBounds],
+    arrival_rate_multiplier: float = 1.0,
+    max_evaluations: int = MAX_EVALUATIONS,
+    total_cases: int = 100,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Searches amounts of the resources with the given names within their bounds, other resources keep their amounts,
+    and returns the Pareto front of the staffing cost per hour and the average cycle time. Each row has the amounts
+    of the searched resources, the staffing cost and the KPIs of the allocation, see get_report_kpis. Rows are
+    ordered by the staffing cost, so the cycle time decreases down the table. The arrival_rate_multiplier changes
+    the demand all allocations are simulated with, see ScenarioGrid.
+
+    At most max_evaluations allocations are simulated. All of them share the seed and starting_at, see
+    run_scenario_sweep. Raises ValueError if a resource isn't found.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    names = list(bounds)
+    base_attributes = get_simulation_attributes(model_id, process_path)
+    changes = ScenarioChanges(base_attributes, process_path)
+    base_amounts = _resource_amounts(base_attributes)
+    missing = [name for name in names if name not in base_amounts]
+    if missing:
+        raise ValueError(f"Resources with names {missing} not found.")
+
+    evaluated: dict[Allocation, dict[str, float]] = {}
+    expanded: set[Allocation] = set()
+    # the search descends from the largest allocation and spreads from the current one
+    candidates = list(
+        dict.fromkeys(
+            [
+                tuple(bounds[name].clip(base_amounts[name]) for name in names),
+                tuple(bounds[name].max_amount for name in names),
+            ]
+        )
+    )
+    with span("resource_optimization", resources=len(names)), VariantSimulator(
+        process_path, total_cases, starting_at, seed, max_workers, use_cache
+    ) as simulator:
+        while candidates:
+            candidates = candidates[: max_evaluations - len(evaluated)]  # the budget may cut the last batch
+            variants = [
+                changes.apply({**_scenario(names, allocation), "arrival_rate": arrival_rate_multiplier})
+                for allocation in candidates
+            ]
+            for allocation, variant, kpis in zip(candidates, variants, simulator.simulate(variants)):
+                evaluated[allocation] = {"staffing_cost": _staffing_cost(variant), **kpis}
+            if len(evaluated) >= max_evaluations:
+                break
+
+            front = pareto_front(evaluated)
+            candidates = []
+            for allocation in front:
+                if allocation not in expanded:
+                    expanded.add(allocation)
+                    candidates.extend(_neighbours(allocation, names, bounds, evaluated, candidates))
+
+    front = pareto_front(evaluated)
+    table = pd.DataFrame([{**_scenario(names, allocation), **evaluated[allocation]} for allocation in front])
+    return table.sort_values("staffing_cost", kind="stable", ignore_index=True)
+
+
+def pareto_front(
+    evaluated: dict[Allocation, dict[str, float]], objectives: tuple[str, ...] = ("staffing_cost", "cycle_time")
+) -> list[Allocation]:
+    """Returns allocations not dominated by any other one, all objectives are minimized."""
+    points = {allocation: tuple(kpis[objective] for objective in objectives) for allocation, kpis in evaluated.items()}
+    return [
+        allocation
+        for allocation, point in points.items()
+        if not any(_dominates(other, point) for other in points.values())
+    ]
+
+
+def cheapest_allocation(front: pd.DataFrame, max_cycle_time: float) -> Optional[pd.Series]:
+    """Returns the row of the front with the lowest staffing cost and the cycle time within the limit, if any."""
+    feasible = front[front["cycle_time"] <= max_cycle_time]
+    return None if feasible.empty else feasible.loc[feasible["staffing_cost"].idxmin()]
+
+
+def _dominates(left: tuple[float, ...], right: tuple[float, ...]) -> bool:
+    return all(x <= y for x, y in zip(left, right)) and left != right
+
+
+def _neighbours(
+    allocation: Allocation,
+    names: list[str],
+    bounds: dict[str, AmountBounds],
+    evaluated: dict[Allocation, dict[str, float]],
+    pending: list[Allocation],
+) -> list[Allocation]:
+    neighbours = []
+    for i, name in enumerate(names):
+        for step in (-1, 1):
+            amount = allocation[i] + step
+            if bounds[name].min_amount <= amount <= bounds[name].max_amount:
+                neighbour = allocation[:i] + (amount,) + allocation[i + 1 :]
+                if neighbour not in evaluated and neighbour not in pending and neighbour not in neighbours:
+                    neighbours.append(neighbour)
+    return neighbours
+
+
+def _scenario(names: list[str], allocation: Allocation) -> dict[str, int]:
+    return {f"amount:{name}": amount for name, amount in zip(names, allocation)}
+
+
+def _resources(simulation_attributes: dict) -> dict[str, dict]:
+    """Returns resources by ID, a resource may be listed in several profiles."""
+    return {
+        resource["id"]: resource
+        for profile in simulation_attributes["resource_profiles"]
+        for resource in profile["resource_list"]
+    }
+
+
+def _resource_amounts(simulation_attributes: dict) -> dict[str, int]:
+    return {resource["name"]: resource["amount"] for resource in _resources(simulation_attributes).values()}
+
+
+def _staffing_cost(simulation_attributes: dict) -> float:
+    return sum(
+        resource["amount"] * resource["cost_per_hour"] for resource in _resources(simulation_attributes).values()
+    )
@@ -0,0 +1,268 @@
+"""Sweeps of what-if scenarios over a grid of simulation model parameters.
+
+A sweep answers questions like "what if each of these resources had 1 to 4 copies?" in one call. Scenarios are
+variants of the Prosimos parameters of the base model built in memory, so the database isn't changed. They are
+simulated in parallel by the simulation workers, see simulation_pool, with the same seed and start time, so
+differences in KPIs come from the parameters rather than from the sampling, and the KPIs of all scenarios are
+returned as one table ranked by the chosen KPI.
+"""
+
+import copy
+import itertools
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from simulation_copilot.prosimos_model.process_model import get_process_model
+from simulation_copilot.prosimos_utils import as_utc, get_report_kpis, get_simulation_attributes, simulate_kpis
+from simulation_copilot.simulation_cache import fingerprint, get_default_cache
+from simulation_copilot.simulation_pool import SimulationPool, get_default_pool
+from simulation_copilot.tracing import span
+
+MAX_SCENARIOS = 256
+
+# Powers of the scale factor for each Prosimos distribution parameter, e.g., the variance grows with its square
+_PARAMETER_POWERS = {
+    "fix": (1,),
+    "uniform": (1, 1),
+    "expon": (1, 1, 1),
+    "norm": (1, 1, 1, 1),
+    "lognorm": (1, 2, 1, 1),
+    "gamma": (1, 2, 1, 1),
+}
+
+
+@dataclass
+class ScenarioGrid:
+    """
+    Values of model parameters to combine, each combination of values is one scenario. A parameter left out
+    keeps its value from the base model.
+
+    - resource_amounts: the resource name to its amounts;
+    - arrival_rate_multipliers: multipliers of the case arrival rate, e.g., 1.2 means 20% more cases per time unit;
+    - activity_duration_multipliers: the activity name to multipliers of its duration, the mean and the spread
+      of the duration distribution are scaled together;
+    - gateway_probabilities: the gateway BPMN ID to probability assignments, each maps the BPMN ID of an outgoing
+      flow to its probability, flows left out get zero, and probabilities are normalized to sum up to one.
+    """
+
+    resource_amounts: dict[str, list[int]] = field(default_factory=dict)
+    arrival_rate_multipliers: list[float] = field(default_factory=list)
+    activity_duration_multipliers: dict[str, list[float]] = field(default_factory=dict)
+    gateway_probabilities: dict[str, list[dict[str, float]]] = field(default_factory=dict)
+
+    def parameters(self) -> dict[str, list]:
+        """Returns the values of each parameter by its column name in the sweep table."""
+        parameters = {f"amount:{name}": list(values) for name, values in self.resource_amounts.items()}
+        if self.arrival_rate_multipliers:
+            parameters["arrival_rate"] = list(self.arrival_rate_multipliers)
+        for activity, values in self.activity_duration_multipliers.items():
+            parameters[f"duration:{activity}"] = list(values)
+        for gateway_id, values in self.gateway_probabilities.items():
+            parameters[f"gateway:{gateway_id}"] = list(values)
+        return parameters
+
+    def scenarios(self) -> list[dict[str, Any]]:
+        """Returns all combinations of parameter values, the base model is the only scenario of an empty grid."""
+        parameters = self.parameters()
+        return [dict(zip(parameters, values)) for values in itertools.product(*parameters.values())]
+
+
+def run_scenario_sweep(
+    model_id: int,
+    process_path: Path,
+    grid: ScenarioGrid,
+    rank_by: str = "cycle_time",
+    ascending: bool = True,
+    total_cases: int = 100,
+    starting_at: Optional[datetime] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    max_scenarios: int = MAX_SCENARIOS,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Simulates all scenarios of the grid applied to the model with the given ID in parallel processes and returns
+    a table with the parameter values and the KPIs of each scenario, see get_report_kpis. Rows are ordered
+    by the rank_by KPI, and the index is the rank starting from 1.
+
+    All scenarios share the seed and starting_at, so the table is reproducible if both are set. Raises ValueError
+    if the grid has more than max_scenarios scenarios or refers to unknown resources, activities, gateways or flows.
+    See run_prosimos for use_cache.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    scenarios = grid.scenarios()
+    if len(scenarios) > max_scenarios:
+        raise ValueError(f"The grid has {len(scenarios)} scenarios, at most {max_scenarios} are allowed.")
+
+    base_attributes = get_simulation_attributes(model_id, process_path)
+    with span("simulation.sweep", scenarios=len(scenarios)):
+        changes = ScenarioChanges(base_attributes, process_path)
+        variants = [changes.apply(scenario) for scenario in scenarios]
+        with VariantSimulator(process_path, total_cases, starting_at, seed, max_workers, use_cache) as simulator:
+            kpis = pd.DataFrame(simulator.simulate(variants))
+
+    table = pd.concat([pd.DataFrame(scenarios, columns=list(grid.parameters())), kpis], axis=1)
+    table = table.sort_values(rank_by, ascending=ascending, kind="stable", ignore_index=True)
+    table.index = pd.RangeIndex(1, len(table) + 1, name="rank")
+    return table
+
+
+class VariantSimulator:
+    """
+    Simulates variants of Prosimos simulation parameters in the default pool of simulation workers, or, if
+    max_workers is given, in a pool of that size started on the first miss in the cache and shut down on exit.
+    All variants share the start time and the seed, so their KPIs differ only due to the parameters, i.e., common
+    random numbers. Without a seed, one is drawn for all variants, and the cache isn't used, since the reports
+    of such variants are samples of the drawn seed only. Neither is it used without starting_at, since the variants
+    start at the current time then.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        process_path: Path,
+        total_cases: int,
+        starting_at: Optional[datetime],
+        seed: Optional[int],
+        max_workers: Optional[int],
+        use_cache: bool,
+    ):
+        # pylint: disable=too-many-arguments
+        self.process_path = process_path
+        self.total_cases = total_cases
+        self._options = {"total_cases": total_cases, "starting_at": starting_at, "seed": seed}
+        self._start = as_utc(starting_at or datetime.now(timezone.utc))
+        self._seed = seed if seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+        self._max_workers = max_workers
+        self._cache = get_default_cache() if use_cache and seed is not None and starting_at is not None else None
+        self._pool: Optional[SimulationPool] = None
+
+    def __enter__(self) -> "VariantSimulator":
+        return self
+
+    def __exit__(self, *_):
+        if self._pool is not None and self._max_workers is not None:
+            self._pool.shutdown()
+
+    def simulate(self, variants: list[dict]) -> list[dict[str, float]]:
+        """Returns KPIs of the variants, see get_report_kpis, only variants missing in the cache are simulated."""
+        # the same keys as in run_prosimos, so the base scenario reuses its reports and vice versa
+        keys = [fingerprint(variant, self.process_path, **self._options) for variant in variants]
+        reports = [self._cache.get(key) if self._cache is not None else None for key in keys]
+        missing = [i for i, report in enumerate(reports) if report is None]
+        kpis = [get_report_kpis(report) if report is not None else None for report in reports]
+        if not missing:
+            return kpis
+
+        if self._pool is None:
+            self._pool = get_default_pool() if self._max_workers is None else SimulationPool(self._max_workers)
+        count = len(missing)
+        results = self._pool.map(
+            simulate_kpis,
+            [self.process_path] * count,
+            [variants[i] for i in missing],
+            [self.total_cases] * count,
+            [self._start] * count,
+            [self._seed] * count,
+        )
+        for i, (report, report_kpis) in zip(missing, results):
+            kpis[i] = report_kpis
+            if self._cache is not None:
+                self._cache.put(keys[i], report)
+        return kpis
+
+
+class ScenarioChanges:
+    """Applies parameter values of a scenario to a copy of the Prosimos simulation parameters."""
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, simulation_attributes: dict, process_path: Path):
+        self._attributes = simulation_attributes
+        self._activity_ids = get_process_model(process_path).activity_ids_by_name
+        self._appliers: dict[str, Callable[[dict, str, Any], None]] = {
+            "amount": self._set_resource_amount,
+            "arrival_rate": self._scale_arrival_rate,
+            "duration": self._scale_activity_duration,
+            "gateway": self._set_gateway_probabilities,
+        }
+
+    def apply(self, scenario: dict[str, Any]) -> dict:
+        """Returns a copy of the simulation parameters with the values of the scenario, see ScenarioGrid.scenarios."""
+        attributes = copy.deepcopy(self._attributes)
+        for column, value in scenario.items():
+            kind, _, target = column.partition(":")
+            self._appliers[kind](attributes, target, value)
+        return attributes
+
+    @staticmethod
+    def _set_resource_amount(attributes: dict, name: str, amount: int):
+        if amount < 0:
+            raise ValueError(f"Amount of resource {name} must not be negative, got {amount}.")
+        resources = [
+            resource
+            for profile in attributes["resource_profiles"]
+            for resource in profile["resource_list"]
+            if resource["name"] == name
+        ]
+        if not resources:
+            raise ValueError(f"Resource with name {name} not found.")
+        for resource in resources:
+            resource["amount"] = amount
+
+    @staticmethod
+    def _scale_arrival_rate(attributes: dict, _: str, multiplier: float):
+        if multiplier <= 0:
+            raise ValueError(f"Arrival rate multiplier must be positive, got {multiplier}.")
+        _scale_distribution(attributes["arrival_time_distribution"], 1 / multiplier)
+
+    def _scale_activity_duration(self, attributes: dict, activity: str, multiplier: float):
+        if multiplier <= 0:
+            raise ValueError(f"Duration multiplier of activity {activity} must be positive, got {multiplier}.")
+        task_id = self._activity_ids.get(activity)
+        if task_id is None:
+            raise ValueError(f"Activity with name {activity} not found.")
+        for task in attributes["task_resource_distribution"]:
+            if task["task_id"] == task_id:
+                for distribution in task["resources"]:
+                    _scale_distribution(distribution, multiplier)
+
+    @staticmethod
+    def _set_gateway_probabilities(attributes: dict, gateway_id: str, probabilities: dict[str, float]):
+        gateway = next(
+            (g for g in attributes["gateway_branching_probabilities"] if g["gateway_id"] == gateway_id), None
+        )
+        if gateway is None:
+            raise ValueError(f"Gateway with ID {gateway_id} not found.")
+        paths = {path["path_id"] for path in gateway["probabilities"]}
+        unknown = set(probabilities) - paths
+        if unknown:
+            raise ValueError(f"Gateway {gateway_id} has no outgoing flows {sorted(unknown)}, it has {sorted(paths)}.")
+        total = sum(probabilities.values())
+        if total <= 0 or any(value < 0 for value in probabilities.values()):
+            raise ValueError(f"Probabilities of gateway {gateway_id} must be non-negative with a positive sum.")
+        for path in gateway["probabilities"]:
+            path["value"] = probabilities.get(path["path_id"], 0.0) / total
+
+
+def _scale_distribution(distribution: dict, factor: float):
+    """Scales the random variable of the Prosimos distribution in place, so its mean and spread change by factor."""
+    powers = _PARAMETER_POWERS.get(distribution["distribution_name"])
+    if powers is None:
+        raise ValueError(f"Scaling distribution {distribution['distribution_name']} is not supported.")
+    for parameter, power in zip(distribution["distribution_params"], powers):
+        parameter["value"] = parameter["value"] * factor**power
+
+
+def format_sweep(table: pd.DataFrame) -> str:
+    """Returns the sweep table as CSV, gateway probabilities are written as JSON objects."""
+    table = table.copy()
+    for column in table.columns:
+        if column.startswith("gateway:"):
+            table[column] = table[column].map(lambda value: json.dumps(value, sort_keys=True))
+    return table.to_csv()
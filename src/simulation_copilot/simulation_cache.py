@@ -0,0 +1,147 @@
+"""Content-addressed cache of simulation reports.
+
+Reports are keyed by the fingerprint of the canonical Prosimos parameters, the BPMN file content and the run options,
+so re-simulating an unchanged scenario returns the stored report. Recently used reports are kept in memory,
+and, if a directory is given, all reports are also stored on disk up to a size limit.
+
+The default cache is configured from environment variables:
+
+- SIMULATION_CACHE_DIR: directory of the on-disk store, reports are kept only in memory if not set;
+- SIMULATION_CACHE_MAX_BYTES: size limit of the on-disk store, 256 MB by default.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def fingerprint(simulation_attributes: dict, process_path: Path, **options) -> str:
+    """Returns a stable hash of the simulation parameters, the BPMN file content and the run options.
+
+    Parameters are serialized with sorted keys, so the order of keys doesn't change the hash.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(simulation_attributes, sort_keys=True, separators=(",", ":"), default=str).encode())
+    digest.update(hashlib.sha256(Path(process_path).read_bytes()).digest())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class SimulationCache:
+    """Two-tier cache of simulation reports: LRU in memory and an optional on-disk store with size-based eviction.
+
+    The least recently used files are removed when the store grows over max_disk_bytes. The size of the store is
+    counted on start and kept up to date on writes, so the directory is listed only when files are evicted. Other
+    processes may share the directory, and the count is corrected on each eviction. The cache is thread-safe.
+    """
+
+    def __init__(
+        self, directory: Optional[Path] = None, max_memory_entries: int = 128, max_disk_bytes: int = 256 * 2**20
+    ):
+        self.directory = Path(directory) if directory else None
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(stat.st_size for _, stat in self._disk_files())
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the report stored under the key or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            if self.directory is None:
+                return None
+            path = self._path(key)
+            try:
+                report = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                return None
+            os.utime(path)  # the modification time marks the last use for eviction
+            self._remember(key, report)
+            return report
+
+    def put(self, key: str, report: str):
+        """Stores the report under the key."""
+        with self._lock:
+            self._remember(key, report)
+            if self.directory is None:
+                return
+            # written under a name unique to the process and thread and renamed, so readers never see a partial report
+            path = self._path(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(report, encoding="utf-8")
+            try:
+                self._disk_bytes -= path.stat().st_size
+            except FileNotFoundError:
+                pass
+            self._disk_bytes += tmp_path.stat().st_size
+            tmp_path.replace(path)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_from_disk()
+
+    def clear(self):
+        """Removes all reports from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self.directory is None:
+                return
+            for path in self.directory.glob("*.csv"):
+                path.unlink(missing_ok=True)
+            self._disk_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.csv"
+
+    def _remember(self, key: str, report: str):
+        self._memory[key] = report
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_files(self) -> list[tuple[Path, os.stat_result]]:
+        files = []
+        for path in self.directory.glob("*.csv"):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                pass  # removed by another process
+        return files
+
+    def _evict_from_disk(self):
+        files = self._disk_files()
+        total_size = sum(stat.st_size for _, stat in files)
+        for path, stat in sorted(files, key=lambda item: item[1].st_mtime):
+            if total_size <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= stat.st_size
+        self._disk_bytes = total_size
+
+
+_default_cache: Optional[SimulationCache] = None
+
+
+def get_default_cache() -> SimulationCache:
+    """Returns the process-wide cache configured from the environment, it's created on the first call."""
+    global _default_cache  # pylint: disable=global-statement
+    if _default_cache is None:
+        max_disk_bytes = os.environ.get("SIMULATION_CACHE_MAX_BYTES")
+        _default_cache = SimulationCache(
+            directory=os.environ.get("SIMULATION_CACHE_DIR") or None,
+            max_disk_bytes=int(max_disk_bytes) if max_disk_bytes else 256 * 2**20,
+        )
+    return _default_cache
@@ -0,0 +1,114 @@
+"""Long-lived pool of simulation worker processes.
+
+Starting worker processes and parsing the BPMN model again for each simulation costs more than short simulations
+themselves, so sweeps and replications share one pool of workers started on the first use and kept until the end
+of the program. Each worker keeps the parsed BPMN graphs of process models it has simulated, keyed by the path,
+modification time and size of the file, and Prosimos gets a copy of the parsed graph instead of parsing the file.
+Simulation parameters are sent to workers with each task, results are sent back.
+
+The default pool is configured from the SIMULATION_WORKERS environment variable, the number of worker processes,
+which defaults to the number of CPUs.
+"""
+
+import atexit
+import os
+import pickle
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import prosimos.simulation_setup
+from dotenv import load_dotenv
+from prosimos.simulation_properties_parser import parse_simulation_model
+
+load_dotenv()
+
+
+class SimulationPool:
+    """Pool of worker processes with warm Prosimos and parsed BPMN graphs, see the module documentation.
+
+    If a worker dies, the pending tasks fail with BrokenProcessPool, and the pool restarts the workers, so later
+    tasks run as usual.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._executor = self._start()
+        self._lock = threading.Lock()
+
+    def _start(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            return self._executor.submit(fn, *args)
+
+    def map(self, fn: Callable, *iterables: Iterable) -> list:
+        """Runs fn on the items of iterables in the workers and returns the results in order."""
+        try:
+            futures = [self.submit(fn, *args) for args in zip(*iterables)]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            self._restart()
+            raise
+
+    def _restart(self):
+        with self._lock:
+            if getattr(self._executor, "_broken", False):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start()
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+    def __enter__(self) -> "SimulationPool":
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+
+
+_default_pool: Optional[SimulationPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> SimulationPool:
+    """Returns the process-wide pool configured from the environment, it's started on the first call."""
+    global _default_pool  # pylint: disable=global-statement
+    with _default_pool_lock:
+        if _default_pool is None:
+            max_workers = os.environ.get("SIMULATION_WORKERS")
+            _default_pool = SimulationPool(max_workers=int(max_workers) if max_workers else None)
+            atexit.register(_default_pool.shutdown)
+    return _default_pool
+
+
+@contextmanager
+def simulation_pool(max_workers: Optional[int] = None) -> Iterator[SimulationPool]:
+    """Yields the default pool, or a pool with max_workers processes, if given, which is shut down on exit."""
+    if max_workers is None:
+        yield get_default_pool()
+    else:
+        with SimulationPool(max_workers=max_workers) as pool:
+            yield pool
+
+
+# Parsed BPMN graphs of the worker process by the path, modification time and size of the BPMN file, pickled,
+# because Prosimos changes the graph during the simulation, and unpickling is much faster than parsing.
+_parsed_graphs: dict[tuple[str, int, int], bytes] = {}
+
+
+def _init_worker():
+    prosimos.simulation_setup.parse_simulation_model = _parse_simulation_model_cached
+
+
+def _parse_simulation_model_cached(bpmn_path) -> Any:
+    stat = os.stat(bpmn_path)
+    key = (str(Path(bpmn_path).resolve()), stat.st_mtime_ns, stat.st_size)
+    graph = _parsed_graphs.get(key)
+    if graph is None:
+        graph = _parsed_graphs[key] = pickle.dumps(parse_simulation_model(bpmn_path))
+    return pickle.loads(graph)
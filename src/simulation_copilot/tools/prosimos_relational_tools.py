@@ -5,37 +5,55 @@ Example of high-level questions:
 - What if we increase or decrease the number of resources of a role?
 """
 
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable, Optional
 
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.tools import tool
 
-from simulation_copilot.database import get_session
+from simulation_copilot.anthropic import declare_tool_effects
+from simulation_copilot.database import get_session, is_connection_shared
+from simulation_copilot.performance_report import PerformanceReport
 from simulation_copilot.prosimos_relational_model import SimulationModel
 from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
-from simulation_copilot.prosimos_utils import (
-    run_prosimos,
-    get_resource_utilization_and_overall_statistics,
-)
+from simulation_copilot.prosimos_utils import run_prosimos
+from simulation_copilot.resource_optimizer import AmountBounds, cheapest_allocation, optimize_resource_allocation
+from simulation_copilot.scenario_sweep import ScenarioGrid, format_sweep, run_scenario_sweep
 
 # pylint: disable=missing-class-docstring,global-statement
 
-_session = get_session()
-_service = ProsimosRelationalService(_session)
+
+def _service() -> ProsimosRelationalService:
+    """Returns the service bound to the database session of the current thread, so tools can run concurrently."""
+    return ProsimosRelationalService(get_session())
+
 
 # Baseline performance of the initial simulation which should be set from the main script
 # in the beginning of the user session.
-_baseline_performance_report: str = ""
+_baseline_performance_report: Optional[PerformanceReport] = None
 
 # Path to the BPMN file that is used in simulation. In this prototype, we work only with one simulation model
 # at a time, so we simply use the module-level variable and update it from the main CLI script.
 _process_path: Path
 
+# All simulations of the copilot share the seed and the start, so reports of models differ only due to their
+# parameters, and simulating a model again, e.g., after a change that has been undone, reuses the cached report.
+# The main script should pass them to the baseline simulation too.
+SIMULATION_SEED = 42
+SIMULATION_STARTING_AT = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+
 
 def set_baseline_performance_report(report: str):
-    """Setter for the corresponding module variable."""
+    """Setter for the corresponding module variable, expects the full report generated by Prosimos."""
     global _baseline_performance_report
-    _baseline_performance_report = report
+    _baseline_performance_report = PerformanceReport.from_prosimos(report)
+
+
+def _baseline() -> PerformanceReport:
+    if _baseline_performance_report is None:
+        raise ValueError("Baseline performance report is not set, call set_baseline_performance_report first.")
+    return _baseline_performance_report
 
 
 def set_process_path(process_path: Path):
@@ -48,6 +66,11 @@ class QuerySimulationModelArgs(BaseModel):
     simulation_id: int = Field(description="The ID of the simulation model.")
 
 
+class ResourceByNameArgs(BaseModel):
+    model_id: int = Field(description="The ID of the simulation model.")
+    name: str = Field(description="The name of the resource.")
+
+
 class ChangeResourceAmountArgs(BaseModel):
     resource_id: int = Field(description="The ID of the resource.")
     amount: int = Field(description="The new amount of the resource.")
@@ -72,6 +95,44 @@ class NewDistributionArgs(BaseModel):
     )
 
 
+class ScenarioSweepArgs(BaseModel):
+    model_id: int = Field(description="The ID of the base simulation model, it isn't changed by the sweep.")
+    resource_amounts: dict[str, list[int]] = Field(
+        default_factory=dict, description="The resource name to the amounts to try, e.g., {'Kim Passa': [1, 2, 3]}."
+    )
+    arrival_rate_multipliers: list[float] = Field(
+        default_factory=list,
+        description="Multipliers of the case arrival rate to try, e.g., [1.0, 1.5] for the current and 50% more cases.",
+    )
+    activity_duration_multipliers: dict[str, list[float]] = Field(
+        default_factory=dict,
+        description="The activity name to multipliers of its mean duration to try, e.g., {'Pay Invoice': [0.5, 1.0]}.",
+    )
+    gateway_probabilities: dict[str, list[dict[str, float]]] = Field(
+        default_factory=dict,
+        description="The gateway BPMN ID to probability assignments to try. Each assignment maps the BPMN ID "
+        "of an outgoing sequence flow to its probability, flows left out get zero.",
+    )
+    rank_by: str = Field(
+        default="cycle_time",
+        description="The KPI to rank scenarios by, lower is better. One of 'cycle_time', 'processing_time', "
+        "'waiting_time', 'idle_time', 'resource_utilization', 'cost'.",
+    )
+
+
+class ResourceAllocationArgs(BaseModel):
+    model_id: int = Field(description="The ID of the base simulation model, it isn't changed by the search.")
+    resource_names: list[str] = Field(description="Names of the resources whose amounts are searched.")
+    min_amount: int = Field(default=1, description="The smallest amount of each searched resource.")
+    max_amount: int = Field(default=5, description="The largest amount of each searched resource.")
+    max_cycle_time: Optional[float] = Field(
+        default=None, description="The limit of the average cycle time in seconds to find the cheapest staffing for."
+    )
+    arrival_rate_multiplier: float = Field(
+        default=1.0, description="The multiplier of the case arrival rate, e.g., 2.0 to staff for twice the demand."
+    )
+
+
 class NewResourceActivityDistributionArgs(BaseModel):
     activity_name: str = Field(description="The name of the activity.")
     activity_bpmn_id: str = Field(description="The BPMN ID of the activity.")
@@ -109,13 +170,22 @@ class NewCaseArrivalArgs(BaseModel):
 @tool("create_simulation_model")
 def create_simulation_model() -> int:
     """Creates a new simulation model in the database with empty parameters and returns its ID."""
-    return _service.create_simulation_model().id
+    return _service().create_simulation_model().id
 
 
 @tool("get_simulation_model", args_schema=QuerySimulationModelArgs)
 def get_simulation_model(simulation_id: int) -> SimulationModel:
     """Returns the simulation model with the given ID from the database."""
-    return _service.get_simulation_model(simulation_id)
+    return _service().get_simulation_model(simulation_id)
+
+
+@tool("clone_simulation_model", args_schema=QuerySimulationModelArgs)
+def clone_simulation_model(simulation_id: int) -> int:
+    """Creates a copy of the simulation model for exploring a what-if scenario without changing the original model.
+    Returns the ID of the new simulation model. Resources of the copy have new IDs.
+    """
+    service = _service()
+    return service.clone_simulation_model(simulation_id).id
 
 
 @tool("change_resource_amount", args_schema=ChangeResourceAmountArgs)
@@ -123,12 +193,13 @@ def change_resource_amount(resource_id: int, amount: int) -> bool:
     """Changes the amount of a resource in the simulation model.
     Returns True if the operation was successful.
     """
-    resource = _service.repository.resource.get(resource_id)
+    service = _service()
+    resource = service.repository.resource.get(resource_id)
     if resource is None:
         raise ValueError(f"Resource with ID {resource_id} not found.")
     resource.amount = amount
-    _session.add(resource)
-    _session.commit()
+    service.repository.session.add(resource)
+    service.repository.session.commit()
     return True
 
 
@@ -147,21 +218,22 @@ def add_resource_to_profile(
     availability calendar ID and a list of resource-activity distributions.
     Returns True if the operation was successful.
     """
-    profile = _service.repository.resource_profile.get(profile_id)
+    service = _service()
+    profile = service.repository.resource_profile.get(profile_id)
     if profile is None:
         raise ValueError(f"Profile with ID {profile_id} not found.")
-    # pylint: disable=duplicate-code
-    resource = _service.create_resource_with_activity_distributions(
-        bpmn_id=bpmn_id,
-        name=name,
-        amount=amount,
-        cost_per_hour=cost_per_hour,
-        calendar_id=calendar_id,
-        activity_distributions=resource_activity_distributions,
-    )
-    profile.resources.append(resource)
-    _session.add(profile)
-    _session.commit()
+    with service.unit_of_work():  # the resource is either fully added to the profile or not at all
+        # pylint: disable=duplicate-code
+        resource = service.create_resource_with_activity_distributions(
+            bpmn_id=bpmn_id,
+            name=name,
+            amount=amount,
+            cost_per_hour=cost_per_hour,
+            calendar_id=calendar_id,
+            activity_distributions=resource_activity_distributions,
+        )
+        profile.resources.append(resource)
+        service.repository.session.add(profile)
     return True
 
 
@@ -170,18 +242,19 @@ def remove_resource_from_profile_by_id(resource_id: int) -> bool:
     """Removes a resource from a profile of the simulation model.
     Returns True if the operation was successful.
     """
-    resource = _service.repository.resource.get(resource_id)
+    service = _service()
+    resource = service.repository.resource.get(resource_id)
     if resource is None:
         raise ValueError(f"Resource with ID {resource_id} not found.")
-    _session.delete(resource)
-    _session.commit()
+    service.repository.session.delete(resource)
+    service.repository.session.commit()
     return True
 
 
 @tool("create_calendar_with_intervals", args_schema=NewCalendarArgs)
 def create_calendar_with_intervals(intervals: list[dict]) -> int:
     """Creates a new availability calendar with intervals and returns its ID."""
-    return _service.create_calendar_with_intervals(intervals).id
+    return _service().create_calendar_with_intervals(intervals).id
 
 
 @tool("create_distribution", args_schema=NewDistributionArgs)
@@ -189,13 +262,13 @@ def create_distribution(name: str, parameters: list[dict]) -> int:
     """Creates a distribution object from the given arguments.
     Returns the ID of the distribution."""
     _ensure_all_distribution_parameters(name, parameters)
-    return _service.create_distribution_with_parameters(name=name, parameters=parameters).id
+    return _service().create_distribution_with_parameters(name=name, parameters=parameters).id
 
 
 @tool("add_case_arrival", args_schema=NewCaseArrivalArgs)
 def add_case_arrival(simulation_model_id: int, calendar_id: int, inter_arrival_distribution_id: int) -> bool:
     """Adds case arrival model to the simulation model. Calendar and distribution must be created beforehand."""
-    _service.create_case_arrival(
+    _service().create_case_arrival(
         model_id=simulation_model_id,
         calendar_id=calendar_id,
         distribution_id=inter_arrival_distribution_id,
@@ -203,30 +276,121 @@ def add_case_arrival(simulation_model_id: int, calendar_id: int, inter_arrival_d
     return True
 
 
-@tool("get_resource_id_by_name")
-def get_resource_id_by_name(name: str) -> int:
-    """Returns the ID of the resource with the given name."""
-    resource = _service.repository.resource.get_by_name(name)
+@tool("get_resource_id_by_name", args_schema=ResourceByNameArgs)
+def get_resource_id_by_name(model_id: int, name: str) -> int:
+    """Returns the ID of the resource with the given name in the simulation model with the given ID."""
+    resource = _service().repository.resource.get_by_name(name, model_id=model_id)
     if resource is None:
-        raise ValueError(f"Resource with name {name} not found.")
+        raise ValueError(f"Resource with name {name} not found in simulation model {model_id}.")
     return resource.id
 
 
 @tool("get_baseline_performance_report")
 def get_baseline_performance_report() -> str:
     """Returns the baseline performance report of the simulation model before any changes."""
-    report = f"Baseline performance report:\n{_baseline_performance_report}"  # marks the baseline report for LLM
+    report = _baseline().resource_utilization_and_overall_statistics()
+    report = f"Baseline performance report:\n{report}"  # marks the baseline report for LLM
     return report
 
 
 @tool("generate_performance_report")
 def generate_performance_report(model_id: int) -> str:
-    """Runs a simulation given the simulation model ID and returns the performance report generated by the simulator.
-    Returns the report as string."""
-    report = run_prosimos(model_id=model_id, process_path=_process_path)
-    report = get_resource_utilization_and_overall_statistics(report)
-    report = f"New performance report:\n{report}"  # marks the new report for LLM, so it's not lost in the prompt
-    return report
+    """Runs a simulation given the simulation model ID and returns how the performance changed compared to
+    the baseline performance report. Returns the metrics that changed as CSV string."""
+    baseline = _baseline()  # checked before the simulation runs
+    report = run_prosimos(
+        model_id=model_id, process_path=_process_path, starting_at=SIMULATION_STARTING_AT, seed=SIMULATION_SEED
+    )
+    changes = PerformanceReport.from_prosimos(report).changes_from(baseline)
+    # marks the new report for LLM, so it's not lost in the prompt
+    return f"New performance report, changes compared to the baseline:\n{changes}"
+
+
+@tool("run_scenario_sweep", args_schema=ScenarioSweepArgs)
+def run_scenario_sweep_tool(
+    model_id: int,
+    resource_amounts: Optional[dict[str, list[int]]] = None,
+    arrival_rate_multipliers: Optional[list[float]] = None,
+    activity_duration_multipliers: Optional[dict[str, list[float]]] = None,
+    gateway_probabilities: Optional[dict[str, list[dict[str, float]]]] = None,
+    rank_by: str = "cycle_time",
+) -> str:
+    """Simulates all combinations of the given parameter values applied to the simulation model without changing it,
+    and returns the KPIs of each scenario ranked by the given KPI as CSV. Use it instead of changing the model
+    and generating a report for each combination. At most 256 combinations are allowed."""
+    # pylint: disable=too-many-arguments
+    grid = ScenarioGrid(
+        resource_amounts=resource_amounts or {},
+        arrival_rate_multipliers=arrival_rate_multipliers or [],
+        activity_duration_multipliers=activity_duration_multipliers or {},
+        gateway_probabilities=gateway_probabilities or {},
+    )
+    table = run_scenario_sweep(
+        model_id,
+        _process_path,
+        grid,
+        rank_by=rank_by,
+        starting_at=SIMULATION_STARTING_AT,
+        seed=SIMULATION_SEED,
+    )
+    return f"Scenario sweep, ranked by {rank_by}:\n{format_sweep(table)}"
+
+
+@tool("optimize_resource_allocation", args_schema=ResourceAllocationArgs)
+def optimize_resource_allocation_tool(
+    model_id: int,
+    resource_names: list[str],
+    min_amount: int = 1,
+    max_amount: int = 5,
+    max_cycle_time: Optional[float] = None,
+    arrival_rate_multiplier: float = 1.0,
+) -> str:
+    """Searches amounts of the given resources without changing the simulation model and returns the Pareto front
+    of the staffing cost per hour and the average cycle time as CSV, i.e., the allocations for which no other one is
+    both cheaper and faster. If max_cycle_time is given, also returns the cheapest allocation within it."""
+    # pylint: disable=too-many-arguments
+    bounds = {name: AmountBounds(min_amount, max_amount) for name in resource_names}
+    front = optimize_resource_allocation(
+        model_id,
+        _process_path,
+        bounds,
+        arrival_rate_multiplier=arrival_rate_multiplier,
+        starting_at=SIMULATION_STARTING_AT,
+        seed=SIMULATION_SEED,
+    )
+    output = f"Pareto front of staffing cost per hour and cycle time:\n{front.to_csv(index=False)}"
+    if max_cycle_time is not None:
+        cheapest = cheapest_allocation(front, max_cycle_time)
+        if cheapest is None:
+            output += f"No allocation keeps the cycle time under {max_cycle_time} seconds."
+        else:
+            output += f"Cheapest allocation with the cycle time under {max_cycle_time} seconds:\n{cheapest.to_csv()}"
+    return output
+
+
+def _writes(state: Callable[[dict], list[str]] = lambda _: []) -> Callable[[dict], list[str]]:
+    """
+    Returns the declared state of a tool changing the database. If all threads share one database connection,
+    a commit or rollback of one tool would end the transaction of another one, so all such tools share
+    the database state and run one at a time.
+    """
+    return lambda args: [*state(args), *(["database"] if is_connection_shared() else [])]
+
+
+# Side effects of tools, so independent tool calls can run concurrently. Tools creating new records don't touch
+# any shared state, tools reading the whole model are read-only without a declared state, so they don't run
+# concurrently with changes. Cloning reads the whole source model while creating the copy, so it declares nothing
+# and runs alone.
+declare_tool_effects(create_simulation_model, state=_writes())
+declare_tool_effects(get_simulation_model, read_only=True)
+declare_tool_effects(change_resource_amount, state=_writes(lambda args: [f"resource:{args['resource_id']}"]))
+declare_tool_effects(create_calendar_with_intervals, state=_writes())
+declare_tool_effects(create_distribution, state=_writes())
+declare_tool_effects(get_resource_id_by_name, read_only=True)
+declare_tool_effects(get_baseline_performance_report, read_only=True, state=[])
+declare_tool_effects(generate_performance_report, read_only=True)
+declare_tool_effects(run_scenario_sweep_tool, read_only=True)
+declare_tool_effects(optimize_resource_allocation_tool, read_only=True)
 
 
 def _ensure_all_distribution_parameters(name: str, parameters: list[dict]):
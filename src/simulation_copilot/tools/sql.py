@@ -1,13 +1,233 @@
-import logging
-from typing import Optional, Sequence
+"""SQL tool for querying and changing the simulation model database directly.
+
+Reads, i.e., SELECT, VALUES, EXPLAIN and read-only PRAGMA queries, run in a read-only transaction which is rolled
+back, on SQLite with writes disabled. A statement with common table expressions is classified by its main statement
+after the WITH clause. At most MAX_ROWS rows are fetched and returned as CSV followed by a truncation marker, so
+a broad query doesn't flood the context of the LLM. Before a read runs on SQLite or PostgreSQL, its query plan is
+checked, and a query scanning a table with more than MAX_FULL_SCAN_ROWS rows without a LIMIT is rejected, unless
+it aggregates all rows into one, e.g., SELECT count(*). Other statements are committed.
+"""
+
+import csv
+import io
+import re
+from enum import Enum
 
 from langchain.tools import tool
 from langchain_core.pydantic_v1 import BaseModel, Field
-from sqlalchemy import text, Row
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
 
 from simulation_copilot.database import get_session
 
-_session = get_session()
+MAX_ROWS = 50
+MAX_FULL_SCAN_ROWS = 10_000
+
+_LEADING_COMMENTS_REGEX = re.compile(r"\s*(?:(?:--[^\n]*(?:\n|$)|/\*.*?\*/)\s*)*", re.DOTALL)
+_KEYWORD_REGEX = re.compile(r"\w+")
+# string literals, quoted identifiers and comments are single tokens, so their content is never taken for keywords
+_TOKEN_REGEX = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|\w+|[()]|[^\w\s()]+", re.DOTALL
+)
+_MAIN_KEYWORDS = {"SELECT", "VALUES", "INSERT", "REPLACE", "UPDATE", "DELETE"}
+_AGGREGATE_FUNCTIONS = {"COUNT", "SUM", "TOTAL", "AVG", "MIN", "MAX", "GROUP_CONCAT", "STRING_AGG"}
+_MULTI_ROW_KEYWORDS = {"GROUP", "UNION", "INTERSECT", "EXCEPT", "OVER"}
+_LIMIT_REGEX = re.compile(r"\bLIMIT\s+\d+(?:\s*(?:OFFSET|,)\s*\d+)?\s*;?\s*$", re.IGNORECASE)
+_TABLE_REFERENCE_REGEX = re.compile(
+    r"\b(?:FROM|JOIN)\s+[\"`]?(\w+)[\"`]?(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|USING|LEFT|RIGHT|INNER|OUTER|CROSS|"
+    r"NATURAL|GROUP|ORDER|LIMIT|UNION|EXCEPT|INTERSECT|HAVING|WINDOW)\b)(\w+))?",
+    re.IGNORECASE,
+)
+# The statement prefix showing the query plan and the pattern of a full table scan in a plan row by the dialect.
+# On SQLite, e.g., "SCAN resource" or "SCAN r USING COVERING INDEX ...", but not "SCAN CONSTANT ROW"
+# or "SCAN (subquery-1)", on PostgreSQL, e.g., "->  Seq Scan on resource r  (cost=...)".
+_QUERY_PLANS = {
+    "sqlite": ("EXPLAIN QUERY PLAN", re.compile(r"^SCAN (?!CONSTANT ROW)(?:TABLE )?(\w+)")),
+    "postgresql": ("EXPLAIN", re.compile(r"\bSeq Scan on (\w+)")),
+}
+_PRAGMA_REGEX = re.compile(r"PRAGMA\s+(?:\w+\s*\.\s*)?(\w+)\s*(=)?", re.IGNORECASE)
+# PRAGMA statements which only read, even with an argument, e.g., PRAGMA table_info(resource)
+_READ_ONLY_PRAGMAS = {
+    "collation_list",
+    "compile_options",
+    "database_list",
+    "foreign_key_check",
+    "foreign_key_list",
+    "function_list",
+    "index_info",
+    "index_list",
+    "index_xinfo",
+    "integrity_check",
+    "module_list",
+    "pragma_list",
+    "quick_check",
+    "table_info",
+    "table_list",
+    "table_xinfo",
+}
+
+
+class StatementKind(str, Enum):
+    READ = "read"
+    WRITE = "write"
+
+
+def classify_statement(sql: str) -> StatementKind:
+    """
+    Classifies the statement by its first keyword, or by the main statement after the common table expressions
+    of a WITH clause. Only PRAGMA statements known to be read-only are reads, others may change the connection,
+    e.g., PRAGMA foreign_keys(0), so they are writes.
+    """
+    keyword = _first_keyword(sql)
+    if keyword == "WITH":
+        keyword = next(iter(_main_statement(_top_level_tokens(sql))), "")
+    if keyword in ("SELECT", "VALUES", "EXPLAIN"):
+        return StatementKind.READ
+    if keyword == "PRAGMA":
+        pragma = _PRAGMA_REGEX.search(sql)
+        if pragma and pragma.group(1).lower() in _READ_ONLY_PRAGMAS and not pragma.group(2):
+            return StatementKind.READ
+    return StatementKind.WRITE
+
+
+def _first_keyword(sql: str) -> str:
+    keyword = _KEYWORD_REGEX.match(sql, _LEADING_COMMENTS_REGEX.match(sql).end())
+    return keyword.group().upper() if keyword else ""
+
+
+def _top_level_tokens(sql: str) -> list[str]:
+    """
+    Returns upper-cased tokens of the statement outside of parentheses, e.g., the tokens of count(*) are COUNT and (.
+    Comments are dropped.
+    """
+    tokens, depth = [], 0
+    for match in _TOKEN_REGEX.finditer(sql):
+        token = match.group()
+        if token.startswith("--") or token.startswith("/*"):
+            continue
+        if token == ")":
+            depth -= 1
+        elif depth == 0:
+            tokens.append(token.upper())
+        if token == "(":
+            depth += 1
+    return tokens
+
+
+def _main_statement(tokens: list[str]) -> list[str]:
+    """Returns the top-level tokens from the main statement on, i.e., without the WITH clause."""
+    if not tokens or tokens[0] != "WITH":
+        return tokens
+    # bodies of common table expressions are in parentheses, so the first top-level statement keyword is the main one
+    start = next((i for i, token in enumerate(tokens) if token in _MAIN_KEYWORDS), len(tokens))
+    return tokens[start:]
+
+
+def _returns_single_row(tokens: list[str]) -> bool:
+    """Checks if the query aggregates all rows into one, i.e., it has aggregates but no GROUP BY or window."""
+    tokens = _main_statement(tokens)
+    if not tokens or tokens[0] != "SELECT" or _MULTI_ROW_KEYWORDS.intersection(tokens):
+        return False
+    columns = tokens[1 : tokens.index("FROM")] if "FROM" in tokens else tokens[1:]
+    return any(token in _AGGREGATE_FUNCTIONS and following == "(" for token, following in zip(columns, columns[1:]))
+
+
+def execute_sql(
+    session: Session, sql: str, max_rows: int = MAX_ROWS, max_full_scan_rows: int = MAX_FULL_SCAN_ROWS
+) -> str:
+    """
+    Executes the statement and returns rows as CSV or the number of changed rows. Writes are committed. Reads run
+    in a read-only transaction of their own which is rolled back afterward, so the session doesn't keep
+    the connection idle in a transaction, and changes of the session which aren't committed are discarded.
+    Rows beyond max_rows aren't fetched.
+    """
+    if classify_statement(sql) == StatementKind.WRITE:
+        result = session.execute(text(sql))
+        if result.returns_rows:
+            output = _format_rows(result, max_rows)
+        else:
+            output = f"{max(_changed_rows(session, result), 0)} rows changed"
+        session.commit()
+        return output
+
+    session.rollback()  # transaction characteristics can be set only at the start of a transaction
+    try:
+        return _read(session.connection(), sql, max_rows, max_full_scan_rows)
+    finally:
+        session.rollback()
+
+
+def _read(connection: Connection, sql: str, max_rows: int, max_full_scan_rows: int) -> str:
+    sqlite = connection.dialect.name == "sqlite"
+    # SQLite has no read-only transactions, the setting of the connection isn't reset by the rollback
+    connection.exec_driver_sql("PRAGMA query_only = ON" if sqlite else "SET TRANSACTION READ ONLY")
+    try:
+        if max_full_scan_rows is not None:
+            rejection = _check_full_scans(connection, sql, max_full_scan_rows)
+            if rejection:
+                return rejection
+        return _format_rows(connection.execution_options(stream_results=True).execute(text(sql)), max_rows)
+    finally:
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA query_only = OFF")
+
+
+def _changed_rows(session: Session, result) -> int:
+    if result.rowcount < 0 and session.connection().dialect.name == "sqlite":
+        # sqlite3 counts changes only of statements starting with INSERT, UPDATE, DELETE or REPLACE, not WITH
+        return session.execute(text("SELECT changes()")).scalar_one()
+    return result.rowcount
+
+
+def _format_rows(result, max_rows: int) -> str:
+    rows = result.fetchmany(max_rows + 1)
+    result.close()  # the remaining rows are discarded without fetching them
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(result.keys())
+    writer.writerows(rows[:max_rows])
+    if len(rows) > max_rows:
+        output.write(f"[truncated to the first {max_rows} rows, narrow the query with WHERE, LIMIT or aggregates]\n")
+    elif not rows:
+        output.write("[no rows]\n")
+    return output.getvalue()
+
+
+def _check_full_scans(connection: Connection, sql: str, max_full_scan_rows: int) -> str:
+    """
+    Returns the rejection message if the query fully scans a large table, otherwise an empty string. Query plans
+    of dialects other than SQLite and PostgreSQL aren't checked.
+    """
+    if connection.dialect.name not in _QUERY_PLANS:
+        return ""
+    tokens = _top_level_tokens(sql)
+    if next(iter(_main_statement(tokens)), "") not in ("SELECT", "VALUES") or _LIMIT_REGEX.search(sql.strip()):
+        return ""
+    if _returns_single_row(tokens):
+        return ""
+    explain, full_scan_regex = _QUERY_PLANS[connection.dialect.name]
+    plan = connection.execute(text(f"{explain} {sql}")).all()
+    tables = {}
+    for table, alias in _TABLE_REFERENCE_REGEX.findall(sql):
+        tables[table] = table
+        if alias:
+            tables[alias] = table
+    for row in plan:
+        match = full_scan_regex.search(row[-1])
+        if not match:
+            continue
+        table = tables.get(match.group(1), match.group(1))
+        try:
+            count = connection.execute(text(f'SELECT count(*) FROM "{table}"')).scalar_one()
+        except DBAPIError:  # not a table, e.g., a common table expression
+            continue
+        if count > max_full_scan_rows:
+            return (
+                f"Query rejected: it scans all {count} rows of table {table}. "
+                "Filter by an indexed column, e.g., a primary or foreign key, or add a LIMIT."
+            )
+    return ""
 
 
 class RunSQLite3QueryInput(BaseModel):
@@ -15,16 +235,9 @@ class RunSQLite3QueryInput(BaseModel):
 
 
 @tool("run_sqlite3_query", args_schema=RunSQLite3QueryInput)
-def run_sqlite3_query(sql: str) -> Optional[Sequence[Row]]:
+def run_sqlite3_query(sql: str) -> str:
     """
-    This functions runs a single SQLite3 statement and returns results.
+    This functions runs a single SQLite3 statement and returns results as CSV. At most 50 rows are returned,
+    queries scanning large tables without a LIMIT are rejected.
     """
-    result = _session.execute(text(sql))
-    _session.commit()
-    if int(result.rowcount) == 0 or result.closed:
-        return None
-    try:
-        return result.all()
-    except Exception as e:
-        logging.warning(e)
-        return None
+    return execute_sql(get_session(), sql)
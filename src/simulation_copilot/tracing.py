@@ -0,0 +1,156 @@
+"""Tracing of the copilot loop.
+
+Spans measure where the time and tokens go per user request: LLM calls, tool invocations, database transactions,
+model exports, simulation runs and report parsing. Spans are nested, each span refers to its parent, and all spans
+of one root span share the trace ID.
+
+Finished spans are passed to an exporter. If the SIMULATION_COPILOT_TRACE_FILE environment variable is set,
+spans are appended to that file as JSON lines, otherwise, spans are not recorded, unless an exporter is set
+with set_exporter.
+
+Typical usage example:
+
+    with span("simulation.run", total_cases=100) as s:
+        ...
+        s.set(cache_hit=False)
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Protocol, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass
+class Span:
+    """Timed operation. start_time is the Unix time in seconds, duration is in seconds."""
+
+    # pylint: disable=too-many-instance-attributes
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_time: float
+    duration: Optional[float] = None
+    attributes: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        """Adds attributes to the span, e.g., token usage known only at the end of the operation."""
+        self.attributes.update(attributes)
+
+
+class _NoopSpan:
+    """Span returned when tracing is disabled."""
+
+    # pylint: disable=too-few-public-methods
+    def set(self, **attributes):
+        """Ignores the attributes."""
+
+
+class SpanExporter(Protocol):
+    """Receives finished spans."""
+
+    # pylint: disable=too-few-public-methods
+    def export(self, finished_span: Span):
+        """Exports the finished span."""
+
+
+class JsonLinesExporter:
+    """Appends spans to the file as JSON lines."""
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def export(self, finished_span: Span):
+        """Appends the span to the file, spans of several threads don't interleave."""
+        line = json.dumps(asdict(finished_span), default=str)
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class InMemoryExporter:
+    """Keeps spans in memory, e.g., for tests."""
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, finished_span: Span):
+        """Appends the span to the list of spans."""
+        self.spans.append(finished_span)
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+_trace_file = os.environ.get("SIMULATION_COPILOT_TRACE_FILE")
+_exporter: Optional[SpanExporter] = JsonLinesExporter(_trace_file) if _trace_file else None
+
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Sets the exporter of spans, None disables tracing."""
+    global _exporter  # pylint: disable=global-statement
+    _exporter = exporter
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Union[Span, _NoopSpan]]:
+    """Measures the block as a span with the given name and attributes, the span is a child of the current span."""
+    exporter = _exporter
+    if exporter is None:
+        yield _NoopSpan()
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start_time=time.time(),
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        exporter.export(current)
+
+
+def traced(name: str) -> Callable:
+    """Decorator measuring each call of the function as a span with the given name."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def propagate_context(func: Callable) -> Callable:
+    """Binds the function to the current tracing context, so spans started in another thread keep their parent."""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
@@ -0,0 +1,91 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import tempfile
+import unittest
+
+from anthropic.types import TextBlock, Usage
+from anthropic.types.beta.tools import ToolsBetaMessage, ToolUseBlock
+from langchain_core.tools import StructuredTool
+
+from simulation_copilot.anthropic import Conversation, MessageHistory
+from simulation_copilot.anthropic.clients import RecordReplayClient, ScriptedClient
+
+
+def _response(content: list, stop_reason: str) -> ToolsBetaMessage:
+    return ToolsBetaMessage(
+        id="msg",
+        type="message",
+        role="assistant",
+        model="claude",
+        content=content,
+        stop_reason=stop_reason,
+        usage=Usage(input_tokens=10, output_tokens=5),
+    )
+
+
+def _responses() -> list[ToolsBetaMessage]:
+    return [
+        _response(
+            [
+                TextBlock(type="text", text="Let me look up the resource."),
+                ToolUseBlock(id="tool_1", name="get_resource_id_by_name", input={"name": "Carmen"}, type="tool_use"),
+            ],
+            "tool_use",
+        ),
+        _response([TextBlock(type="text", text="Carmen has ID 1.")], "end_turn"),
+    ]
+
+
+def _tools() -> list[StructuredTool]:
+    def get_resource_id_by_name(name: str) -> int:
+        return {"Carmen": 1}[name]
+
+    return [StructuredTool.from_function(get_resource_id_by_name, description="Returns the ID of the resource.")]
+
+
+def _conversation(client, streaming: bool = False) -> Conversation:
+    return Conversation(model="claude", tools=_tools(), client=client, history=MessageHistory(), streaming=streaming)
+
+
+class TestAnthropicClients(unittest.TestCase):
+    def test_scripted_client(self):
+        client = ScriptedClient(_responses())
+        conversation = _conversation(client)
+
+        conversation.run("What is the ID of Carmen?")
+
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(client.requests[0]["messages"], [{"role": "user", "content": "What is the ID of Carmen?"}])
+        tool_result = client.requests[1]["messages"][-1]["content"][0]
+        self.assertEqual(tool_result["tool_use_id"], "tool_1")
+        self.assertEqual(tool_result["content"], [{"type": "text", "text": "1"}])
+        self.assertEqual(conversation.messages[-1]["content"][0].text, "Carmen has ID 1.")
+
+    def test_scripted_client_streaming(self):
+        client = ScriptedClient(_responses())
+        conversation = _conversation(client, streaming=True)
+
+        conversation.run("What is the ID of Carmen?")
+
+        self.assertTrue(all(request["stream"] for request in client.requests))
+        self.assertEqual(client.requests[1]["messages"][-1]["content"][0]["content"], [{"type": "text", "text": "1"}])
+        self.assertEqual(conversation.messages[1]["content"], _responses()[0].content)
+
+    def test_scripted_client_out_of_responses(self):
+        with self.assertRaises(RuntimeError):
+            _conversation(ScriptedClient(_responses()[:1])).run("What is the ID of Carmen?")
+
+    def test_record_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            _conversation(RecordReplayClient(directory, ScriptedClient(_responses()), mode="record")).run(
+                "What is the ID of Carmen?"
+            )
+            replayed = _conversation(RecordReplayClient(directory, mode="replay"))
+            replayed.run("What is the ID of Carmen?")
+
+            self.assertEqual(replayed.messages[-1]["content"][0].text, "Carmen has ID 1.")
+            with self.assertRaises(KeyError):
+                _conversation(RecordReplayClient(directory, mode="replay")).run("What is the ID of Esmeralda?")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,131 @@
 # pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace as Event
 
-from anthropic.types import TextBlock
-from anthropic.types.beta.tools import ToolUseBlock
+import httpx
+from anthropic import Anthropic, Stream
+from anthropic.types import MessageStreamEvent, TextBlock, Usage
+from anthropic.types.beta.tools import ToolsBetaMessage, ToolUseBlock
+from langchain_core.tools import StructuredTool
 
+from simulation_copilot.anthropic.clients import ScriptedClient
 from simulation_copilot.anthropic.conversation import (
+    _IncrementalToolRunner,
     _ToolResult,
     _compose_message_from_tools_output,
+    _message_from_stream,
+    Conversation,
+    _run_tool_blocks_concurrently,
+    _schedule_tool_blocks,
+    declare_tool_effects,
     RequestMessage,
     ContentBlock,
 )
+from simulation_copilot.anthropic.registry import ToolRegistry, format_tools
+
+
+def _make_tools(barrier: threading.Barrier = None) -> ToolRegistry:
+    def get_resource_id_by_name(name: str) -> int:
+        if barrier:
+            barrier.wait()  # fails unless both calls run at the same time
+        return {"Carmen": 1, "Esmeralda": 2}[name]
+
+    def change_resource_amount(resource_id: int, amount: int) -> bool:
+        return resource_id > 0 and amount > 0
+
+    def undeclared() -> bool:
+        return True
+
+    return ToolRegistry(
+        [
+            declare_tool_effects(
+                StructuredTool.from_function(get_resource_id_by_name, description="get_resource_id_by_name"),
+                read_only=True,
+            ),
+            declare_tool_effects(
+                StructuredTool.from_function(change_resource_amount, description="change_resource_amount"),
+                state=lambda args: [f"resource:{args['resource_id']}"],
+            ),
+            StructuredTool.from_function(undeclared, description="undeclared"),
+        ]
+    )
+
+
+def _block(block_id: str, name: str, tool_input: dict) -> ToolUseBlock:
+    return ToolUseBlock(id=block_id, input=tool_input, name=name, type="tool_use")
+
+
+def _stream_events(tool_started: threading.Event = None):
+    yield Event(
+        type="message_start",
+        message=Event(id="msg_1", model="claude", usage=Event(input_tokens=10, output_tokens=1)),
+    )
+    yield Event(type="content_block_start", index=0, content_block=Event(type="text", text=""))
+    yield Event(type="content_block_delta", index=0, delta=Event(type="text_delta", text="Let me "))
+    yield Event(type="content_block_delta", index=0, delta=Event(type="text_delta", text="check."))
+    yield Event(type="content_block_stop", index=0)
+    yield Event(
+        type="content_block_start",
+        index=1,
+        content_block=Event(type="tool_use", id="1", name="get_resource_id_by_name", input={}),
+    )
+    yield Event(type="content_block_delta", index=1, delta=Event(type="input_json_delta", partial_json='{"name": '))
+    yield Event(type="content_block_delta", index=1, delta=Event(type="input_json_delta", partial_json='"Carmen"}'))
+    yield Event(type="content_block_stop", index=1)
+    if tool_started is not None:
+        assert tool_started.wait(timeout=5), "the tool must start before the stream ends"
+    yield Event(
+        type="message_delta",
+        delta=Event(stop_reason="tool_use", stop_sequence=None),
+        usage=Event(output_tokens=20),
+    )
+    yield Event(type="message_stop")
+
+
+def _sdk_stream(stop_reason: str = "tool_use") -> Stream:
+    """Events of a streamed response parsed by the Anthropic SDK from server-sent events."""
+    events = [
+        {
+            "type": "message_start",
+            "message": {
+                "id": "msg_1",
+                "type": "message",
+                "role": "assistant",
+                "model": "claude",
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 1},
+            },
+        },
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "Let me check."}},
+        {"type": "content_block_stop", "index": 0},
+        {
+            "type": "content_block_start",
+            "index": 1,
+            "content_block": {"type": "tool_use", "id": "1", "name": "change_resource_amount", "input": {}},
+        },
+        {"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": '{"resou'}},
+        {
+            "type": "content_block_delta",
+            "index": 1,
+            "delta": {"type": "input_json_delta", "partial_json": 'rce_id": 1, "amount": 3}'},
+        },
+        {"type": "content_block_stop", "index": 1},
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+            "usage": {"output_tokens": 20},
+        },
+        {"type": "message_stop"},
+    ]
+    body = "".join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events)
+    response = httpx.Response(200, content=body.encode())
+    return Stream(cast_to=MessageStreamEvent, response=response, client=Anthropic(api_key="test"))
 
 
 class TestAnthropicConversation(unittest.TestCase):
@@ -42,3 +158,151 @@ class TestAnthropicConversation(unittest.TestCase):
                 ],
             },
         )
+
+    def test_independent_tool_blocks_scheduled_together(self):
+        blocks = [
+            _block("1", "get_resource_id_by_name", {"name": "Carmen"}),
+            _block("2", "get_resource_id_by_name", {"name": "Esmeralda"}),
+            _block("3", "change_resource_amount", {"resource_id": 1, "amount": 3}),
+            _block("4", "change_resource_amount", {"resource_id": 2, "amount": 3}),
+            _block("5", "change_resource_amount", {"resource_id": 1, "amount": 4}),
+            _block("6", "get_resource_id_by_name", {"name": "Carmen"}),
+            _block("7", "undeclared", {}),
+            _block("8", "undeclared", {}),
+        ]
+
+        batches = _schedule_tool_blocks(blocks, _make_tools())
+
+        self.assertEqual(
+            [[block.id for block in batch] for batch in batches], [["1", "2"], ["3", "4"], ["5"], ["6"], ["7"], ["8"]]
+        )
+
+    def test_invalid_tool_blocks_scheduled_alone(self):
+        blocks = [
+            _block("1", "get_resource_id_by_name", {"name": "Carmen"}),
+            _block("2", "change_resource_amount", {"amount": 3}),
+            _block("3", "unknown", {}),
+            _block("4", "get_resource_id_by_name", {"name": "Esmeralda"}),
+        ]
+        tools = _make_tools()
+
+        batches = _schedule_tool_blocks(blocks, tools)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = _run_tool_blocks_concurrently(blocks, tools, executor)
+
+        self.assertEqual([[block.id for block in batch] for batch in batches], [["1"], ["2"], ["3"], ["4"]])
+        self.assertEqual([result.is_error for result in results], [False, True, True, False])
+
+    def test_tool_blocks_run_concurrently(self):
+        tools = _make_tools(barrier=threading.Barrier(2, timeout=5))
+        blocks = [
+            _block("1", "get_resource_id_by_name", {"name": "Carmen"}),
+            _block("2", "get_resource_id_by_name", {"name": "Esmeralda"}),
+        ]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = _run_tool_blocks_concurrently(blocks, tools, executor)
+
+        self.assertEqual([result.tool_block.id for result in results], ["1", "2"])
+        self.assertEqual([result.output for result in results], ["1", "2"])
+
+    def test_message_from_stream(self):
+        texts, tool_blocks = [], []
+
+        message = _message_from_stream(_stream_events(), on_text=texts.append, on_tool_use=tool_blocks.append)
+
+        self.assertEqual(texts, ["Let me ", "check."])
+        self.assertEqual(tool_blocks, [_block("1", "get_resource_id_by_name", {"name": "Carmen"})])
+        self.assertEqual(message.stop_reason, "tool_use")
+        self.assertEqual(message.content[0], TextBlock(type="text", text="Let me check."))
+        self.assertEqual(message.content[1], tool_blocks[0])
+        self.assertEqual(message.usage.output_tokens, 20)
+
+    def test_message_from_sdk_stream(self):
+        texts, tool_blocks = [], []
+
+        message = _message_from_stream(_sdk_stream(), on_text=texts.append, on_tool_use=tool_blocks.append)
+
+        self.assertEqual(texts, ["Let me check."])
+        self.assertEqual(tool_blocks, [_block("1", "change_resource_amount", {"resource_id": 1, "amount": 3})])
+        self.assertEqual(message.content, [TextBlock(type="text", text="Let me check."), tool_blocks[0]])
+        self.assertEqual(message.stop_reason, "tool_use")
+        self.assertEqual(message.usage.output_tokens, 20)
+
+    def test_tool_starts_while_streaming(self):
+        tool_started = threading.Event()
+
+        def get_resource_id_by_name(name: str) -> int:
+            tool_started.set()
+            return {"Carmen": 1}[name]
+
+        tools = ToolRegistry(
+            [
+                declare_tool_effects(
+                    StructuredTool.from_function(get_resource_id_by_name, description="get_resource_id_by_name"),
+                    read_only=True,
+                )
+            ]
+        )
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            runner = _IncrementalToolRunner(tools, executor)
+            _message_from_stream(_stream_events(tool_started), on_text=lambda _: None, on_tool_use=runner.submit)
+            results = runner.results()
+
+        self.assertEqual([result.output for result in results], ["1"])
+
+    def test_changing_tools_wait_for_stop_reason(self):
+        calls = []
+
+        def change_resource_amount(resource_id: int, amount: int) -> bool:
+            calls.append((resource_id, amount))
+            return True
+
+        tools = ToolRegistry(
+            [
+                declare_tool_effects(
+                    StructuredTool.from_function(change_resource_amount, description="change_resource_amount"),
+                    state=lambda args: [f"resource:{args['resource_id']}"],
+                )
+            ]
+        )
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            runner = _IncrementalToolRunner(tools, executor)
+            message = _message_from_stream(_sdk_stream("max_tokens"), on_text=lambda _: None, on_tool_use=runner.submit)
+            runner.finish(message.stop_reason)
+            self.assertEqual(runner.results(), [])
+
+            runner = _IncrementalToolRunner(tools, executor)
+            message = _message_from_stream(_sdk_stream(), on_text=lambda _: None, on_tool_use=runner.submit)
+            self.assertEqual(calls, [])  # not started before the stop reason is known
+            runner.finish(message.stop_reason)
+            results = runner.results()
+
+        self.assertEqual(calls, [(1, 3)])
+        self.assertEqual([result.output for result in results], ["True"])
+
+    def test_prompt_caching(self):
+        tools = _make_tools()
+        client = ScriptedClient(
+            [
+                ToolsBetaMessage(
+                    id="msg_1",
+                    type="message",
+                    role="assistant",
+                    model="claude",
+                    content=[TextBlock(type="text", text="Done.")],
+                    stop_reason="end_turn",
+                    usage=Usage(input_tokens=10, output_tokens=2),
+                )
+            ]
+        )
+        Conversation(model="claude", tools=tools, system_instructions="You are a copilot.", client=client).run("Hi")
+
+        request = client.requests[0]
+        self.assertEqual(
+            request["system"], [{"type": "text", "text": "You are a copilot.", "cache_control": {"type": "ephemeral"}}]
+        )
+        self.assertEqual(request["tools"][-1]["cache_control"], {"type": "ephemeral"})
+        self.assertNotIn("cache_control", request["tools"][0])
+        self.assertIn("prompt-caching", request["extra_headers"]["anthropic-beta"])
+        self.assertNotIn("cache_control", format_tools(tools.tools)[-1])  # memoized definitions aren't modified
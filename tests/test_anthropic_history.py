@@ -0,0 +1,68 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import unittest
+
+from anthropic.types import TextBlock
+from anthropic.types.beta.tools import ToolUseBlock
+
+from simulation_copilot.anthropic.history import MessageHistory
+
+
+def _tool_use(block_id: str) -> dict:
+    return {
+        "role": "assistant",
+        "content": [
+            ToolUseBlock(id=block_id, input={"simulation_id": 1}, name="get_simulation_model", type="tool_use")
+        ],
+    }
+
+
+def _tool_result(block_id: str, text: str) -> dict:
+    return {
+        "role": "user",
+        "content": [{"type": "tool_result", "tool_use_id": block_id, "content": [{"type": "text", "text": text}]}],
+    }
+
+
+class TestMessageHistory(unittest.TestCase):
+    def test_token_count(self):
+        history = MessageHistory(count_tokens=len)
+        history.append({"role": "user", "content": "hello"})
+        history.append({"role": "assistant", "content": [TextBlock(type="text", text="hi")]})
+
+        self.assertEqual(history.token_count(), len("hello") + len('[{"text": "hi", "type": "text"}]'))
+
+    def test_stale_tool_results_elided(self):
+        history = MessageHistory(keep_tool_results=1, elided_result_chars=10)
+        history.append({"role": "user", "content": "What if?"})
+        for i in range(3):
+            history.append(_tool_use(str(i)))
+            history.append(_tool_result(str(i), f"SimulationModel(id={i}) " + "x" * 1000))
+
+        texts = [message["content"][0]["content"][0]["text"] for message in history.messages[2::2]]
+        self.assertTrue(texts[0].startswith("Simulation... [1012 characters"))
+        self.assertTrue(texts[1].startswith("Simulation... [1012 characters"))
+        self.assertEqual(texts[2], "SimulationModel(id=2) " + "x" * 1000)
+        self.assertEqual([message["content"][0]["tool_use_id"] for message in history.messages[2::2]], ["0", "1", "2"])
+
+    def test_short_tool_results_kept(self):
+        history = MessageHistory(keep_tool_results=0)
+        history.append({"role": "user", "content": "Create a calendar"})
+        history.append(_tool_use("1"))
+        history.append(_tool_result("1", "42"))
+
+        self.assertEqual(history.messages[2], _tool_result("1", "42"))
+
+    def test_token_budget(self):
+        history = MessageHistory(token_budget=100, count_tokens=len)
+        history.append({"role": "user", "content": "What if?"})
+        for i in range(10):
+            history.append(_tool_use(str(i)))
+            history.append(_tool_result(str(i), "x" * 10))
+
+        self.assertEqual(history.messages[0], {"role": "user", "content": "What if?"})
+        self.assertEqual([message["role"] for message in history.messages], ["user", "assistant", "user"])
+        self.assertEqual(history.messages[-1], _tool_result("9", "x" * 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
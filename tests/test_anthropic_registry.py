@@ -0,0 +1,94 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import contextlib
+import io
+import unittest
+
+from anthropic.types import TextBlock, Usage
+from anthropic.types.beta.tools import ToolsBetaMessage, ToolUseBlock
+from langchain_core.tools import StructuredTool
+
+from simulation_copilot.anthropic import Conversation, MessageHistory, ScriptedClient, ToolRegistry
+
+
+def _tools() -> list[StructuredTool]:
+    def change_resource_amount(resource_id: int, amount: int) -> bool:
+        return resource_id > 0 and amount > 0
+
+    def get_resource_id_by_name(name: str) -> int:
+        return {"Carmen": 1}[name]
+
+    return [
+        StructuredTool.from_function(change_resource_amount, description="Changes the amount of the resource."),
+        StructuredTool.from_function(get_resource_id_by_name, description="Returns the ID of the resource."),
+    ]
+
+
+def _response(content: list, stop_reason: str) -> ToolsBetaMessage:
+    return ToolsBetaMessage(
+        id="msg",
+        type="message",
+        role="assistant",
+        model="claude",
+        content=content,
+        stop_reason=stop_reason,
+        usage=Usage(input_tokens=10, output_tokens=5),
+    )
+
+
+class TestToolRegistry(unittest.TestCase):
+    def test_lookup(self):
+        registry = ToolRegistry(_tools())
+
+        self.assertEqual(registry.get("get_resource_id_by_name").name, "get_resource_id_by_name")
+        self.assertIsNone(registry.get("unknown"))
+        self.assertIn("change_resource_amount", registry)
+        self.assertEqual(len(registry), 2)
+        self.assertEqual([schema["name"] for schema in registry.schemas], [tool.name for tool in registry])
+
+    def test_duplicate_names(self):
+        with self.assertRaises(ValueError):
+            ToolRegistry(_tools() + _tools()[:1])
+
+    def test_validate(self):
+        registry = ToolRegistry(_tools())
+
+        self.assertIsNone(registry.validate("change_resource_amount", {"resource_id": 1, "amount": 2}))
+        self.assertIn("Unknown tool", registry.validate("remove_resource", {}))
+        error = registry.validate("change_resource_amount", {"resource_id": "one"})
+        self.assertIn("resource_id", error)
+        self.assertIn("amount", error)
+
+    def test_invalid_calls_are_reported_to_the_model(self):
+        client = ScriptedClient(
+            [
+                _response(
+                    [
+                        ToolUseBlock(id="tool_1", name="remove_resource", input={"id": 1}, type="tool_use"),
+                        ToolUseBlock(
+                            id="tool_2", name="change_resource_amount", input={"resource_id": 1}, type="tool_use"
+                        ),
+                        ToolUseBlock(
+                            id="tool_3",
+                            name="change_resource_amount",
+                            input={"resource_id": 1, "amount": 2},
+                            type="tool_use",
+                        ),
+                    ],
+                    "tool_use",
+                ),
+                _response([TextBlock(type="text", text="Done.")], "end_turn"),
+            ]
+        )
+        conversation = Conversation(
+            model="claude", tools=_tools(), client=client, history=MessageHistory(), parallel_tool_calls=True
+        )
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            conversation.run("Change the amount of resource 1 to 2.")
+
+        results = client.requests[1]["messages"][-1]["content"]
+        self.assertEqual([result["tool_use_id"] for result in results], ["tool_1", "tool_2", "tool_3"])
+        self.assertEqual([result.get("is_error") for result in results], [True, True, None])
+        self.assertIn("Unknown tool remove_resource", results[0]["content"][0]["text"])
+        self.assertIn("amount", results[1]["content"][0]["text"])
+        self.assertEqual(results[2]["content"][0]["text"], "True")
@@ -0,0 +1,111 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import asyncio
+import os
+import tempfile
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy as sa
+from sqlalchemy.pool import StaticPool
+
+from simulation_copilot.database import (
+    create_async_engine,
+    create_engine,
+    create_tables,
+    get_session,
+    remove_session,
+    session_scope,
+)
+from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
+
+
+class TestDatabase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+
+    def test_session_per_thread(self):
+        def session_in_thread():
+            try:
+                return id(get_session())
+            finally:
+                remove_session()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            thread_session_id = executor.submit(session_in_thread).result()
+
+        self.assertIs(get_session(), get_session())
+        self.assertNotEqual(id(get_session()), thread_session_id)
+
+    def test_in_memory_database_shared_between_threads(self):
+        with session_scope() as session:
+            model_id = ProsimosRelationalService(session).create_simulation_model().id
+
+        def get_model_in_thread(model_id: int):
+            with session_scope() as session:
+                return ProsimosRelationalService(session).get_simulation_model(model_id) is not None
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertTrue(executor.submit(get_model_in_thread, model_id).result())
+
+        with session_scope() as session:
+            ProsimosRelationalService(session).delete_simulation_model(model_id)
+
+    def test_session_scope_rollback(self):
+        with self.assertRaises(RuntimeError):
+            with session_scope() as session:
+                model_id = ProsimosRelationalService(session).create_simulation_model().id
+                session.execute(sa.text("DELETE FROM simulation_model"))
+                raise RuntimeError()
+
+        with session_scope() as session:
+            self.assertIsNotNone(ProsimosRelationalService(session).get_simulation_model(model_id))
+            ProsimosRelationalService(session).delete_simulation_model(model_id)
+
+    def test_sqlite_file_wal(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(f"sqlite:///{tmp_dir}/test.db")
+            with engine.connect() as connection:
+                self.assertEqual(connection.execute(sa.text("PRAGMA journal_mode")).scalar(), "wal")
+            engine.dispose()
+
+    def test_in_memory_engine_warns_on_concurrent_use(self):
+        engine = create_engine("sqlite://")
+
+        def transaction_in_thread():
+            with engine.begin() as connection:
+                connection.execute(sa.text("SELECT 1"))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with engine.begin():
+                with self.assertWarns(RuntimeWarning):
+                    executor.submit(transaction_in_thread).result()
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                executor.submit(transaction_in_thread).result()  # one transaction at a time is fine
+        engine.dispose()
+
+    def test_file_engine_connection_per_thread(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(f"sqlite:///{tmp_dir}/test.db")
+            with engine.connect() as connection, ThreadPoolExecutor(max_workers=1) as executor:
+                other = executor.submit(lambda: engine.raw_connection().dbapi_connection).result()
+                self.assertIsNot(other, connection.connection.dbapi_connection)
+            engine.dispose()
+
+    def test_async_engine_configured_as_sync_engine(self):
+        async def journal_mode(engine) -> str:
+            async with engine.connect() as connection:
+                mode = (await connection.execute(sa.text("PRAGMA journal_mode"))).scalar()
+            await engine.dispose()
+            return mode
+
+        self.assertIsInstance(create_async_engine("sqlite://").pool, StaticPool)  # shared as by the sync engine
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertEqual(asyncio.run(journal_mode(create_async_engine(f"sqlite:///{tmp_dir}/test.db"))), "wal")
+
+
+if __name__ == "__main__":
+    unittest.main()
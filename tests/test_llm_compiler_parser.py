@@ -0,0 +1,96 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import sys
+import unittest
+from pathlib import Path
+
+from langchain_core.tools import StructuredTool
+
+sys.path.append(str(Path(__file__).parent.parent / "src/cli/sql_approach"))  # the CLI modules aren't a package
+
+# pylint: disable=wrong-import-position
+from llm_compiler_parser import LLMCompilerPlanParser, _parse_llm_compiler_action_args  # noqa: E402
+
+
+def _tools() -> list[StructuredTool]:
+    def get_resource_id_by_name(name: str) -> int:
+        return len(name)
+
+    def add_resource_to_profile(profile_id: int, name: str, amount: int, calendar_ids: list[int]) -> bool:
+        return bool(profile_id and name and amount and calendar_ids)
+
+    return [
+        StructuredTool.from_function(get_resource_id_by_name, description="Returns the ID of the resource."),
+        StructuredTool.from_function(add_resource_to_profile, description="Adds a resource to the profile."),
+    ]
+
+
+_PLAN = """Thought: I need the ID of the resource first.
+1. get_resource_id_by_name(name="Carmen, Finacse")
+2. add_resource_to_profile(profile_id=$1, name="Clerk (\\"senior\\")", amount=2, calendar_ids=[1, ${1}])
+3. join()
+<END_OF_PLAN>"""
+
+
+class TestLLMCompilerParser(unittest.TestCase):
+    def setUp(self):
+        self.tools = _tools()
+        self.add_resource = self.tools[1]
+
+    def test_quoted_commas_and_escapes(self):
+        args = _parse_llm_compiler_action_args(
+            """1, 'Clerk, "senior"', 2, ["a,b", 'it\\'s, fine']""", self.add_resource
+        )
+
+        self.assertEqual(
+            args, {"profile_id": 1, "name": 'Clerk, "senior"', "amount": 2, "calendar_ids": ["a,b", "it's, fine"]}
+        )
+
+    def test_nested_brackets(self):
+        args = _parse_llm_compiler_action_args(
+            'profile_id=1, name="A", amount=(1, 2), calendar_ids=[{"a": [1, 2]}, (3, 4)]', self.add_resource
+        )
+
+        self.assertEqual(args["amount"], (1, 2))
+        self.assertEqual(args["calendar_ids"], [{"a": [1, 2]}, (3, 4)])
+
+    def test_positional_and_keyword_arguments(self):
+        args = _parse_llm_compiler_action_args('7, "Clerk", calendar_ids=[1], amount=3', self.add_resource)
+
+        self.assertEqual(args, {"profile_id": 7, "name": "Clerk", "amount": 3, "calendar_ids": [1]})
+
+    def test_unknown_keywords_are_dropped(self):
+        args = _parse_llm_compiler_action_args('name="Carmen", color="red", comparison=1 == 1', self.tools[0])
+
+        self.assertEqual(args, {"name": "Carmen"})
+
+    def test_references_are_kept_as_strings(self):
+        args = _parse_llm_compiler_action_args('profile_id=$1, name="${2}", amount=$3', self.add_resource)
+
+        self.assertEqual(args, {"profile_id": "$1", "name": "${2}", "amount": "$3"})
+
+    def test_parse_plan(self):
+        tasks = LLMCompilerPlanParser(tools=self.tools).parse(_PLAN)
+
+        self.assertEqual([task["idx"] for task in tasks], [1, 2, 3])
+        self.assertEqual(tasks[0]["thought"], "I need the ID of the resource first.")
+        self.assertEqual(tasks[0]["args"], {"name": "Carmen, Finacse"})
+        # a value with a reference isn't a Python literal, so it's kept as a string for the scheduler to resolve
+        self.assertEqual(
+            tasks[1]["args"], {"profile_id": "$1", "name": 'Clerk ("senior")', "amount": 2, "calendar_ids": "[1, ${1}]"}
+        )
+        self.assertEqual(tasks[1]["dependencies"], [1])
+        self.assertEqual(tasks[2]["tool"], "join")
+        self.assertEqual(tasks[2]["dependencies"], [1, 2])
+
+    def test_tokens_split_mid_line(self):
+        parser = LLMCompilerPlanParser(tools=self.tools)
+        expected = parser.parse(_PLAN)
+
+        for token_size in (1, 3, 7):
+            tokens = [_PLAN[i : i + token_size] for i in range(0, len(_PLAN), token_size)]
+            with self.subTest(token_size=token_size):
+                self.assertEqual(list(parser.transform(iter(tokens))), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from langchain_core.tools import StructuredTool
+
+from simulation_copilot.anthropic import declare_tool_effects
+
+sys.path.append(str(Path(__file__).parent.parent / "src/cli/sql_approach"))  # the CLI modules aren't a package
+
+# pylint: disable=wrong-import-position
+from llm_compiler_parser import Task  # noqa: E402
+from llm_compiler_scheduler import schedule_tasks  # noqa: E402
+
+
+def _task(idx: int, tool, args: dict, dependencies: list = ()) -> Task:
+    return Task(idx=idx, tool=tool, args=args, dependencies=list(dependencies), thought=None)
+
+
+class _Tools:
+    """
+    Stub tools recording their calls and how many of them run at the same time. A barrier makes calls fail unless
+    they run at the same time, a delay gives other calls time to start.
+    """
+
+    def __init__(self, barrier: threading.Barrier = None, delay: float = 0):
+        self.calls = []
+        self.barrier = barrier
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+        def get_resource_id_by_name(name: str) -> int:
+            self._call("get_resource_id_by_name", name)
+            return {"Carmen": 1, "Esmeralda": 2}[name]
+
+        def change_resource_amount(resource_id: int, amount: int) -> bool:
+            self._call("change_resource_amount", resource_id, amount)
+            return True
+
+        def describe(text: str) -> str:
+            self._call("describe", text)
+            return text
+
+        self.get_resource_id_by_name = declare_tool_effects(
+            StructuredTool.from_function(get_resource_id_by_name, description="get_resource_id_by_name"),
+            read_only=True,
+        )
+        self.change_resource_amount = declare_tool_effects(
+            StructuredTool.from_function(change_resource_amount, description="change_resource_amount"),
+            state=lambda args: [f"resource:{args['resource_id']}"],
+        )
+        self.describe = declare_tool_effects(StructuredTool.from_function(describe, description="describe"), state=[])
+
+    def _call(self, *call):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if self.barrier is not None:
+                self.barrier.wait()
+            time.sleep(self.delay)
+            with self._lock:
+                self.calls.append(call)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+class TestLLMCompilerScheduler(unittest.TestCase):
+    def test_dependencies_run_first(self):
+        tools = _Tools()
+        tasks = [
+            _task(1, tools.get_resource_id_by_name, {"name": "Esmeralda"}),
+            _task(2, tools.change_resource_amount, {"resource_id": "$1", "amount": 3}, dependencies=[1]),
+            _task(3, "join", {}, dependencies=[1, 2]),
+        ]
+
+        results = schedule_tasks(tasks)
+
+        self.assertEqual(tools.calls, [("get_resource_id_by_name", "Esmeralda"), ("change_resource_amount", 2, 3)])
+        self.assertEqual([(task["idx"], result) for task, result in results], [(1, 2), (2, True), (3, "join")])
+
+    def test_references_are_replaced(self):
+        tools = _Tools()
+        tasks = [
+            _task(1, tools.get_resource_id_by_name, {"name": "Carmen"}),
+            _task(2, tools.describe, {"text": "Resource ${1} and $3"}, dependencies=[1]),
+        ]
+
+        results = schedule_tasks(tasks, observations={3: "the observation"})
+
+        self.assertEqual(results[1][1], "Resource 1 and the observation")
+
+    def test_reference_keeps_type(self):
+        tools = _Tools()
+        tasks = [
+            _task(1, tools.get_resource_id_by_name, {"name": "Carmen"}),
+            _task(2, tools.change_resource_amount, {"resource_id": " $1 ", "amount": 3}, dependencies=[1]),
+        ]
+
+        schedule_tasks(tasks)
+
+        # a reference as the whole argument keeps the type of the result
+        self.assertEqual(tools.calls[1], ("change_resource_amount", 1, 3))
+        self.assertIsInstance(tools.calls[1][1], int)
+
+    def test_independent_tasks_run_concurrently(self):
+        tools = _Tools(barrier=threading.Barrier(2, timeout=5))
+        tasks = [
+            _task(1, tools.get_resource_id_by_name, {"name": "Carmen"}),
+            _task(2, tools.get_resource_id_by_name, {"name": "Esmeralda"}),
+        ]
+
+        results = schedule_tasks(tasks, max_workers=2)
+
+        self.assertEqual([result for _, result in results], [1, 2])
+
+    def test_failed_task_results_in_error(self):
+        tools = _Tools()
+        tasks = [
+            _task(1, tools.get_resource_id_by_name, {"name": "Nobody"}),
+            _task(2, tools.describe, {"text": "$1"}, dependencies=[1]),
+        ]
+
+        results = schedule_tasks(tasks)
+
+        error = results[0][1]
+        self.assertTrue(error.startswith("ERROR(Failed to call get_resource_id_by_name with args {'name': 'Nobody'}"))
+        self.assertIn("KeyError", error)
+        self.assertEqual(results[1][1], error)  # the planner sees the error in the dependent task too
+
+    def test_tasks_changing_the_same_state_run_in_order(self):
+        tools = _Tools(delay=0.05)
+        tasks = [
+            _task(1, tools.change_resource_amount, {"resource_id": 1, "amount": 3}),
+            _task(2, tools.change_resource_amount, {"resource_id": 1, "amount": 4}),
+            _task(3, tools.change_resource_amount, {"resource_id": 1, "amount": 5}),
+        ]
+
+        schedule_tasks(tasks, max_workers=3)
+
+        self.assertEqual(tools.max_running, 1)
+        self.assertEqual([call[2] for call in tools.calls], [3, 4, 5])
+
+    def test_tasks_changing_different_state_run_concurrently(self):
+        tools = _Tools(barrier=threading.Barrier(2, timeout=5))
+        tasks = [
+            _task(1, tools.change_resource_amount, {"resource_id": 1, "amount": 3}),
+            _task(2, tools.change_resource_amount, {"resource_id": 2, "amount": 3}),
+        ]
+
+        results = schedule_tasks(tasks, max_workers=2)
+
+        self.assertEqual([result for _, result in results], [True, True])
+
+    def test_unknown_state_runs_after_changes(self):
+        tools = _Tools(delay=0.05)
+        tasks = [
+            _task(1, tools.change_resource_amount, {"resource_id": 1, "amount": 3}),
+            # the state depends on the result of a previous plan, so it can't be checked against task 1 in advance
+            _task(2, tools.change_resource_amount, {"resource_id": "$5", "amount": 4}),
+        ]
+
+        schedule_tasks(tasks, observations={5: 2}, max_workers=2)
+
+        self.assertEqual(tools.max_running, 1)
+        self.assertEqual(tools.calls, [("change_resource_amount", 1, 3), ("change_resource_amount", 2, 4)])
+
+    def test_invalid_arguments_result_in_error(self):
+        tools = _Tools()
+        tasks = [
+            _task(1, tools.change_resource_amount, {"resource_id": 1, "amount": 3}),
+            _task(2, tools.change_resource_amount, {"amount": 4}),
+        ]
+
+        results = schedule_tasks(tasks, max_workers=2)  # the state of task 2 can't be computed
+
+        self.assertEqual(results[0][1], True)
+        self.assertTrue(results[1][1].startswith("ERROR(Failed to call change_resource_amount"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
+import os
+import unittest
+from pathlib import Path
+
+from simulation_copilot.database import create_tables, Session
+from simulation_copilot.performance_report import PerformanceReport
+from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.prosimos_utils import run_prosimos
+
+_TEST_DATA = Path(__file__).parent / "test_data/PurchasingExample"
+
+
+class TestPerformanceReport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+        cls.process_path = _TEST_DATA / "process.bpmn"
+        with (_TEST_DATA / "simulation.json").open("r") as f:
+            model = json.load(f)
+        with Session() as session:
+            cls.model_id = create_simulation_model_from_pix(session, model, cls.process_path, bulk=True).id
+        cls.report = run_prosimos(cls.model_id, cls.process_path, total_cases=50, seed=1)
+
+    def test_from_prosimos(self):
+        report = PerformanceReport.from_prosimos(self.report)
+
+        self.assertEqual(len(report.resource_utilization), 27)
+        self.assertIn("Carmen Finacse", report.resource_utilization.index)
+        self.assertIn("Create Purchase Order", report.task_statistics.index)
+        self.assertGreater(report.overall_statistics.loc["cycle_time", "Average"], 0)
+        self.assertEqual(
+            list(report.kpis().index),
+            ["cycle_time", "processing_time", "waiting_time", "idle_time", "resource_utilization", "cost"],
+        )
+
+    def test_changes_from_itself_are_empty(self):
+        report = PerformanceReport.from_prosimos(self.report)
+
+        self.assertEqual(report.changes_from(report).strip(), "Metric,Baseline,New,Change,Relative Change")
+
+    def test_changes_from_baseline(self):
+        with Session() as session:
+            service = ProsimosRelationalService(session)
+            resource = service.repository.resource.get_by_name("Carmen Finacse")
+            resource.amount = 3
+            session.commit()
+        try:
+            new_report = run_prosimos(self.model_id, self.process_path, total_cases=50, seed=1)
+        finally:
+            with Session() as session:
+                ProsimosRelationalService(session).repository.resource.get_by_name("Carmen Finacse").amount = 1
+                session.commit()
+        baseline = PerformanceReport.from_prosimos(self.report)
+
+        comparison = PerformanceReport.from_prosimos(new_report).compare(baseline)
+        changes = PerformanceReport.from_prosimos(new_report).changes_from(baseline)
+
+        self.assertIn("utilization of Carmen Finacse", comparison.index)
+        self.assertAlmostEqual(
+            comparison.loc["cycle_time", "Change"],
+            comparison.loc["cycle_time", "New"] - comparison.loc["cycle_time", "Baseline"],
+        )
+        self.assertLess(len(changes), len(baseline.resource_utilization_and_overall_statistics()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pix_framework.io.bpmn import get_activities_ids_by_name_from_bpmn
+
+from simulation_copilot.prosimos_model.process_model import get_process_model
+
+_PROCESS_PATH = Path(__file__).parent / "test_data/PurchasingExample/process.bpmn"
+_GATEWAY_ID = "node_59294c46-2e2b-452a-9b5b-824f443d4f45"
+
+
+class TestProcessModel(unittest.TestCase):
+    def test_activities(self):
+        model = get_process_model(_PROCESS_PATH)
+
+        self.assertEqual(dict(model.activity_ids_by_name), get_activities_ids_by_name_from_bpmn(_PROCESS_PATH))
+        activity_id = model.activity_ids_by_name["Pay Invoice"]
+        self.assertEqual(model.activity_names_by_id[activity_id], "Pay Invoice")
+        with self.assertRaises(TypeError):
+            model.activity_ids_by_name["Pay Invoice"] = "node"  # shared models are read-only
+
+    def test_gateways_and_flows(self):
+        model = get_process_model(_PROCESS_PATH)
+
+        gateway = model.gateways[_GATEWAY_ID]
+        self.assertEqual(gateway.type, "exclusiveGateway")
+        self.assertTrue(gateway.is_split())
+        self.assertEqual(
+            model.successors(_GATEWAY_ID), [model.sequence_flows[flow_id].target_id for flow_id in gateway.outgoing]
+        )
+        for flow_id in gateway.incoming:
+            self.assertIn(model.sequence_flows[flow_id].source_id, model.predecessors(_GATEWAY_ID))
+        self.assertEqual(model.successors("unknown"), [])
+
+    def test_cached_until_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "process.bpmn"
+            shutil.copy(_PROCESS_PATH, path)
+
+            first = get_process_model(path)
+            self.assertIs(get_process_model(str(path)), first)
+
+            content = path.read_text().replace('name="Pay Invoice"', 'name="Pay the Invoice"')
+            path.write_text(content)
+            os.utime(path, ns=(0, 0))  # a different modification time even on coarse file system clocks
+
+            second = get_process_model(path)
+            self.assertIsNot(second, first)
+            self.assertIn("Pay the Invoice", second.activity_ids_by_name)
@@ -0,0 +1,69 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import unittest
+
+from simulation_copilot.database import create_tables_async, dispose_async_engine, get_async_sessionmaker
+from simulation_copilot.prosimos_relational_async_service import AsyncProsimosRelationalService
+
+
+class TestAsyncProsimosRelationalService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # the engine is bound to the event loop, which is new for every test
+        await create_tables_async()
+        self.session = get_async_sessionmaker()()
+        self.service = AsyncProsimosRelationalService(self.session)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await dispose_async_engine()
+
+    async def test_create_resource_profile_with_resources_ok(self):
+        model = await self.service.create_simulation_model()
+        calendar = await self.service.create_calendar_with_intervals(
+            [{"start_day": "Monday", "end_day": "Friday", "start_hour": 8, "end_hour": 17}]
+        )
+        await self.service.create_gateway_with_sequence_flows(
+            model.id, "gateway1", [{"bpmn_id": "flow1", "probability": 1.0}]
+        )
+        await self.service.create_resource_profile_with_resources(
+            model_id=model.id,
+            name="profile1",
+            resources=[
+                {
+                    "name": "resource1",
+                    "bpmn_id": "resource1",
+                    "amount": 2,
+                    "calendar_id": calendar.id,
+                    "activity_distributions": [
+                        {
+                            "activity_name": "task1",
+                            "activity_bpmn_id": "task1",
+                            "distribution": {"name": "fixed", "parameters": [{"name": "mean", "value": 0.5}]},
+                        }
+                    ],
+                }
+            ],
+        )
+
+        sql_model = await self.service.get_simulation_model_with_relationships(model.id)
+
+        self.assertEqual(sql_model.gateways[0].outgoing_sequence_flows[0].bpmn_id, "flow1")
+        resource = sql_model.resource_profiles[0].resources[0]
+        self.assertEqual(resource.amount, 2)
+        self.assertEqual(len(resource.calendar.intervals), 1)
+        self.assertEqual(resource.assigned_activities[0].activity.bpmn_id, "task1")
+        self.assertEqual(resource.assigned_activities[0].distribution.parameters[0].value, 0.5)
+
+        await self.service.delete_simulation_model(model.id)
+        await self.service.delete_calendar(calendar.id)
+
+    async def test_unit_of_work_rollback(self):
+        with self.assertRaises(ValueError):
+            async with self.service.unit_of_work():
+                model = await self.service.create_simulation_model()
+                await self.service.create_case_arrival(model.id, -1, -1)  # fails, calendar doesn't exist
+
+        self.assertIsNone(await self.service.get_simulation_model(model.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,8 @@
 import os
 import unittest
 
+import sqlalchemy as sa
+
 from simulation_copilot.database import create_tables, Session
 from simulation_copilot.prosimos_relational_repository import (
     ProsimosRelationalRepository,
@@ -125,6 +127,38 @@ class TestProsimosRelationalRepository(unittest.TestCase):
         self.assertEqual(resource_profile.resources[0], resource)
         self.assertEqual(profile.resources[0], resource)
 
+    def test_unit_of_work_commits_once(self):
+        commits = []
+
+        def count_commit(_):
+            commits.append(1)
+
+        sa.event.listen(self.session, "after_commit", count_commit)
+        try:
+            with self.repository.unit_of_work():
+                distribution = self.repository.distribution.create("normal")
+                self.repository.distribution.add_parameter(distribution.id, "mean", 1)
+                self.repository.distribution.add_parameter(distribution.id, "std", 0.5)
+                self.assertEqual(commits, [])
+                self.assertIsNotNone(distribution.id)
+        finally:
+            sa.event.remove(self.session, "after_commit", count_commit)
+
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(len(self.repository.distribution.get(distribution.id).parameters), 2)
+
+    def test_unit_of_work_rollback(self):
+        with self.assertRaises(ValueError):
+            with self.repository.unit_of_work():
+                model = self.repository.simulation_model.create()
+                model_id = model.id
+                with self.repository.unit_of_work():  # nested unit joins the outer one
+                    self.repository.gateway.create(model_id, "bpmn_id")
+                self.repository.gateway.add_sequence_flow(-1, "bpmn_id", 0.5)  # fails, gateway doesn't exist
+
+        self.assertFalse(self.repository.in_unit_of_work())
+        self.assertIsNone(self.repository.simulation_model.get(model_id))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,9 +1,14 @@
 # pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
 import os
 import unittest
+from pathlib import Path
 
 from simulation_copilot.database import Session, create_tables
+from simulation_copilot.prosimos_relational_model import Calendar, Distribution
 from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.relational_to_prosimos_adapter import create_simulation_model_from_relational_data
 
 
 # Set TESTING environment variable to "true" when running tests.
@@ -133,9 +138,9 @@ class TestProsimosRelationalService(unittest.TestCase):
         self.assertEqual(case_arrival.inter_arrival_distribution_id, distribution.id)
         self.assertEqual(case_arrival.simulation_model_id, model.id)
 
+        self.service.delete_case_arrival(case_arrival.id)
         self.service.delete_calendar(calendar.id)
         self.service.delete_distribution(distribution.id)
-        self.service.delete_case_arrival(case_arrival.id)
         self.service.delete_simulation_model(model.id)
 
     def test_create_case_arrival_errors(self):
@@ -197,12 +202,141 @@ class TestProsimosRelationalService(unittest.TestCase):
         self.assertEqual(activity_distribution.resource_id, resource.id)
         self.assertEqual(activity_distribution.distribution_id, distribution.id)
 
-        self.service.delete_calendar(calendar.id)
+        self.service.delete_activity_resource_distribution(activity_distribution.id)
         self.service.delete_activity(activity.id)
         self.service.delete_resource(resource.id)
+        self.service.delete_calendar(calendar.id)
         self.service.delete_distribution(distribution.id)
-        self.service.delete_activity_resource_distribution(activity_distribution.id)
 
     def test_create_activity_resource_distribution_error(self):
         with self.assertRaises(ValueError):
             self.service.create_activity_resource_distribution(1, 1, 1)
+
+    def test_create_resource_profile_with_resources_rollback(self):
+        model = self.service.create_simulation_model()
+        calendar = self.service.create_calendar_with_intervals(
+            intervals=[{"start_day": "Monday", "end_day": "Tuesday", "start_hour": 0, "end_hour": 1}]
+        )
+        resource = {"bpmn_id": "bpmn_id", "name": "A", "amount": 1, "calendar_id": calendar.id}
+        with self.assertRaises(KeyError):  # the second resource misses activity distributions
+            self.service.create_resource_profile_with_resources(
+                model_id=model.id,
+                name="profile_1",
+                resources=[resource | {"activity_distributions": []}, resource],
+            )
+
+        self.assertEqual(self.service.get_simulation_model(model.id).resource_profiles, [])
+        self.assertIsNone(self.service.repository.resource.get_by_name("A"))
+
+        self.service.delete_calendar(calendar.id)
+        self.service.delete_simulation_model(model.id)
+
+    def _import_model(self):
+        data_dir = Path(__file__).parent / "test_data/PurchasingExample"
+        with (data_dir / "simulation.json").open("r") as f:
+            model = json.load(f)
+        # calendars and distributions outlive simulation models, other tests expect an empty database
+        self.addCleanup(self.service.repository.simulation_model.delete_all)
+        return create_simulation_model_from_pix(self.session, model, data_dir / "process.bpmn", bulk=True)
+
+    def _resources(self, model_id: int) -> list:
+        model = self.service.get_simulation_model(model_id)
+        return [resource for profile in model.resource_profiles for resource in profile.resources]
+
+    def test_clone_simulation_model_ok(self):
+        original_id = self._import_model().id
+        calendars = self.session.query(Calendar).count()
+        distributions = self.session.query(Distribution).count()
+
+        clone = self.service.clone_simulation_model(original_id)
+
+        # calendars and distributions are shared, not copied
+        self.assertEqual(self.session.query(Calendar).count(), calendars)
+        self.assertEqual(self.session.query(Distribution).count(), distributions)
+        original = create_simulation_model_from_relational_data(self.session, original_id)
+        cloned = create_simulation_model_from_relational_data(self.session, clone.id)
+        self.assertEqual(cloned.case_arrival_model.inter_arrival_times, original.case_arrival_model.inter_arrival_times)
+        self.assertEqual(cloned.gateway_probabilities, original.gateway_probabilities)
+        self.assertEqual(
+            [(r.name, r.amount, r.calendar_id) for r in self._resources(clone.id)],
+            [(r.name, r.amount, r.calendar_id) for r in self._resources(original_id)],
+        )
+
+        # resources are copied, so changing the clone doesn't change the original
+        cloned_resource = self._resources(clone.id)[0]
+        cloned_resource.amount += 10
+        self.session.commit()
+        self.assertNotEqual(self._resources(original_id)[0].amount, cloned_resource.amount)
+
+        self.service.delete_simulation_model(clone.id)
+        self.assertEqual(self.session.query(Distribution).count(), distributions)
+
+    def test_get_resource_by_name_in_clone(self):
+        original_id = self._import_model().id
+        clone = self.service.clone_simulation_model(original_id)
+        name = self._resources(original_id)[0].name
+
+        resource = self.service.repository.resource.get_by_name(name, model_id=clone.id)
+
+        self.assertIn(resource.id, [r.id for r in self._resources(clone.id)])
+        self.assertNotIn(resource.id, [r.id for r in self._resources(original_id)])
+        self.assertIsNone(self.service.repository.resource.get_by_name(name, model_id=-1))
+
+    def test_clone_simulation_model_error(self):
+        with self.assertRaises(ValueError):
+            self.service.clone_simulation_model(-1)
+
+    def test_delete_shared_rows_through_clone(self):
+        original_id = self._import_model().id
+        clone = self.service.clone_simulation_model(original_id)
+        cloned_resource = self._resources(clone.id)[0]
+        cloned_assigned = cloned_resource.assigned_activities[0]
+        process_path = Path(__file__).parent / "test_data/PurchasingExample/process.bpmn"
+        original = create_simulation_model_from_relational_data(self.session, original_id)
+        expected = original.to_prosimos_format(process_model=process_path)
+
+        with self.assertRaises(ValueError):
+            self.service.delete_distribution(cloned_assigned.distribution_id)
+        with self.assertRaises(ValueError):
+            self.service.delete_calendar(cloned_resource.calendar_id)
+        with self.assertRaises(ValueError):
+            self.service.delete_activity(cloned_assigned.activity_id)
+
+        self.session.expire_all()
+        original = create_simulation_model_from_relational_data(self.session, original_id)
+        self.assertEqual(original.to_prosimos_format(process_model=process_path), expected)
+
+    def test_change_shared_activity_distribution_copies_on_write(self):
+        original_id = self._import_model().id
+        clone = self.service.clone_simulation_model(original_id)
+        original_assigned = self._resources(original_id)[0].assigned_activities[0]
+        cloned_assigned = self._resources(clone.id)[0].assigned_activities[0]
+        shared_id = original_assigned.distribution_id
+        self.assertEqual(cloned_assigned.distribution_id, shared_id)
+
+        distribution = self.service.change_activity_distribution(
+            cloned_assigned.id, "fixed", [{"name": "mean", "value": 60.0}]
+        )
+
+        self.assertEqual(cloned_assigned.distribution_id, distribution.id)
+        self.assertEqual(original_assigned.distribution_id, shared_id)
+        self.assertIsNotNone(self.service.get_distribution(shared_id))  # still used by the original
+
+        # the distribution isn't shared anymore, so it's deleted when replaced
+        self.service.change_activity_distribution(cloned_assigned.id, "fixed", [{"name": "mean", "value": 30.0}])
+        self.assertIsNone(self.service.get_distribution(distribution.id))
+
+    def test_change_shared_resource_calendar_copies_on_write(self):
+        original_id = self._import_model().id
+        clone = self.service.clone_simulation_model(original_id)
+        original_resource = self._resources(original_id)[0]
+        cloned_resource = self._resources(clone.id)[0]
+        shared_id = original_resource.calendar_id
+
+        calendar = self.service.change_resource_calendar(
+            cloned_resource.id, [{"start_day": "Monday", "end_day": "Friday", "start_hour": 9, "end_hour": 17}]
+        )
+
+        self.assertEqual(cloned_resource.calendar_id, calendar.id)
+        self.assertEqual(original_resource.calendar_id, shared_id)
+        self.assertIsNotNone(self.service.get_calendar(shared_id))
@@ -0,0 +1,73 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from anthropic.types.beta.tools import ToolUseBlock
+
+from simulation_copilot.anthropic.conversation import _run_tool_blocks_concurrently, _schedule_tool_blocks
+from simulation_copilot.anthropic.registry import ToolRegistry
+from simulation_copilot.database import create_tables, session_scope
+from simulation_copilot.prosimos_relational_model import Calendar, Distribution
+from simulation_copilot.tools.prosimos_relational_tools import create_calendar_with_intervals, create_distribution
+
+_INTERVAL = {"start_day": "Monday", "end_day": "Friday", "start_hour": 9, "end_hour": 17}
+
+
+def _blocks(calendar_interval: dict) -> list[ToolUseBlock]:
+    return [
+        ToolUseBlock(
+            id="1",
+            input={"name": "fixed", "parameters": [{"name": "mean", "value": 60.0}]},
+            name="create_distribution",
+            type="tool_use",
+        ),
+        ToolUseBlock(
+            id="2",
+            input={"intervals": [calendar_interval]},
+            name="create_calendar_with_intervals",
+            type="tool_use",
+        ),
+    ]
+
+
+def _counts() -> tuple[int, int]:
+    with session_scope() as session:
+        return session.query(Calendar).count(), session.query(Distribution).count()
+
+
+class TestProsimosRelationalTools(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+
+    def setUp(self):
+        self.tools = ToolRegistry([create_calendar_with_intervals, create_distribution])
+
+    def test_writers_run_alone_on_shared_connection(self):
+        for shared, expected in ((False, [["1", "2"]]), (True, [["1"], ["2"]])):
+            with self.subTest(shared=shared), patch(
+                "simulation_copilot.tools.prosimos_relational_tools.is_connection_shared", return_value=shared
+            ):
+                batches = _schedule_tool_blocks(_blocks(_INTERVAL), self.tools)
+
+                self.assertEqual([[block.id for block in batch] for batch in batches], expected)
+
+    def test_failed_writer_keeps_concurrent_changes(self):
+        calendars, distributions = _counts()
+
+        with self.assertRaises(KeyError):  # the interval misses the end day
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                _run_tool_blocks_concurrently(
+                    _blocks({key: value for key, value in _INTERVAL.items() if key != "end_day"}),
+                    self.tools,
+                    executor,
+                )
+
+        self.assertEqual(_counts(), (calendars, distributions + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
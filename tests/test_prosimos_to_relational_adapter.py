@@ -46,6 +46,58 @@ class TestProsimosToRelationalAdapter(unittest.TestCase):
             len(model["arrival_time_distribution"]["distribution_params"]),
         )
 
+    def test_create_simulation_model_bulk_ok(self):
+        model_path = Path(__file__).parent / "test_data/PurchasingExample/simulation.json"
+        process_path = Path(__file__).parent / "test_data/PurchasingExample/process.bpmn"
+        with model_path.open("r") as f:
+            model = json.load(f)
+
+        expected_model = create_simulation_model_from_pix(self.session, model, process_path)
+        relational_model = create_simulation_model_from_pix(self.session, model, process_path, bulk=True)
+
+        self.assertTrue(isinstance(relational_model, SimulationModel))
+        self.assertNotEqual(relational_model.id, expected_model.id)
+        self.assertEqual(
+            [gateway.bpmn_id for gateway in relational_model.gateways],
+            [gateway.bpmn_id for gateway in expected_model.gateways],
+        )
+        self.assertEqual(
+            len(relational_model.case_arrival.calendar.intervals), len(expected_model.case_arrival.calendar.intervals)
+        )
+        self.assertEqual(
+            len(relational_model.case_arrival.inter_arrival_distribution.parameters),
+            len(model["arrival_time_distribution"]["distribution_params"]),
+        )
+        self.assertEqual(len(relational_model.resource_profiles), len(expected_model.resource_profiles))
+        for profile, expected_profile in zip(relational_model.resource_profiles, expected_model.resource_profiles):
+            self.assertEqual(profile.name, expected_profile.name)
+            self.assertEqual(
+                [(resource.name, resource.amount, len(resource.assigned_activities)) for resource in profile.resources],
+                [
+                    (resource.name, resource.amount, len(resource.assigned_activities))
+                    for resource in expected_profile.resources
+                ],
+            )
+
+        self.service.delete_simulation_model(expected_model.id)
+        self.service.delete_simulation_model(relational_model.id)
+
+    def test_create_simulation_model_bulk_joins_unit_of_work(self):
+        model_path = Path(__file__).parent / "test_data/PurchasingExample/simulation.json"
+        process_path = Path(__file__).parent / "test_data/PurchasingExample/process.bpmn"
+        with model_path.open("r") as f:
+            model = json.load(f)
+        models = self.session.query(SimulationModel).count()
+
+        with self.assertRaises(RuntimeError):
+            with self.service.unit_of_work():
+                self.service.create_simulation_model()
+                create_simulation_model_from_pix(self.session, model, process_path, bulk=True)
+                raise RuntimeError("the caller fails after the import")
+
+        # neither the caller's model nor the imported one is committed
+        self.assertEqual(self.session.query(SimulationModel).count(), models)
+
 
 if __name__ == "__main__":
     unittest.main()
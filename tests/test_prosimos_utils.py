@@ -0,0 +1,146 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from prosimos.simulation_setup import SimDiffSetup
+from prosimos.warning_logger import warning_logger
+
+from simulation_copilot.database import create_tables, Session
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.prosimos_utils import (
+    _simulate,
+    get_report_kpis,
+    get_simulation_attributes,
+    run_prosimos,
+    run_prosimos_replications,
+    run_prosimos_until_converged,
+    summarize_replications,
+)
+
+_TEST_DATA = Path(__file__).parent / "test_data/PurchasingExample"
+_START = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+
+
+class TestProsimosUtils(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+        cls.process_path = _TEST_DATA / "process.bpmn"
+        with (_TEST_DATA / "simulation.json").open("r") as f:
+            model = json.load(f)
+        with Session() as session:
+            cls.model_id = create_simulation_model_from_pix(session, model, cls.process_path, bulk=True).id
+
+    def test_get_report_kpis(self):
+        report = run_prosimos(self.model_id, self.process_path)
+
+        kpis = get_report_kpis(report)
+
+        self.assertEqual(
+            set(kpis),
+            {"cycle_time", "processing_time", "waiting_time", "idle_time", "resource_utilization", "cost"},
+        )
+        self.assertGreater(kpis["cycle_time"], 0)
+        self.assertTrue(0 < kpis["resource_utilization"] < 1)
+
+    def test_run_prosimos_replications(self):
+        summary = run_prosimos_replications(self.model_id, self.process_path, replications=3, seed=42, max_workers=3)
+
+        lines = summary.splitlines()
+        self.assertEqual(lines[1], "KPI,Mean,Standard Deviation,CI Lower,CI Upper,Replications")
+        cycle_time = next(line.split(",") for line in lines if line.startswith("cycle_time"))
+        mean, lower, upper = float(cycle_time[1]), float(cycle_time[3]), float(cycle_time[4])
+        self.assertTrue(lower < mean < upper)
+        self.assertEqual(cycle_time[5], "3")
+
+    def test_replications_require_one_at_least(self):
+        with self.assertRaises(ValueError):
+            run_prosimos_replications(self.model_id, self.process_path, replications=0)
+        with self.assertRaises(ValueError):
+            summarize_replications([])
+
+    def test_run_prosimos_is_reproducible(self):
+        starting_at = datetime(2024, 1, 1, 8)
+        first = run_prosimos(
+            self.model_id, self.process_path, total_cases=20, starting_at=starting_at, seed=7, use_cache=False
+        )
+        second = run_prosimos(
+            self.model_id, self.process_path, total_cases=20, starting_at=starting_at, seed=7, use_cache=False
+        )
+
+        self.assertEqual(first.split('""', 1)[1], second.split('""', 1)[1])  # the first section has wall-clock times
+        self.assertIn("2024-01-01 08:00:00", first)
+
+    def test_run_prosimos_replications_is_reproducible(self):
+        starting_at = datetime(2024, 1, 1, 8)
+        first = run_prosimos_replications(
+            self.model_id, self.process_path, 2, starting_at=starting_at, seed=7, use_cache=False
+        )
+        second = run_prosimos_replications(
+            self.model_id, self.process_path, 2, starting_at=starting_at, seed=7, use_cache=False
+        )
+
+        self.assertEqual(first, second)
+
+    def test_run_prosimos_until_converged(self):
+        loose = run_prosimos_until_converged(
+            self.model_id, self.process_path, relative_half_width=10.0, batch_size=2, max_replications=6, seed=1
+        )
+        strict = run_prosimos_until_converged(
+            self.model_id, self.process_path, relative_half_width=0.0, batch_size=2, max_replications=6, seed=1
+        )
+
+        self.assertTrue(loose.splitlines()[2].endswith(",2"))  # converged after the first batch
+        self.assertTrue(strict.splitlines()[2].endswith(",6"))  # stopped at max_replications
+
+    def test_run_prosimos_leaves_no_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(tempfile, "tempdir", directory):
+                report = run_prosimos(self.model_id, self.process_path, total_cases=10)
+
+            self.assertEqual(os.listdir(directory), [])
+        self.assertIn("Overall Scenario Statistics", report)
+        self.assertTrue(warning_logger.is_empty())
+
+    def test_simulation_starts_now_by_default(self):
+        attributes = get_simulation_attributes(self.model_id, self.process_path)
+        with patch.object(
+            SimDiffSetup, "set_starting_datetime", autospec=True, side_effect=SimDiffSetup.set_starting_datetime
+        ) as set_starting_datetime:
+            before = datetime.now(timezone.utc)
+            _simulate(self.process_path, attributes, total_cases=10)
+
+        (_, starting_at), _ = set_starting_datetime.call_args
+        self.assertTrue(before <= starting_at <= datetime.now(timezone.utc))
+
+    def test_run_prosimos_reuses_cached_report(self):
+        with patch("simulation_copilot.prosimos_utils._simulate", wraps=_simulate) as simulate:
+            first = run_prosimos(self.model_id, self.process_path, total_cases=10, starting_at=_START, seed=3)
+            second = run_prosimos(self.model_id, self.process_path, total_cases=10, starting_at=_START, seed=3)
+
+        self.assertEqual(first, second)
+        self.assertEqual(simulate.call_count, 1)
+
+    def test_run_prosimos_without_seed_isnt_cached(self):
+        with patch("simulation_copilot.prosimos_utils._simulate", wraps=_simulate) as simulate:
+            run_prosimos(self.model_id, self.process_path, total_cases=10, starting_at=_START)
+            run_prosimos(self.model_id, self.process_path, total_cases=10, starting_at=_START)
+
+        self.assertEqual(simulate.call_count, 2)
+
+    def test_run_prosimos_without_start_isnt_cached(self):
+        with patch("simulation_copilot.prosimos_utils._simulate", wraps=_simulate) as simulate:
+            run_prosimos(self.model_id, self.process_path, total_cases=10, seed=3)
+            run_prosimos(self.model_id, self.process_path, total_cases=10, seed=3)
+
+        self.assertEqual(simulate.call_count, 2)  # each run starts at the current time
+
+
+if __name__ == "__main__":
+    unittest.main()
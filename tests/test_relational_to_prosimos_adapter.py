@@ -1,10 +1,15 @@
 # pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
 # pylint: disable=R0801
+import json
 import os
 import unittest
+from pathlib import Path
+
+import sqlalchemy as sa
 
 from simulation_copilot.database import create_tables, Session
 from simulation_copilot.prosimos_relational_service import ProsimosRelationalService
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
 from simulation_copilot.relational_to_prosimos_adapter import create_simulation_model_from_relational_data
 
 
@@ -135,6 +140,35 @@ class TestRelationalToProsimosAdapter(unittest.TestCase):
 
         self.service.delete_simulation_model(sql_model.id)
 
+    def test_bounded_number_of_queries(self):
+        model_path = Path(__file__).parent / "test_data/PurchasingExample/simulation.json"
+        process_path = Path(__file__).parent / "test_data/PurchasingExample/process.bpmn"
+        with model_path.open("r") as f:
+            model = json.load(f)
+        sql_model = create_simulation_model_from_pix(self.session, model, process_path)
+        self.session.expire_all()  # nothing is cached in the session, everything must be loaded from the database
+
+        statements = []
+
+        def count_statement(*_):
+            statements.append(1)
+
+        engine = self.session.get_bind()
+        sa.event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            bps_model = create_simulation_model_from_relational_data(self.session, sql_model.id)
+        finally:
+            sa.event.remove(engine, "before_cursor_execute", count_statement)
+
+        # one statement per relationship level, the number doesn't grow with the number of resources or activities
+        self.assertLessEqual(len(statements), 20)
+        self.assertEqual(len(bps_model.resource_model.resource_profiles), len(model["resource_profiles"]))
+        self.assertEqual(
+            len(bps_model.resource_model.activity_resource_distributions), len(model["task_resource_distribution"])
+        )
+
+        self.service.delete_simulation_model(sql_model.id)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
+import os
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from simulation_copilot.database import create_tables, Session
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.resource_optimizer import (
+    AmountBounds,
+    cheapest_allocation,
+    optimize_resource_allocation,
+    pareto_front,
+)
+
+_TEST_DATA = Path(__file__).parent / "test_data/PurchasingExample"
+
+
+class TestResourceOptimizer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+        cls.process_path = _TEST_DATA / "process.bpmn"
+        with (_TEST_DATA / "simulation.json").open("r") as f:
+            model = json.load(f)
+        with Session() as session:
+            cls.model_id = create_simulation_model_from_pix(session, model, cls.process_path, bulk=True).id
+
+    def test_pareto_front(self):
+        evaluated = {
+            (1,): {"staffing_cost": 10, "cycle_time": 100},
+            (2,): {"staffing_cost": 20, "cycle_time": 80},
+            (3,): {"staffing_cost": 30, "cycle_time": 80},  # dominated by (2,)
+            (4,): {"staffing_cost": 40, "cycle_time": 50},
+        }
+
+        self.assertEqual(pareto_front(evaluated), [(1,), (2,), (4,)])
+
+    def test_cheapest_allocation(self):
+        front = pd.DataFrame({"staffing_cost": [10, 20, 40], "cycle_time": [100, 80, 50]})
+
+        self.assertEqual(cheapest_allocation(front, 90)["staffing_cost"], 20)
+        self.assertIsNone(cheapest_allocation(front, 10))
+
+    def test_optimize_resource_allocation(self):
+        bounds = {"Francis Odell": AmountBounds(1, 2), "Nico Ojenbeer": AmountBounds(1, 2)}
+
+        front = optimize_resource_allocation(
+            self.model_id,
+            self.process_path,
+            bounds,
+            arrival_rate_multiplier=5.0,
+            total_cases=50,
+            starting_at=datetime(2024, 1, 1, 8),
+            seed=42,
+            max_workers=2,
+            use_cache=False,
+        )
+
+        self.assertEqual(front.columns[:3].tolist(), ["amount:Francis Odell", "amount:Nico Ojenbeer", "staffing_cost"])
+        self.assertTrue(front["staffing_cost"].is_monotonic_increasing)
+        self.assertTrue(front["cycle_time"].is_monotonic_decreasing)
+        self.assertTrue(front[["amount:Francis Odell", "amount:Nico Ojenbeer"]].isin([1, 2]).all().all())
+
+    def test_evaluation_budget(self):
+        bounds = {"Francis Odell": AmountBounds(1, 3), "Nico Ojenbeer": AmountBounds(1, 3)}
+
+        front = optimize_resource_allocation(
+            self.model_id, self.process_path, bounds, max_evaluations=1, total_cases=10, seed=42, use_cache=False
+        )
+
+        self.assertEqual(len(front), 1)  # only the base allocation is simulated
+
+    def test_unknown_resource(self):
+        with self.assertRaises(ValueError):
+            optimize_resource_allocation(self.model_id, self.process_path, {"Nobody": AmountBounds()})
+        with self.assertRaises(ValueError):
+            AmountBounds(3, 2)
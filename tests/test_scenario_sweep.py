@@ -0,0 +1,113 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
+import os
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from simulation_copilot.database import create_tables, Session
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.prosimos_utils import get_simulation_attributes
+from simulation_copilot.scenario_sweep import ScenarioChanges, ScenarioGrid, format_sweep, run_scenario_sweep
+
+_TEST_DATA = Path(__file__).parent / "test_data/PurchasingExample"
+_GATEWAY_ID = "node_59294c46-2e2b-452a-9b5b-824f443d4f45"
+_FLOW_ID = "node_cb25b12f-6bb4-42bd-9af6-1c23450df1d1"
+
+
+class TestScenarioSweep(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+        cls.process_path = _TEST_DATA / "process.bpmn"
+        with (_TEST_DATA / "simulation.json").open("r") as f:
+            model = json.load(f)
+        with Session() as session:
+            cls.model_id = create_simulation_model_from_pix(session, model, cls.process_path, bulk=True).id
+        cls.attributes = get_simulation_attributes(cls.model_id, cls.process_path)
+
+    def test_scenarios(self):
+        grid = ScenarioGrid(resource_amounts={"Kim Passa": [1, 2], "Kiu Kan": [1, 2, 3]}, arrival_rate_multipliers=[2])
+
+        scenarios = grid.scenarios()
+
+        self.assertEqual(len(scenarios), 6)
+        self.assertEqual(scenarios[0], {"amount:Kim Passa": 1, "amount:Kiu Kan": 1, "arrival_rate": 2})
+        self.assertEqual(ScenarioGrid().scenarios(), [{}])
+
+    def test_changes_are_applied_to_a_copy(self):
+        changes = ScenarioChanges(self.attributes, self.process_path)
+
+        variant = changes.apply(
+            {
+                "amount:Kim Passa": 3,
+                "arrival_rate": 2.0,
+                "duration:Amend Purchase Requisition": 0.5,
+                f"gateway:{_GATEWAY_ID}": {_FLOW_ID: 2},
+            }
+        )
+
+        resource = next(r for p in variant["resource_profiles"] for r in p["resource_list"] if r["name"] == "Kim Passa")
+        self.assertEqual(resource["amount"], 3)
+        base_arrival = self.attributes["arrival_time_distribution"]["distribution_params"]
+        arrival = variant["arrival_time_distribution"]["distribution_params"]
+        self.assertAlmostEqual(arrival[0]["value"], base_arrival[0]["value"] / 2)  # mean
+        self.assertAlmostEqual(arrival[1]["value"], base_arrival[1]["value"] / 4)  # variance
+        duration = variant["task_resource_distribution"][0]["resources"][0]["distribution_params"]
+        base_duration = self.attributes["task_resource_distribution"][0]["resources"][0]["distribution_params"]
+        self.assertAlmostEqual(duration[0]["value"], base_duration[0]["value"] / 2)
+        gateway = next(g for g in variant["gateway_branching_probabilities"] if g["gateway_id"] == _GATEWAY_ID)
+        self.assertEqual({p["path_id"]: p["value"] for p in gateway["probabilities"]}[_FLOW_ID], 1.0)
+        self.assertEqual(sum(p["value"] for p in gateway["probabilities"]), 1.0)
+        # the base parameters are unchanged
+        self.assertEqual(self.attributes, get_simulation_attributes(self.model_id, self.process_path))
+
+    def test_unknown_names_are_rejected(self):
+        changes = ScenarioChanges(self.attributes, self.process_path)
+
+        for scenario in (
+            {"amount:Nobody": 1},
+            {"duration:Unknown Activity": 2.0},
+            {f"gateway:{_GATEWAY_ID}": {"node_unknown": 1.0}},
+            {"arrival_rate": 0},
+        ):
+            with self.assertRaises(ValueError):
+                changes.apply(scenario)
+
+    def test_run_scenario_sweep(self):
+        grid = ScenarioGrid(resource_amounts={"Kim Passa": [1, 2]}, arrival_rate_multipliers=[0.5, 2.0])
+
+        table = run_scenario_sweep(
+            self.model_id,
+            self.process_path,
+            grid,
+            total_cases=20,
+            starting_at=datetime(2024, 1, 1, 8),
+            seed=42,
+            max_workers=2,
+            use_cache=False,
+        )
+
+        self.assertEqual(len(table), 4)
+        self.assertEqual(list(table.index), [1, 2, 3, 4])
+        self.assertTrue(table["cycle_time"].is_monotonic_increasing)
+        self.assertEqual(table.columns[:2].tolist(), ["amount:Kim Passa", "arrival_rate"])
+        self.assertIn("cost", table.columns)
+        self.assertTrue(format_sweep(table).startswith("rank,amount:Kim Passa,arrival_rate,cycle_time"))
+
+    def test_sweep_without_seed_bypasses_cache(self):
+        grid = ScenarioGrid(resource_amounts={"Kim Passa": [1, 2]})
+
+        with patch("simulation_copilot.scenario_sweep.get_default_cache") as get_default_cache:
+            table = run_scenario_sweep(self.model_id, self.process_path, grid, total_cases=10, max_workers=1)
+
+        get_default_cache.assert_not_called()
+        self.assertEqual(len(table), 2)
+
+    def test_too_many_scenarios(self):
+        grid = ScenarioGrid(resource_amounts={"Kim Passa": [1, 2, 3], "Kiu Kan": [1, 2, 3]})
+
+        with self.assertRaises(ValueError):
+            run_scenario_sweep(self.model_id, self.process_path, grid, max_scenarios=8)
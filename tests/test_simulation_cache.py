@@ -0,0 +1,68 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from simulation_copilot.simulation_cache import SimulationCache, fingerprint
+
+_PROCESS_PATH = Path(__file__).parent / "test_data/PurchasingExample/process.bpmn"
+
+
+class TestSimulationCache(unittest.TestCase):
+    def test_fingerprint_is_canonical(self):
+        first = fingerprint({"a": 1, "b": [1, 2]}, _PROCESS_PATH, total_cases=100, seed=1)
+        second = fingerprint({"b": [1, 2], "a": 1}, _PROCESS_PATH, seed=1, total_cases=100)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, fingerprint({"a": 1, "b": [1, 2]}, _PROCESS_PATH, total_cases=100, seed=2))
+        self.assertNotEqual(first, fingerprint({"a": 2, "b": [1, 2]}, _PROCESS_PATH, total_cases=100, seed=1))
+
+    def test_memory_lru(self):
+        cache = SimulationCache(max_memory_entries=2)
+        cache.put("a", "report a")
+        cache.put("b", "report b")
+        cache.get("a")
+        cache.put("c", "report c")
+
+        self.assertEqual(cache.get("a"), "report a")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "report c")
+
+    def test_disk_store_is_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            SimulationCache(directory).put("a", "report a")
+
+            self.assertEqual(SimulationCache(directory).get("a"), "report a")
+
+    def test_disk_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SimulationCache(directory, max_memory_entries=0, max_disk_bytes=20)
+            cache.put("a", "x" * 10)
+            os.utime(Path(directory) / "a.csv", (time.time() - 10, time.time() - 10))
+            cache.put("b", "x" * 10)
+            cache.put("c", "x" * 10)
+
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(sorted(os.listdir(directory)), ["b.csv", "c.csv"])
+
+    def test_disk_size_is_kept_up_to_date(self):
+        with tempfile.TemporaryDirectory() as directory:
+            SimulationCache(directory).put("a", "x" * 10)
+            os.utime(Path(directory) / "a.csv", (time.time() - 10, time.time() - 10))
+            cache = SimulationCache(directory, max_memory_entries=0, max_disk_bytes=20)  # counts the stored report
+            cache.put("b", "x" * 5)
+            cache.put("b", "x" * 10)  # a replaced report isn't counted twice
+
+            self.assertEqual(sorted(os.listdir(directory)), ["a.csv", "b.csv"])
+            cache.put("c", "x")
+            self.assertEqual(sorted(os.listdir(directory)), ["b.csv", "c.csv"])
+
+            cache.clear()
+            cache.put("d", "x" * 20)
+            self.assertEqual(os.listdir(directory), ["d.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import json
+import os
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from pathlib import Path
+
+from simulation_copilot.database import create_tables, Session
+from simulation_copilot.prosimos_to_relational_adapter import create_simulation_model_from_pix
+from simulation_copilot.prosimos_utils import _simulate, get_report_kpis, get_simulation_attributes, simulate_kpis
+from simulation_copilot.simulation_pool import SimulationPool, _parsed_graphs
+
+_TEST_DATA = Path(__file__).parent / "test_data/PurchasingExample"
+
+
+def _simulate_twice(process_path: Path, attributes: dict, starting_at: datetime) -> tuple[int, int]:
+    _simulate(process_path, attributes, 10, starting_at, 7)
+    parsed = len(_parsed_graphs)
+    _simulate(process_path, attributes, 10, starting_at, 7)
+    return parsed, len(_parsed_graphs)
+
+
+def _exit(code: int):
+    os._exit(code)  # pylint: disable=protected-access
+
+
+class TestSimulationPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+        cls.process_path = _TEST_DATA / "process.bpmn"
+        with (_TEST_DATA / "simulation.json").open("r") as f:
+            model = json.load(f)
+        with Session() as session:
+            cls.model_id = create_simulation_model_from_pix(session, model, cls.process_path, bulk=True).id
+
+    def test_workers_reuse_parsed_bpmn(self):
+        attributes = get_simulation_attributes(self.model_id, self.process_path)
+        starting_at = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+
+        with SimulationPool(max_workers=1) as pool:
+            [(parsed, parsed_again)] = pool.map(_simulate_twice, [self.process_path], [attributes], [starting_at])
+
+        self.assertEqual(parsed, 1)
+        self.assertEqual(parsed_again, 1)  # the second simulation reuses the parsed BPMN model
+
+    def test_results_match_simulation_in_process(self):
+        attributes = get_simulation_attributes(self.model_id, self.process_path)
+        starting_at = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+
+        with SimulationPool(max_workers=2) as pool:
+            results = pool.map(
+                simulate_kpis, [self.process_path] * 2, [attributes] * 2, [20] * 2, [starting_at] * 2, [7] * 2
+            )
+
+        report = _simulate(self.process_path, attributes, 20, starting_at, 7)
+        for pool_report, kpis in results:
+            self.assertEqual(pool_report.split('""', 1)[1], report.split('""', 1)[1])
+            self.assertEqual(kpis, get_report_kpis(report))
+
+    def test_pool_restarts_after_worker_crash(self):
+        with SimulationPool(max_workers=1) as pool:
+            with self.assertRaises(BrokenProcessPool):
+                pool.map(_exit, [1])
+
+            self.assertEqual(pool.map(abs, [-1, -2]), [1, 2])
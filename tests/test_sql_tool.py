@@ -0,0 +1,99 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import os
+import unittest
+
+from sqlalchemy import text
+
+from simulation_copilot.database import Session, create_tables
+from simulation_copilot.tools.sql import StatementKind, classify_statement, execute_sql
+
+
+class TestSQLTool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+        create_tables()
+
+    def setUp(self):
+        self.session = Session()
+        values = ", ".join(f"('distribution {i}')" for i in range(100))
+        execute_sql(self.session, f"INSERT INTO distribution (name) VALUES {values}")
+
+    def tearDown(self):
+        execute_sql(self.session, "DELETE FROM distribution")
+        self.session.close()
+
+    def test_classify_statement(self):
+        self.assertEqual(classify_statement("SELECT 1"), StatementKind.READ)
+        self.assertEqual(classify_statement("  -- comment\n/* block */ with t as (select 1) select * from t"), "read")
+        self.assertEqual(classify_statement("EXPLAIN QUERY PLAN SELECT 1"), StatementKind.READ)
+        self.assertEqual(classify_statement("PRAGMA table_info(resource)"), StatementKind.READ)
+        self.assertEqual(classify_statement("PRAGMA main.index_list('resource')"), StatementKind.READ)
+        self.assertEqual(classify_statement("PRAGMA query_only = OFF"), StatementKind.WRITE)
+        # pragmas other than the known read-only ones may change the connection in either form
+        self.assertEqual(classify_statement("PRAGMA foreign_keys(0)"), StatementKind.WRITE)
+        self.assertEqual(classify_statement("pragma main.foreign_keys"), StatementKind.WRITE)
+        self.assertEqual(classify_statement("UPDATE resource SET amount = 2"), StatementKind.WRITE)
+        # statements with common table expressions are classified by the main statement
+        self.assertEqual(classify_statement("WITH t AS (SELECT 1) DELETE FROM resource"), StatementKind.WRITE)
+        self.assertEqual(
+            classify_statement(
+                "WITH RECURSIVE t(n) AS (SELECT 1 UNION SELECT n + 1 FROM t) UPDATE resource SET id = 1"
+            ),
+            StatementKind.WRITE,
+        )
+        self.assertEqual(classify_statement("WITH t AS (DELETE FROM resource) SELECT 'delete'"), StatementKind.READ)
+
+    def test_rows_are_capped(self):
+        output = execute_sql(self.session, "SELECT id, name FROM distribution", max_rows=10)
+
+        lines = output.splitlines()
+        self.assertEqual(lines[0], "id,name")
+        self.assertEqual(len(lines), 12)
+        self.assertTrue(lines[-1].startswith("[truncated to the first 10 rows"))
+
+    def test_empty_result(self):
+        output = execute_sql(self.session, "SELECT name FROM distribution WHERE id < 0")
+        self.assertEqual(output, "name\n[no rows]\n")
+
+    def test_reads_are_read_only(self):
+        self.assertEqual(execute_sql(self.session, "SELECT query_only FROM pragma_query_only"), "query_only\n1\n")
+        self.assertIn("100", execute_sql(self.session, "SELECT count(*) AS n FROM distribution"))
+        # writes are allowed again after the read
+        self.assertEqual(execute_sql(self.session, "DELETE FROM distribution WHERE id < 0"), "0 rows changed")
+
+    def test_reads_end_the_transaction(self):
+        self.session.execute(text("UPDATE distribution SET name = 'changed'"))  # not committed
+
+        self.assertEqual(
+            execute_sql(self.session, "SELECT count(*) FROM distribution WHERE name = 'changed'"), "count(*)\n0\n"
+        )
+        self.assertFalse(self.session.in_transaction())
+
+    def test_full_scans_of_large_tables_are_rejected(self):
+        rejected = execute_sql(
+            self.session, "SELECT * FROM distribution AS d WHERE d.name = 'x'", max_full_scan_rows=50
+        )
+        self.assertTrue(rejected.startswith("Query rejected: it scans all 100 rows of table distribution"))
+
+        limited = execute_sql(self.session, "SELECT name FROM distribution LIMIT 3", max_full_scan_rows=50)
+        self.assertEqual(len(limited.splitlines()), 4)
+
+        by_key = execute_sql(self.session, "SELECT name FROM distribution WHERE id = 1", max_full_scan_rows=50)
+        self.assertFalse(by_key.startswith("Query rejected"))
+
+        # aggregates of all rows return a single row
+        count = execute_sql(self.session, "SELECT count(*) AS n, max(name) FROM distribution", max_full_scan_rows=50)
+        self.assertEqual(count.splitlines()[1], "100,distribution 99")
+        grouped = execute_sql(
+            self.session, "SELECT name, count(*) FROM distribution GROUP BY name", max_full_scan_rows=50
+        )
+        self.assertTrue(grouped.startswith("Query rejected"))
+
+    def test_writes_with_common_table_expressions(self):
+        output = execute_sql(
+            self.session, "WITH t AS (SELECT max(id) AS id FROM distribution) DELETE FROM distribution WHERE id IN t"
+        )
+
+        self.assertEqual(output, "1 rows changed")
+        self.assertIn("99", execute_sql(self.session, "SELECT count(*) FROM distribution"))
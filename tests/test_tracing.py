@@ -0,0 +1,117 @@
+# pylint: disable=missing-module-docstring,missing-class-docstring,missing-function-docstring
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from anthropic.types import TextBlock, Usage
+from anthropic.types.beta.tools import ToolsBetaMessage, ToolUseBlock
+from langchain_core.tools import StructuredTool
+
+from simulation_copilot.anthropic import Conversation, MessageHistory, ScriptedClient
+from simulation_copilot.tracing import InMemoryExporter, JsonLinesExporter, set_exporter, span, traced
+
+
+def _response(content: list, stop_reason: str) -> ToolsBetaMessage:
+    return ToolsBetaMessage(
+        id="msg",
+        type="message",
+        role="assistant",
+        model="claude",
+        content=content,
+        stop_reason=stop_reason,
+        usage=Usage(input_tokens=10, output_tokens=5),
+    )
+
+
+def _conversation(parallel_tool_calls: bool = False) -> Conversation:
+    def get_resource_id_by_name(name: str) -> int:
+        return {"Carmen": 1}[name]
+
+    responses = [
+        _response(
+            [ToolUseBlock(id="tool_1", name="get_resource_id_by_name", input={"name": "Carmen"}, type="tool_use")],
+            "tool_use",
+        ),
+        _response([TextBlock(type="text", text="Carmen has ID 1.")], "end_turn"),
+    ]
+    return Conversation(
+        model="claude",
+        tools=[StructuredTool.from_function(get_resource_id_by_name, description="Returns the ID of the resource.")],
+        client=ScriptedClient(responses),
+        history=MessageHistory(),
+        parallel_tool_calls=parallel_tool_calls,
+    )
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        set_exporter(self.exporter)
+
+    def tearDown(self):
+        set_exporter(None)
+
+    def test_nested_spans(self):
+        with span("outer", a=1) as outer:
+            with span("inner") as inner:
+                inner.set(b=2)
+
+        self.assertEqual([s.name for s in self.exporter.spans], ["inner", "outer"])
+        self.assertEqual(inner.parent_id, outer.span_id)
+        self.assertEqual(inner.trace_id, outer.trace_id)
+        self.assertIsNone(outer.parent_id)
+        self.assertEqual(outer.attributes, {"a": 1})
+        self.assertEqual(inner.attributes, {"b": 2})
+        self.assertGreaterEqual(outer.duration, inner.duration)
+
+    def test_error_is_recorded(self):
+        @traced("failing")
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            fail()
+
+        self.assertEqual(self.exporter.spans[0].name, "failing")
+        self.assertEqual(self.exporter.spans[0].error, "ValueError: boom")
+
+    def test_disabled(self):
+        set_exporter(None)
+        with span("ignored") as s:
+            s.set(a=1)
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "trace.jsonl"
+            set_exporter(JsonLinesExporter(path))
+            with span("outer"):
+                with span("inner", a=1):
+                    pass
+
+            lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        self.assertEqual([line["name"] for line in lines], ["inner", "outer"])
+        self.assertEqual(lines[0]["attributes"], {"a": 1})
+        self.assertEqual(lines[0]["parent_id"], lines[1]["span_id"])
+
+    def test_conversation(self):
+        for parallel_tool_calls in (False, True):
+            with self.subTest(parallel_tool_calls=parallel_tool_calls):
+                self.exporter.spans.clear()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _conversation(parallel_tool_calls).run("What is the ID of Carmen?")
+
+                spans = {s.name: s for s in self.exporter.spans}
+                names = [s.name for s in self.exporter.spans]
+                self.assertEqual(names, ["llm.call", "tool.call", "llm.call", "conversation.run"])
+                llm_call = self.exporter.spans[0]
+                self.assertEqual(llm_call.attributes["input_tokens"], 10)
+                self.assertEqual(llm_call.attributes["output_tokens"], 5)
+                self.assertEqual(llm_call.attributes["stop_reason"], "tool_use")
+                # the tool runs in a worker thread with parallel tool calls, but keeps its parent
+                self.assertEqual(spans["tool.call"].parent_id, spans["conversation.run"].span_id)
+                self.assertEqual(spans["tool.call"].attributes["tool"], "get_resource_id_by_name")